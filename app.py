@@ -1,207 +1,214 @@
-import streamlit as st
-import fitz  # PyMuPDF
-import pandas as pd
-import re
-import io
-import json 
-from PIL import Image
-from pdf2docx import Converter as PDFToWordConverter
-from fpdf import FPDF
-from rembg import remove
+import contextlib
+import importlib.machinery
 import os
-import zipfile
-from pypdf import PdfWriter, PdfReader
 
-# --- Funções de Conversão (Bloco 1) ---
+import streamlit as st
 
-def convert_pdf_to_word(file_bytes):
-    """Converte bytes de PDF para bytes de DOCX."""
-    try:
-        pdf_temp_path = f"temp_input_{hash(file_bytes)}.pdf"
-        docx_temp_path = f"temp_output_{hash(file_bytes)}.docx"
-        
-        with open(pdf_temp_path, "wb") as f:
-            f.write(file_bytes)
-            
-        cv = PDFToWordConverter(pdf_temp_path)
-        cv.convert(docx_temp_path, start=0, end=None)
-        cv.close()
+# O Streamlit executa este arquivo como __main__. Os workers do fileflow
+# (forkserver/spawn) reexecutariam o __main__ de quem os criou, ou seja, a
+# interface inteira; com um spec de nome "__main__" o multiprocessing não
+# importa nada (os workers só usam funções do fileflow).
+__spec__ = importlib.machinery.ModuleSpec("__main__", None)
 
-        with open(docx_temp_path, "rb") as f:
-            docx_bytes = f.read()
+# As ferramentas importam o núcleo (fileflow) dentro do próprio bloco: cada
+# aba carrega só as bibliotecas de que precisa (rembg, pdf2docx, PyMuPDF e
+# pandas somam segundos na inicialização de uma réplica nova).
 
-        os.remove(pdf_temp_path)
-        os.remove(docx_temp_path)
-        
-        return docx_bytes
-
-    except Exception as e:
-        if os.path.exists(pdf_temp_path):
-            os.remove(pdf_temp_path)
-        if os.path.exists(docx_temp_path):
-            os.remove(docx_temp_path)
-        st.error(f"Erro ao converter PDF para Word: {e}")
-        return None
-
-
-def convert_image_to_format(file_bytes, target_format):
-    """Converte bytes de imagem (PNG/JPG) para um novo formato (PNG/JPG)."""
-    img = Image.open(io.BytesIO(file_bytes))
-    
-    save_format = target_format
-    if target_format == "JPG":
-        save_format = "JPEG"
-    
-    if save_format == "JPEG" and img.mode == "RGBA":
-        img = img.convert("RGB")
-        
-    output_buffer = io.BytesIO()
-    img.save(output_buffer, format=save_format)
-    return output_buffer.getvalue()
-
-def convert_excel_to_pdf(file_bytes):
-    """Converte o primeiro sheet de um Excel para um PDF simples."""
-    df = pd.read_excel(io.BytesIO(file_bytes), engine='openpyxl')
-    
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=8)
-    
-    num_cols = len(df.columns)
-    if num_cols == 0:
-        return b"" 
-        
-    col_width = pdf.w / (num_cols + 1)
-    row_height = pdf.font_size * 1.5
-
-    for col in df.columns:
-        pdf.cell(col_width, row_height, str(col), border=1, align='C')
-    pdf.ln(row_height)
-    
-    for index, row in df.iterrows():
-        for item in row:
-            pdf.cell(col_width, row_height, str(item), border=1, align='L')
-        pdf.ln(row_height)
-        
-    pdf_bytes = pdf.output(dest='S').encode('latin-1') 
-    return pdf_bytes
-
-def convert_image_to_pdf(file_bytes):
-    """Salva uma imagem (JPG ou PNG) como um arquivo PDF."""
-    img = Image.open(io.BytesIO(file_bytes))
-    
-    if img.mode == 'RGBA':
-        img = img.convert('RGB')
-        
-    output_buffer = io.BytesIO()
-    img.save(output_buffer, format="PDF", resolution=100.0)
-    return output_buffer.getvalue()
 
-# --- Funções de Imagem (Bloco 2) ---
+# --- Fila de trabalhos (segundo plano) ---
+
+# Os IDs dos trabalhos da sessão ficam também na URL (?jobs=...): recarregar
+# a página ou reabrir o link recupera o andamento e os resultados.
+
+def _job_ids():
+    ids = st.query_params.get("jobs", "")
+    return [job_id for job_id in ids.split(",") if job_id]
+
+
+@st.cache_resource
+def _start_job_workers():
+    from fileflow.jobs import start_workers
+    return start_workers()
+
+
+def _submit_job(operation, uploaded_files, options=None):
+    from fileflow.jobs import job_queue
+
+    _start_job_workers()
+    job_id = job_queue.submit(operation, [(f.name, f) for f in uploaded_files], options)
+    st.query_params["jobs"] = ",".join(_job_ids() + [job_id])
+    return job_id
+
+
+# --- Limites de upload ---
+
+# O total da sessão é refeito a cada execução com os campos de upload
+# exibidos: os de outras ferramentas são descartados pelo Streamlit
+
+def _reset_uploads():
+    from fileflow.uploads import reset_uploads
+    reset_uploads(st.session_state)
+
+
+def _check_uploads(files, key):
+    """
+    Aplica aos uploads do campo os limites de tamanho da sessão e retorna o
+    total de bytes; acima do limite, mostra o erro e encerra a execução da
+    página.
+    """
+    from fileflow.uploads import UploadLimitError, check_uploads
 
-def remove_background(file_bytes):
-    """Remove o fundo de uma imagem."""
-    try:
-        return remove(file_bytes)
-    except Exception as e:
-        st.error(f"Erro ao remover fundo: {e}. A imagem pode ser muito complexa ou estar em um formato inesperado.")
-        return None
-
-def optimize_image(file_bytes):
-    """Otimiza uma imagem (JPG/PNG) para reduzir o tamanho."""
-    img = Image.open(io.BytesIO(file_bytes))
-    output_buffer = io.BytesIO()
-    img.save(output_buffer, format=img.format, quality=85, optimize=True)
-    return output_buffer.getvalue()
-
-# --- Funções de PDF (Bloco 3) ---
-
-def merge_pdfs(files_list):
-    """Junta múltiplos arquivos PDF (lista de bytes) em um só."""
-    writer = PdfWriter()
-    for file_bytes in files_list:
-        reader = PdfReader(io.BytesIO(file_bytes))
-        for page in reader.pages:
-            writer.add_page(page)
-    
-    output_buffer = io.BytesIO()
-    writer.write(output_buffer)
-    writer.close()
-    return output_buffer.getvalue()
-
-def split_pdf(file_bytes):
-    """Divide um PDF em páginas individuais e retorna um .zip."""
-    reader = PdfReader(io.BytesIO(file_bytes))
-    
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-        for i, page in enumerate(reader.pages):
-            writer = PdfWriter()
-            writer.add_page(page)
-            
-            page_buffer = io.BytesIO()
-            writer.write(page_buffer)
-            writer.close()
-            page_buffer.seek(0)
-            
-            zf.writestr(f"pagina_{i + 1}.pdf", page_buffer.getvalue())
-            
-    zip_buffer.seek(0)
-    return zip_buffer.getvalue()
-
-def render_pdf_pages(file_bytes):
-    """Renderiza as páginas do PDF como imagens para preview."""
-    doc = fitz.open(stream=file_bytes, filetype="pdf")
-    images = []
-    for i in range(len(doc)):
-        page = doc.load_page(i)
-        pix = page.get_pixmap(matrix=fitz.Matrix(1, 1)) # Qualidade normal
-        img_data = pix.tobytes("png")
-        images.append(img_data)
-    return images, len(doc)
-
-def edit_pdf_structure(file_bytes, pages_to_delete, pages_to_rotate):
-    """Edita a estrutura do PDF (deleta e rotaciona páginas)."""
-    doc = fitz.open(stream=file_bytes, filetype="pdf")
-    output_doc = fitz.open()
-    
-    for i in range(len(doc)):
-        if (i + 1) not in pages_to_delete:
-            output_doc.insert_pdf(doc, from_page=i, to_page=i)
-            if (i + 1) in pages_to_rotate:
-                page = output_doc[-1]
-                page.set_rotation(page.rotation + 90)
-
-    output_buffer = io.BytesIO()
-    output_doc.save(output_buffer)
-    return output_buffer.getvalue()
-
-# --- Funções de Dados (Bloco 4) ---
-
-def convert_excel_to_json(file_bytes):
-    """Converte o primeiro sheet de um Excel para JSON (orient=records)."""
-    df = pd.read_excel(io.BytesIO(file_bytes), engine='openpyxl')
-    json_string = df.to_json(orient='records', indent=4, force_ascii=False)
-    return json_string.encode('utf-8')
-
-def convert_csv_to_json(file_bytes):
-    """Converte um CSV para JSON (orient=records)."""
     try:
-        df = pd.read_csv(io.BytesIO(file_bytes))
-    except UnicodeDecodeError:
-        df = pd.read_csv(io.BytesIO(file_bytes), encoding='latin-1')
-        
-    json_string = df.to_json(orient='records', indent=4, force_ascii=False)
-    return json_string.encode('utf-8')
+        return check_uploads(files, st.session_state, key)
+    except UploadLimitError as e:
+        st.error(str(e))
+        st.stop()
+
+
+@contextlib.contextmanager
+def _converting(upload_total, message=None):
+    """
+    Bloco de uma conversão: reserva memória para os upload_total bytes
+    enviados enquanto ela roda (com um spinner, se houver message). Sem
+    memória livre, mostra o erro e encerra a execução da página.
+    """
+    from fileflow.uploads import MemoryPressureError, reserve_memory
 
-def convert_json_to_csv(file_bytes):
-    """Converte um JSON (lista de objetos) para CSV."""
-    json_string = file_bytes.decode('utf-8')
-    json_data = json.loads(json_string)
-    df = pd.json_normalize(json_data)
-    output_buffer = io.StringIO()
-    df.to_csv(output_buffer, index=False)
-    return output_buffer.getvalue().encode('utf-8')
+    with contextlib.ExitStack() as stack:
+        try:
+            stack.enter_context(reserve_memory(upload_total))
+        except MemoryPressureError as e:
+            st.error(str(e))
+            st.stop()
+        if message:
+            stack.enter_context(st.spinner(message))
+        yield
+
+
+def _show_job(job_id, job):
+    import mimetypes
+    from fileflow.jobs import job_queue
+
+    label = f"Trabalho `{job_id[:8]}`"
+    if job is None:
+        st.caption(f"{label}: expirado ou inexistente.")
+    elif job.pending:
+        status = "na fila" if job.status == "queued" else "em execução"
+        st.progress(job.done / job.total, text=f"{label} ({job.operation}): {status} ({job.done}/{job.total})")
+    elif job.ok:
+        if job.failures:
+            st.warning(f"{label}: {len(job.failures)} de {job.total} arquivos não puderam ser convertidos.")
+            st.code("\n".join(f"{f['name']}: {f['error']}" for f in job.failures), language=None)
+        result = job_queue.open_result(job_id)
+        if result is not None:
+            st.download_button(
+                label=f"Baixar {job.output_name}",
+                data=result,
+                file_name=job.output_name,
+                mime=mimetypes.guess_type(job.output_name)[0] or "application/octet-stream",
+                key=f"job-{job_id}",
+                use_container_width=True
+            )
+    else:
+        st.error(f"{label}: {job.error}")
+
+
+@st.fragment(run_every=2)
+def _poll_job(job_id):
+    from fileflow.jobs import job_queue
+
+    job = job_queue.get(job_id)
+    if job is None or not job.pending:
+        # Concluído: redesenha a página sem a atualização periódica
+        st.rerun()
+    _show_job(job_id, job)
+
+
+def _show_jobs_panel():
+    job_ids = _job_ids()
+    if not job_ids:
+        return
+    from fileflow.jobs import job_queue
+
+    _start_job_workers()
+    with st.container(border=True):
+        st.subheader("Trabalhos em segundo plano")
+        st.caption("Os resultados ficam disponíveis por tempo limitado, mesmo fechando a página.")
+        for job_id in reversed(job_ids):
+            job = job_queue.get(job_id)
+            if job is not None and job.pending:
+                _poll_job(job_id)
+            else:
+                _show_job(job_id, job)
+        if st.button("Limpar lista", key="limpar-trabalhos"):
+            del st.query_params["jobs"]
+            st.rerun()
+
+
+# --- Métricas (administração) ---
+
+# Com FILEFLOW_METRICS_PORT, o formato do Prometheus fica disponível em
+# http://127.0.0.1:<porta>/metrics (com FILEFLOW_METRICS_FILE, também num
+# arquivo regravado periodicamente); com FILEFLOW_ADMIN_TOKEN, a URL
+# ?admin=<token> mostra o painel de métricas no fim da página.
+
+@st.cache_resource
+def _start_metrics_server():
+    from fileflow.metrics import start_metrics_server
+    return start_metrics_server()
+
+
+@st.cache_resource
+def _start_metrics_writer():
+    from fileflow.metrics import start_metrics_writer
+    return start_metrics_writer()
+
+
+def _show_metrics_panel():
+    token = os.environ.get("FILEFLOW_ADMIN_TOKEN")
+    if not token or st.query_params.get("admin") != token:
+        return
+    from fileflow.cache import cache_stats
+    from fileflow.metrics import registry, render_prometheus
+
+    units = {"pages": "páginas", "rows": "linhas"}
+    with st.container(border=True):
+        st.subheader("Métricas por operação")
+        stats = registry.snapshot()
+        if not stats:
+            st.caption("Nenhuma operação registrada desde o início do servidor.")
+        else:
+            rows = []
+            for operation, s in sorted(stats.items()):
+                recent = sorted(s.recent)
+                rows.append({
+                    "Operação": operation,
+                    "Chamadas": s.count,
+                    "Acertos de cache": s.calls.get("hit", 0),
+                    "Erros": s.errors,
+                    "Média (s)": round(s.wall / s.count, 3),
+                    "p95 (s)": round(recent[int(0.95 * (len(recent) - 1))], 3),
+                    "CPU (s)": round(s.cpu, 2),
+                    "Pico RSS (MB)": round(s.peak_rss / 2**20),
+                    "Entrada (MB)": round(s.input_bytes / 2**20, 1),
+                    "Saída (MB)": round(s.output_bytes / 2**20, 1),
+                    "Itens": ", ".join(f"{n} {units.get(unit, unit)}" for unit, n in s.items.items()),
+                })
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+
+        cache = cache_stats()
+        st.caption(
+            f"Cache: {cache['hits_memory'] + cache['hits_disk']} acertos, {cache['misses']} faltas, "
+            f"{cache['memory_bytes'] / 2**20:.0f} MB em memória, {cache['disk_bytes'] / 2**20:.0f} MB em disco."
+        )
+        col1, col2 = st.columns(2)
+        col1.download_button(
+            "Baixar métricas (Prometheus)", render_prometheus(),
+            file_name="fileflow.prom", mime="text/plain", use_container_width=True
+        )
+        if col2.button("Zerar métricas", use_container_width=True):
+            registry.reset()
+            st.rerun()
 
 
 # --- INTERFACE GRÁFICA (UI) ---
@@ -211,6 +218,11 @@ st.set_page_config(
     layout="centered"
 )
 
+if os.environ.get("FILEFLOW_METRICS_PORT"):
+    _start_metrics_server()
+if os.environ.get("FILEFLOW_METRICS_FILE"):
+    _start_metrics_writer()
+
 st.markdown("""
 <style>
 	.logo-text {
@@ -262,14 +274,27 @@ st.markdown(
 
 tool_selection = st.radio(
     "Escolha a ferramenta:",
-    ["Conversor", "Imagem (IA)", "PDF", "Dados"],
+    ["Conversor", "Imagem (IA)", "PDF", "Dados", "Pipeline"],
     horizontal=True,
     label_visibility="collapsed"
 )
 
 st.divider()
+_reset_uploads()
 
 if tool_selection == "Conversor":
+    from fileflow.convert import (
+        convert_pdf_to_word,
+        convert_image_to_format,
+        convert_excel_to_pdf,
+        convert_image_to_pdf,
+        convert_images_to_pdf,
+    )
+    from fileflow.imaging import DEFAULT_QUALITY, FORMAT_EXTENSIONS, FORMAT_MIMES, normalize_format
+    from fileflow.archive import StreamingZip
+    from fileflow.batch import default_workers, iter_batch
+    from fileflow.uploads import upload_buffer
+
     with st.container(border=True):
         st.title("Conversor Universal de Arquivos")
         st.markdown("Selecione a conversão desejada e faça o upload do seu arquivo.")
@@ -280,6 +305,15 @@ if tool_selection == "Conversor":
             "PNG para JPG": ("png", "image/png"),
             "JPG para PNG": ("jpg", "image/jpeg"),
             "Imagem (JPG/PNG) para PDF": (["jpg", "png"], ["image/jpeg", "image/png"]),
+            "Imagem (JPG/PNG) para WebP": (["jpg", "png"], ["image/jpeg", "image/png"]),
+            "Imagem (JPG/PNG) para AVIF": (["jpg", "png"], ["image/jpeg", "image/png"]),
+        }
+        # Conversões de imagem para imagem: formato de destino
+        image_targets = {
+            "PNG para JPG": "JPG",
+            "JPG para PNG": "PNG",
+            "Imagem (JPG/PNG) para WebP": "WEBP",
+            "Imagem (JPG/PNG) para AVIF": "AVIF",
         }
         
         option = st.selectbox(
@@ -289,8 +323,38 @@ if tool_selection == "Conversor":
         
         selected_types = conversion_options[option][0]
         modo_lote = False
+        todas_planilhas = False
+        juntar_pdf = False
         if option != "Excel para PDF (.pdf)":
             modo_lote = st.toggle("Ativar processamento em lote")
+        else:
+            todas_planilhas = st.toggle("Incluir todas as planilhas")
+        if modo_lote and option == "Imagem (JPG/PNG) para PDF":
+            juntar_pdf = st.toggle(
+                "Juntar todas em um único PDF",
+                help="Uma página por imagem, na ordem do upload. JPEGs entram sem recompressão."
+            )
+        segundo_plano = False
+        if not juntar_pdf:
+            segundo_plano = st.toggle(
+                "Processar em segundo plano",
+                help="Envia para a fila de trabalhos: a página continua livre e o resultado fica disponível mesmo se ela for fechada."
+            )
+
+        max_size = None
+        quality = None
+        if option in image_targets or option == "Imagem (JPG/PNG) para PDF":
+            with st.expander("Ajustes de imagem"):
+                max_size = st.number_input(
+                    "Lado máximo (px, 0 = tamanho original)",
+                    min_value=0, max_value=20000, value=0, step=256,
+                    help="Reduz fotos grandes já na leitura, bem mais rápido que converter no tamanho original."
+                ) or None
+                target_format = normalize_format(image_targets.get(option, "PNG"))
+                if target_format in DEFAULT_QUALITY:
+                    quality = st.slider("Qualidade", min_value=1, max_value=100, value=DEFAULT_QUALITY[target_format])
+                elif juntar_pdf and st.checkbox("Recomprimir as imagens (JPEG)"):
+                    quality = st.slider("Qualidade", min_value=1, max_value=100, value=DEFAULT_QUALITY["JPEG"])
 
         uploaded_files = st.file_uploader(
             f"Faça upload do(s) arquivo(s) ({selected_types})",
@@ -298,78 +362,129 @@ if tool_selection == "Conversor":
             accept_multiple_files=modo_lote,
             label_visibility="collapsed"
         )
+        upload_total = _check_uploads(uploaded_files, "uploaded_files")
         
-        if uploaded_files:
+        if uploaded_files and segundo_plano:
+            queue_operations = {
+                "PDF para Word (.docx)": ("pdf-to-word", {}),
+                "Excel para PDF (.pdf)": ("excel-to-pdf", {"all_sheets": todas_planilhas}),
+                "Imagem (JPG/PNG) para PDF": ("image-to-pdf", {"max_size": max_size}),
+            }
+            for image_option, image_format in image_targets.items():
+                queue_operations[image_option] = (
+                    "image-to-format", {"format": image_format, "max_size": max_size, "quality": quality}
+                )
+            if st.button("Enviar para a fila", use_container_width=True):
+                files_to_queue = uploaded_files if modo_lote else [uploaded_files]
+                try:
+                    operation, options = queue_operations[option]
+                    job_id = _submit_job(operation, files_to_queue, options)
+                    st.success(f"Trabalho `{job_id[:8]}` enviado. Acompanhe abaixo.")
+                except Exception as e:
+                    st.error(f"Não foi possível enviar para a fila: {e}")
+
+        elif uploaded_files:
             if not modo_lote:
                 uploaded_files = [uploaded_files]
             
-            if modo_lote:
-                with st.spinner(f"Processando {len(uploaded_files)} arquivos..."):
+            if juntar_pdf:
+                with _converting(upload_total, f"Montando o PDF com {len(uploaded_files)} imagens..."):
                     try:
-                        zip_buffer = io.BytesIO()
-                        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-                            for uploaded_file in uploaded_files:
-                                file_bytes = uploaded_file.getvalue()
-                                base_name = uploaded_file.name.split('.')[0]
-                                output_bytes = None
-                                file_name_in_zip = "erro.txt"
-                                
-                                if option == "PDF para Word (.docx)":
-                                    output_bytes = convert_pdf_to_word(file_bytes)
-                                    file_name_in_zip = f"{base_name}.docx"
-                                elif option == "PNG para JPG":
-                                    output_bytes = convert_image_to_format(file_bytes, "JPG")
-                                    file_name_in_zip = f"{base_name}.jpg"
-                                elif option == "JPG para PNG":
-                                    output_bytes = convert_image_to_format(file_bytes, "PNG")
-                                    file_name_in_zip = f"{base_name}.png"
-                                elif option == "Imagem (JPG/PNG) para PDF":
-                                    output_bytes = convert_image_to_pdf(file_bytes)
-                                    file_name_in_zip = f"{base_name}.pdf"
-                                
-                                if output_bytes:
-                                    zf.writestr(file_name_in_zip, output_bytes)
-                        
-                        zip_buffer.seek(0)
-                        st.success("Conversão em lote concluída!")
+                        merged_images_pdf = convert_images_to_pdf(
+                            [upload_buffer(f) for f in uploaded_files],
+                            max_size=max_size, quality=quality, workers=default_workers()
+                        )
+                        st.success("PDF montado!")
                         st.download_button(
-                            label="Baixar Arquivos (.zip)",
-                            data=zip_buffer,
-                            file_name="conversao_em_lote.zip",
-                            mime="application/zip",
+                            label="Baixar PDF",
+                            data=merged_images_pdf,
+                            file_name="imagens.pdf",
+                            mime="application/pdf",
                             use_container_width=True
                         )
+                    except Exception as e:
+                        st.error(f"Ocorreu um erro ao montar o PDF: {e}")
+
+            elif modo_lote:
+                batch_conversions = {
+                    "PDF para Word (.docx)": (convert_pdf_to_word, (), "docx"),
+                    "Imagem (JPG/PNG) para PDF": (convert_image_to_pdf, (max_size,), "pdf"),
+                }
+                for image_option, image_format in image_targets.items():
+                    batch_conversions[image_option] = (
+                        convert_image_to_format,
+                        (image_format, max_size, quality),
+                        FORMAT_EXTENSIONS[normalize_format(image_format)],
+                    )
+                convert_func, extra_args, ext = batch_conversions[option]
+                total_files = len(uploaded_files)
+                progress_bar = st.progress(0.0, text=f"Processando {total_files} arquivos...")
+
+                def update_progress(done, total):
+                    progress_bar.progress(done / total, text=f"Processando arquivos... ({done}/{total})")
+
+                with _converting(upload_total):
+                    try:
+                        results = iter_batch(
+                            convert_func,
+                            [(upload_buffer(f),) + extra_args for f in uploaded_files],
+                            on_progress=update_progress
+                        )
+
+                        # Cada saída vai para o .zip (em disco) assim que fica pronta
+                        failed_files = []
+                        with StreamingZip() as archive:
+                            for uploaded_file, result in zip(uploaded_files, results):
+                                base_name = uploaded_file.name.split('.')[0]
+                                if result.ok and result.output:
+                                    archive.add(f"{base_name}.{ext}", result.output)
+                                else:
+                                    failed_files.append(f"{uploaded_file.name}: {result.error or 'arquivo vazio'}")
+
+                        progress_bar.empty()
+                        if failed_files:
+                            st.warning(f"{len(failed_files)} de {total_files} arquivos não puderam ser convertidos:")
+                            st.code("\n".join(failed_files), language=None)
+
+                        if len(failed_files) < total_files:
+                            st.success("Conversão em lote concluída!")
+                            st.download_button(
+                                label="Baixar Arquivos (.zip)",
+                                data=archive.file,
+                                file_name="conversao_em_lote.zip",
+                                mime="application/zip",
+                                use_container_width=True
+                            )
                     except Exception as e:
                         st.error(f"Ocorreu um erro durante o processamento em lote: {e}")
 
             else:
-                with st.spinner("Convertendo..."):
+                with _converting(upload_total, "Convertendo..."):
                     try:
                         uploaded_file = uploaded_files[0]
-                        file_bytes = uploaded_file.getvalue()
+                        file_bytes = upload_buffer(uploaded_file)
                         output_bytes = None
                         file_name = "conversao"
                         mime = "application/octet-stream"
                         base_name = uploaded_file.name.split('.')[0]
 
                         if option == "PDF para Word (.docx)":
-                            output_bytes = convert_pdf_to_word(file_bytes)
+                            output_bytes = convert_pdf_to_word(file_bytes, workers=default_workers())
                             file_name = f"{base_name}.docx"
                             mime = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
                         elif option == "Excel para PDF (.pdf)":
-                            output_bytes = convert_excel_to_pdf(file_bytes)
+                            output_bytes = convert_excel_to_pdf(file_bytes, all_sheets=todas_planilhas)
                             file_name = f"{base_name}.pdf"
                             mime = "application/pdf"
-                        elif option == "PNG para JPG":
-                            output_bytes = convert_image_to_format(file_bytes, "JPG")
-                            file_name = f"{base_name}.jpg"
-                            mime = "image/jpeg"
-                        elif option == "JPG para PNG":
-                            output_bytes = convert_image_to_format(file_bytes, "PNG")
-                            file_name = f"{base_name}.png"
-                            mime = "image/png"
+                        elif option in image_targets:
+                            target_format = normalize_format(image_targets[option])
+                            output_bytes = convert_image_to_format(
+                                file_bytes, target_format, max_size=max_size, quality=quality
+                            )
+                            file_name = f"{base_name}.{FORMAT_EXTENSIONS[target_format]}"
+                            mime = FORMAT_MIMES[target_format]
                         elif option == "Imagem (JPG/PNG) para PDF":
-                            output_bytes = convert_image_to_pdf(file_bytes)
+                            output_bytes = convert_image_to_pdf(file_bytes, max_size=max_size)
                             file_name = f"{base_name}.pdf"
                             mime = "application/pdf"
                         
@@ -386,6 +501,13 @@ if tool_selection == "Conversor":
                         st.error(f"Ocorreu um erro durante a conversão: {e}")
 
 elif tool_selection == "Imagem (IA)":
+    from fileflow.image import remove_background, remove_background_batch, optimize_image
+    from fileflow.imaging import DEFAULT_QUALITY, FORMAT_EXTENSIONS, FORMAT_MIMES, normalize_format
+    from fileflow.archive import StreamingZip
+    from fileflow.batch import iter_batch
+    from fileflow.previews import image_preview, preview_source, preview_width
+    from fileflow.uploads import upload_buffer
+
     with st.container(border=True):
         st.title("Ferramentas de Imagem (com IA)")
         st.markdown("Remova fundos de imagens usando IA ou otimize o tamanho de arquivos.")
@@ -401,6 +523,65 @@ elif tool_selection == "Imagem (IA)":
         )
         
         modo_lote_img = st.toggle("Ativar processamento em lote")
+        segundo_plano_img = st.toggle(
+            "Processar em segundo plano",
+            help="Envia para a fila de trabalhos: a página continua livre e o resultado fica disponível mesmo se ela for fechada.",
+            key="segundo_plano_img"
+        )
+
+        optimize_options = {}
+        if img_option == "Otimizar Imagem":
+            with st.expander("Ajustes de otimização"):
+                formato_saida = st.selectbox("Formato de saída", ["Original", "JPG", "WEBP", "AVIF"])
+                optimize_max_size = st.number_input(
+                    "Lado máximo (px, 0 = tamanho original)",
+                    min_value=0, max_value=20000, value=0, step=256,
+                    key="lado_maximo_img"
+                )
+                default_quality = 85
+                if formato_saida != "Original":
+                    default_quality = DEFAULT_QUALITY[normalize_format(formato_saida)]
+                optimize_max_kb = st.number_input(
+                    "Tamanho máximo do arquivo (KB, 0 = sem limite)",
+                    min_value=0, max_value=100000, value=0, step=50,
+                    help="Busca a maior qualidade que cabe no limite.",
+                    key="tamanho_maximo_img"
+                )
+                optimize_quality = st.slider(
+                    "Qualidade máxima" if optimize_max_kb else "Qualidade",
+                    min_value=1, max_value=100, value=default_quality, key=f"qualidade_img_{formato_saida}"
+                )
+                optimize_allow_resize = True
+                if optimize_max_kb:
+                    optimize_allow_resize = st.checkbox(
+                        "Reduzir as dimensões se a qualidade mínima não bastar", value=True, key="reduzir_img"
+                    )
+            optimize_options = {
+                "max_size": optimize_max_size or None,
+                "quality": optimize_quality,
+                "target_format": None if formato_saida == "Original" else formato_saida,
+                "max_bytes": optimize_max_kb * 1024 or None,
+                "allow_resize": optimize_allow_resize,
+            }
+
+        rembg_options = {}
+        if img_option == "Remover Fundo (IA)":
+            with st.expander("Ajustes da remoção de fundo"):
+                rembg_fast = st.toggle(
+                    "Modo rápido (fotos grandes)",
+                    help="Detecta o objeto numa cópia reduzida e aplica a máscara na imagem original: "
+                         "mais rápido e com menos memória, com bordas um pouco menos precisas.",
+                    key="rapido_rembg"
+                )
+                rembg_format = st.selectbox("Formato de saída", ["PNG", "WEBP", "AVIF"], key="formato_rembg")
+            rembg_options = {"fast": rembg_fast, "target_format": rembg_format}
+            rembg_ext = FORMAT_EXTENSIONS[normalize_format(rembg_format)]
+
+        def optimized_name(file_name):
+            base_name_opt, _, ext_opt = file_name.partition('.')
+            if optimize_options.get("target_format"):
+                ext_opt = FORMAT_EXTENSIONS[normalize_format(optimize_options["target_format"])]
+            return f"{base_name_opt}_otimizada.{ext_opt.split('.')[-1]}"
         
         uploaded_files_img = st.file_uploader(
             "Faça upload do(s) arquivo(s) (JPG ou PNG)",
@@ -408,63 +589,128 @@ elif tool_selection == "Imagem (IA)":
             accept_multiple_files=modo_lote_img,
             label_visibility="collapsed"
         )
+        upload_total = _check_uploads(uploaded_files_img, "uploaded_files_img")
         
-        if uploaded_files_img:
+        if uploaded_files_img and segundo_plano_img:
+            queue_operations_img = {
+                "Remover Fundo (IA)": "remove-background",
+                "Otimizar Imagem": "optimize-image",
+            }
+            if st.button("Enviar para a fila", use_container_width=True, key="enviar_fila_img"):
+                files_to_queue = uploaded_files_img if modo_lote_img else [uploaded_files_img]
+                try:
+                    options_img = {}
+                    if img_option == "Remover Fundo (IA)":
+                        options_img = {"fast": rembg_options["fast"], "format": rembg_options["target_format"]}
+                    elif img_option == "Otimizar Imagem":
+                        options_img = {
+                            "max_size": optimize_options["max_size"],
+                            "quality": optimize_options["quality"],
+                            "format": optimize_options["target_format"],
+                            "max_kb": optimize_options["max_bytes"] and optimize_options["max_bytes"] // 1024,
+                            "no_resize": not optimize_options["allow_resize"],
+                        }
+                    job_id = _submit_job(queue_operations_img[img_option], files_to_queue, options_img)
+                    st.success(f"Trabalho `{job_id[:8]}` enviado. Acompanhe abaixo.")
+                except Exception as e:
+                    st.error(f"Não foi possível enviar para a fila: {e}")
+
+        elif uploaded_files_img:
             if not modo_lote_img:
                 uploaded_files_img = [uploaded_files_img]
             
             if modo_lote_img:
-                with st.spinner(f"Processando {len(uploaded_files_img)} imagens..."):
+                total_images = len(uploaded_files_img)
+                progress_bar_img = st.progress(0.0, text=f"Processando {total_images} imagens...")
+
+                def update_progress_img(done, total):
+                    progress_bar_img.progress(done / total, text=f"Processando imagens... ({done}/{total})")
+
+                with _converting(upload_total):
                     try:
-                        zip_buffer_img = io.BytesIO()
-                        with zipfile.ZipFile(zip_buffer_img, 'w', zipfile.ZIP_DEFLATED) as zf_img:
-                            for uploaded_image in uploaded_files_img:
-                                img_bytes = uploaded_image.getvalue()
+                        images_bytes = [upload_buffer(f) for f in uploaded_files_img]
+                        if img_option == "Remover Fundo (IA)":
+                            results_img = remove_background_batch(
+                                images_bytes, on_progress=update_progress_img, **rembg_options
+                            )
+                        else:
+                            # Um processo por imagem: a busca por tamanho não abre threads
+                            results_img = iter_batch(
+                                optimize_image,
+                                [
+                                    (
+                                        img_bytes, optimize_options["max_size"], optimize_options["quality"],
+                                        optimize_options["target_format"], optimize_options["max_bytes"],
+                                        optimize_options["allow_resize"], 1,
+                                    )
+                                    for img_bytes in images_bytes
+                                ],
+                                on_progress=update_progress_img
+                            )
+
+                        failed_images = []
+                        over_target = []
+                        with StreamingZip() as archive_img:
+                            for uploaded_image, result in zip(uploaded_files_img, results_img):
                                 base_name_img = uploaded_image.name.split('.')[0]
-                                output_img_bytes = None
-                                file_name_in_zip_img = "erro.txt"
-                                
                                 if img_option == "Remover Fundo (IA)":
-                                    output_img_bytes = remove_background(img_bytes)
-                                    file_name_in_zip_img = f"{base_name_img}_sem_fundo.png"
-                                elif img_option == "Otimizar Imagem":
-                                    output_img_bytes = optimize_image(img_bytes)
-                                    ext_img = uploaded_image.name.split('.')[-1]
-                                    file_name_in_zip_img = f"{base_name_img}_otimizada.{ext_img}"
-                                
-                                if output_img_bytes:
-                                    zf_img.writestr(file_name_in_zip_img, output_img_bytes)
-                        
-                        zip_buffer_img.seek(0)
-                        st.success("Processamento em lote concluído!")
-                        st.download_button(
-                            label="Baixar Imagens (.zip)",
-                            data=zip_buffer_img,
-                            file_name="imagens_processadas.zip",
-                            mime="application/zip",
-                            use_container_width=True
-                        )
+                                    file_name_in_zip_img = f"{base_name_img}_sem_fundo.{rembg_ext}"
+                                else:
+                                    file_name_in_zip_img = optimized_name(uploaded_image.name)
+
+                                if result.ok and result.output:
+                                    archive_img.add(file_name_in_zip_img, result.output)
+                                    if optimize_options.get("max_bytes") and len(result.output) > optimize_options["max_bytes"]:
+                                        over_target.append(f"{uploaded_image.name}: {len(result.output) // 1024} KB")
+                                else:
+                                    failed_images.append(f"{uploaded_image.name}: {result.error or 'arquivo vazio'}")
+
+                        progress_bar_img.empty()
+                        if failed_images:
+                            st.warning(f"{len(failed_images)} de {total_images} imagens não puderam ser processadas:")
+                            st.code("\n".join(failed_images), language=None)
+                        if over_target:
+                            st.warning(f"{len(over_target)} imagens não couberam no tamanho máximo (ficou a menor versão obtida):")
+                            st.code("\n".join(over_target), language=None)
+
+                        if len(failed_images) < total_images:
+                            st.success("Processamento em lote concluído!")
+                            st.download_button(
+                                label="Baixar Imagens (.zip)",
+                                data=archive_img.file,
+                                file_name="imagens_processadas.zip",
+                                mime="application/zip",
+                                use_container_width=True
+                            )
                     except Exception as e:
                         st.error(f"Ocorreu um erro durante o processamento em lote: {e}")
             else:
-                with st.spinner("Processando imagem..."):
+                with _converting(upload_total, "Processando imagem..."):
                     try:
                         uploaded_image = uploaded_files_img[0]
-                        img_bytes = uploaded_image.getvalue()
+                        img_bytes = upload_buffer(uploaded_image)
                         output_img_bytes = None
                         file_name_img = "imagem_processada"
                         mime_img = "application/octet-stream"
                         base_name_img = uploaded_image.name.split('.')[0]
                         
                         if img_option == "Remover Fundo (IA)":
-                            output_img_bytes = remove_background(img_bytes)
-                            file_name_img = f"{base_name_img}_sem_fundo.png"
-                            mime_img = "image/png"
+                            output_img_bytes = remove_background(img_bytes, **rembg_options)
+                            file_name_img = f"{base_name_img}_sem_fundo.{rembg_ext}"
+                            mime_img = FORMAT_MIMES[normalize_format(rembg_options["target_format"])]
                         elif img_option == "Otimizar Imagem":
-                            output_img_bytes = optimize_image(img_bytes)
-                            ext_img = uploaded_image.name.split('.')[-1]
-                            file_name_img = f"{base_name_img}_otimizada.{ext_img}"
-                            mime_img = uploaded_image.type
+                            output_img_bytes = optimize_image(img_bytes, **optimize_options)
+                            file_name_img = optimized_name(uploaded_image.name)
+                            if optimize_options["target_format"]:
+                                mime_img = FORMAT_MIMES[normalize_format(optimize_options["target_format"])]
+                            else:
+                                mime_img = uploaded_image.type
+                            if output_img_bytes == img_bytes:
+                                st.info("A imagem original já é a menor versão possível; ela foi mantida.")
+                            elif optimize_options["max_bytes"] and len(output_img_bytes) > optimize_options["max_bytes"]:
+                                st.warning(f"Não foi possível chegar ao tamanho máximo; a menor versão obtida tem {len(output_img_bytes) // 1024} KB.")
+                            else:
+                                st.caption(f"{len(img_bytes) // 1024} KB → {len(output_img_bytes) // 1024} KB")
 
                         if output_img_bytes:
                             st.success("Processamento concluído!")
@@ -477,26 +723,56 @@ elif tool_selection == "Imagem (IA)":
                             )
                             
                             st.divider()
+                            # Previews reduzidos à largura exibida; o arquivo inteiro só sob demanda
                             if img_option == "Remover Fundo (IA)":
                                 st.markdown("##### Comparativo:")
                                 col1, col2 = st.columns(2)
-                                col1.image(img_bytes, caption="Original")
-                                col2.image(output_img_bytes, caption="Fundo Removido")
+                                col1.image(preview_source(image_preview(img_bytes, preview_width(2))), caption="Original")
+                                col2.image(
+                                    preview_source(image_preview(output_img_bytes, preview_width(2))),
+                                    caption="Fundo Removido"
+                                )
                             elif img_option == "Otimizar Imagem":
                                 st.markdown("##### Preview da Imagem Otimizada:")
-                                st.image(output_img_bytes, caption="Imagem Otimizada")
+                                st.image(preview_source(image_preview(output_img_bytes)), caption="Imagem Otimizada (reduzida)")
+                            if st.toggle(
+                                "Ver em tamanho original",
+                                help="Envia a imagem processada inteira ao navegador (pode demorar em conexões lentas).",
+                                key="tamanho_original_img"
+                            ):
+                                st.image(preview_source(output_img_bytes), caption="Tamanho original")
 
                     except Exception as e:
                         st.error(f"Ocorreu um erro ao processar a imagem: {e}")
 
 elif tool_selection == "PDF":
+    from fileflow.pdf import (
+        COMPRESS_DEFAULT_DPI,
+        COMPRESS_DEFAULT_QUALITY,
+        merge_pdfs,
+        split_pdf,
+        edit_pdf_structure,
+        compress_pdf,
+        parse_page_ranges,
+    )
+    from fileflow.thumbnails import (
+        THUMBS_PER_WINDOW,
+        content_hash,
+        pdf_page_count,
+        render_thumbnails,
+        prefetch_thumbnails,
+    )
+    from fileflow.previews import preview_width
+    from fileflow.batch import default_workers
+    from fileflow.uploads import upload_buffer
+
     with st.container(border=True):
         st.title("Ferramentas de PDF")
-        st.markdown("Combine, separe ou edite seus arquivos PDF.")
+        st.markdown("Combine, separe, edite ou comprima seus arquivos PDF.")
         
         pdf_option = st.selectbox(
             "Selecione a ferramenta de PDF:",
-            ["Juntar PDFs", "Dividir PDF (por página)", "Editor de Estrutura"]
+            ["Juntar PDFs", "Dividir PDF (por página)", "Editor de Estrutura", "Comprimir PDF"]
         )
         
         if pdf_option == "Juntar PDFs":
@@ -507,16 +783,17 @@ elif tool_selection == "PDF":
                 accept_multiple_files=True,
                 label_visibility="collapsed"
             )
+            upload_total = _check_uploads(uploaded_pdfs, "uploaded_pdfs")
             
             if uploaded_pdfs and len(uploaded_pdfs) >= 2:
-                with st.spinner(f"Juntando {len(uploaded_pdfs)} PDFs..."):
+                with _converting(upload_total, f"Juntando {len(uploaded_pdfs)} PDFs..."):
                     try:
-                        files_bytes_list = [f.getvalue() for f in uploaded_pdfs]
-                        merged_pdf_bytes = merge_pdfs(files_bytes_list)
+                        # Os uploads são lidos um a um durante a junção
+                        merged_pdf_file = merge_pdfs([upload_buffer(f) for f in uploaded_pdfs])
                         st.success("PDFs juntados com sucesso!")
                         st.download_button(
                             label="Baixar PDF Juntado",
-                            data=merged_pdf_bytes,
+                            data=merged_pdf_file,
                             file_name="pdf_juntado.pdf",
                             mime="application/pdf",
                             use_container_width=True
@@ -527,51 +804,113 @@ elif tool_selection == "PDF":
                 st.warning("Você precisa fazer upload de pelo menos 2 arquivos PDF para juntar.")
 
         elif pdf_option == "Dividir PDF (por página)":
-            st.markdown("Faça upload de um PDF para dividi-lo em páginas separadas.")
+            st.markdown("Faça upload de um PDF para dividi-lo em páginas ou grupos de páginas.")
             uploaded_pdf_split = st.file_uploader(
                 "Selecione o PDF para dividir",
                 type="pdf",
                 accept_multiple_files=False,
                 label_visibility="collapsed"
             )
+            upload_total = _check_uploads(uploaded_pdf_split, "uploaded_pdf_split")
             
             if uploaded_pdf_split:
-                with st.spinner("Dividindo PDF..."):
-                    try:
-                        pdf_bytes = uploaded_pdf_split.getvalue()
-                        zip_bytes = split_pdf(pdf_bytes)
-                        st.success("PDF dividido com sucesso!")
-                        st.download_button(
-                            label="Baixar Páginas (.zip)",
-                            data=zip_bytes,
-                            file_name="pdf_dividido.zip",
-                            mime="application/zip",
-                            use_container_width=True
-                        )
-                    except Exception as e:
-                        st.error(f"Ocorreu um erro ao dividir o PDF: {e}")
+                split_mode = st.radio(
+                    "Como dividir?",
+                    ["Uma página por arquivo", "A cada N páginas", "Intervalos personalizados"],
+                    horizontal=True
+                )
+                pages_per_file = None
+                ranges_text = None
+                if split_mode == "A cada N páginas":
+                    pages_per_file = st.number_input("Páginas por arquivo", min_value=1, value=10, step=1)
+                elif split_mode == "Intervalos personalizados":
+                    ranges_text = st.text_input(
+                        "Intervalos (um arquivo por intervalo)",
+                        placeholder="Ex.: 1-3, 5, 8-"
+                    )
+
+                if split_mode != "Intervalos personalizados" or ranges_text:
+                    with _converting(upload_total, "Dividindo PDF..."):
+                        try:
+                            pdf_bytes = upload_buffer(uploaded_pdf_split)
+                            page_ranges = None
+                            if ranges_text:
+                                page_ranges = parse_page_ranges(ranges_text, pdf_page_count(pdf_bytes))
+                            zip_file = split_pdf(
+                                pdf_bytes,
+                                pages_per_file=pages_per_file,
+                                page_ranges=page_ranges,
+                                workers=default_workers()
+                            )
+                            st.success("PDF dividido com sucesso!")
+                            st.download_button(
+                                label="Baixar Páginas (.zip)",
+                                data=zip_file,
+                                file_name="pdf_dividido.zip",
+                                mime="application/zip",
+                                use_container_width=True
+                            )
+                        except ValueError as e:
+                            st.warning(str(e))
+                        except Exception as e:
+                            st.error(f"Ocorreu um erro ao dividir o PDF: {e}")
         
         elif pdf_option == "Editor de Estrutura":
-            st.markdown("Visualize, exclua e rotacione páginas do seu PDF.")
+            st.markdown("Visualize, exclua, reordene e rotacione páginas do seu PDF.")
             uploaded_pdf_edit = st.file_uploader(
                 "Selecione o PDF para editar",
                 type="pdf",
                 accept_multiple_files=False,
                 label_visibility="collapsed"
             )
+            upload_total = _check_uploads(uploaded_pdf_edit, "uploaded_pdf_edit")
 
             if uploaded_pdf_edit:
                 with st.spinner("Carregando páginas..."):
                     try:
-                        file_bytes = uploaded_pdf_edit.getvalue()
-                        page_images, num_pages = render_pdf_pages(file_bytes)
+                        file_bytes = upload_buffer(uploaded_pdf_edit)
+                        doc_key = content_hash(file_bytes)
+                        num_pages = pdf_page_count(file_bytes, doc_key=doc_key)
                         
                         st.markdown("---")
                         st.markdown("##### Preview das Páginas")
+                        windows = [
+                            (start, min(start + THUMBS_PER_WINDOW, num_pages))
+                            for start in range(0, num_pages, THUMBS_PER_WINDOW)
+                        ]
+                        first, last = windows[0]
+                        if len(windows) > 1:
+                            first, last = st.select_slider(
+                                "Páginas exibidas:",
+                                options=windows,
+                                format_func=lambda w: f"{w[0] + 1}–{w[1]}"
+                            )
+
+                        visible_pages = range(first, last)
+                        # Miniaturas JPEG na largura de uma das três colunas
+                        thumb_width = preview_width(3)
+                        page_images = render_thumbnails(file_bytes, visible_pages, doc_key=doc_key, width=thumb_width)
                         cols = st.columns(3)
-                        for i, img_data in enumerate(page_images):
-                            with cols[i % 3]:
+                        for i, img_data in zip(visible_pages, page_images):
+                            with cols[(i - first) % 3]:
                                 st.image(img_data, caption=f"Página {i+1}", use_container_width=True)
+                        prefetch_thumbnails(
+                            file_bytes,
+                            range(last, min(last + THUMBS_PER_WINDOW, num_pages)),
+                            doc_key=doc_key,
+                            width=thumb_width
+                        )
+                        zoom_page = st.selectbox(
+                            "Ampliar página:",
+                            [None, *range(1, num_pages + 1)],
+                            format_func=lambda page: "Nenhuma" if page is None else f"Página {page}"
+                        )
+                        if zoom_page:
+                            st.image(
+                                render_thumbnails(file_bytes, [zoom_page - 1], doc_key=doc_key, width=preview_width())[0],
+                                caption=f"Página {zoom_page}",
+                                use_container_width=True
+                            )
 
                         st.markdown("---")
                         st.markdown("##### Configurações de Edição")
@@ -584,71 +923,209 @@ elif tool_selection == "PDF":
                             )
                         with col2:
                             pages_to_rotate = st.multiselect(
-                                "Selecione páginas para **ROTACIONAR (90º)**:",
+                                "Selecione páginas para **ROTACIONAR**:",
                                 options=range(1, num_pages + 1),
                                 placeholder="Nenhuma"
                             )
+                            rotation = st.selectbox(
+                                "Rotação",
+                                [90, 180, 270],
+                                format_func=lambda angle: {90: "90º (horário)", 180: "180º", 270: "90º (anti-horário)"}[angle]
+                            )
+                        order_text = st.text_input(
+                            "Nova ordem das páginas (opcional)",
+                            placeholder=f"Ex.: 3, 1-2, 4-{num_pages}",
+                            help="Páginas fora da lista saem do PDF; repetir uma página a duplica."
+                        )
 
                         if st.button("Aplicar Alterações e Baixar"):
-                            with st.spinner("Aplicando alterações..."):
-                                edited_pdf_bytes = edit_pdf_structure(file_bytes, pages_to_delete, pages_to_rotate)
-                                st.success("PDF editado com sucesso!")
-                                st.download_button(
-                                    label="Baixar PDF Editado",
-                                    data=edited_pdf_bytes,
-                                    file_name="pdf_editado.pdf",
-                                    mime="application/pdf",
-                                    use_container_width=True
-                                )
+                            with _converting(upload_total, "Aplicando alterações..."):
+                                try:
+                                    page_order = None
+                                    if order_text.strip():
+                                        page_order = [
+                                            page
+                                            for first, last in parse_page_ranges(order_text, num_pages)
+                                            for page in range(first, last + 1)
+                                        ]
+                                    edited_pdf_bytes = edit_pdf_structure(
+                                        file_bytes, pages_to_delete, pages_to_rotate,
+                                        page_order=page_order, rotation=rotation
+                                    )
+                                    st.success("PDF editado com sucesso!")
+                                    st.download_button(
+                                        label="Baixar PDF Editado",
+                                        data=edited_pdf_bytes,
+                                        file_name="pdf_editado.pdf",
+                                        mime="application/pdf",
+                                        use_container_width=True
+                                    )
+                                except ValueError as e:
+                                    st.warning(str(e))
                     except Exception as e:
                         st.error(f"Ocorreu um erro ao carregar o PDF: {e}")
 
+        elif pdf_option == "Comprimir PDF":
+            st.markdown(
+                "Reduz as imagens para a resolução escolhida, recomprime-as em JPEG e remove "
+                "objetos repetidos ou sem uso. Ideal para PDFs digitalizados."
+            )
+            col_dpi, col_quality = st.columns(2)
+            compress_dpi = col_dpi.select_slider(
+                "Resolução máxima das imagens (DPI)",
+                options=[72, 96, 150, 200, 300],
+                value=COMPRESS_DEFAULT_DPI,
+                help="72-96 para tela, 150 para uso geral, 300 para impressão."
+            )
+            compress_quality = col_quality.slider(
+                "Qualidade das imagens", min_value=10, max_value=95, value=COMPRESS_DEFAULT_QUALITY
+            )
+            uploaded_pdf_compress = st.file_uploader(
+                "Selecione o PDF para comprimir",
+                type="pdf",
+                accept_multiple_files=False,
+                label_visibility="collapsed"
+            )
+            upload_total = _check_uploads(uploaded_pdf_compress, "uploaded_pdf_compress")
+
+            if uploaded_pdf_compress:
+                with _converting(upload_total, "Comprimindo PDF..."):
+                    try:
+                        compressed_pdf_file = compress_pdf(
+                            upload_buffer(uploaded_pdf_compress),
+                            dpi=compress_dpi,
+                            quality=compress_quality,
+                            workers=default_workers()
+                        )
+                        compressed_size = os.fstat(compressed_pdf_file.fileno()).st_size
+                        if compressed_size >= uploaded_pdf_compress.size:
+                            st.info("O PDF já está compacto; o arquivo original foi mantido.")
+                        else:
+                            st.success(
+                                f"PDF comprimido: {uploaded_pdf_compress.size / 1024 / 1024:.1f} MB → "
+                                f"{compressed_size / 1024 / 1024:.1f} MB "
+                                f"({1 - compressed_size / uploaded_pdf_compress.size:.0%} menor)."
+                            )
+                        st.download_button(
+                            label="Baixar PDF Comprimido",
+                            data=compressed_pdf_file,
+                            file_name=f"{uploaded_pdf_compress.name.rsplit('.', 1)[0]}_comprimido.pdf",
+                            mime="application/pdf",
+                            use_container_width=True
+                        )
+                    except ValueError as e:
+                        st.warning(str(e))
+                    except Exception as e:
+                        st.error(f"Ocorreu um erro ao comprimir o PDF: {e}")
+
 elif tool_selection == "Dados":
+    from fileflow.data import (
+        arrow_available,
+        convert_excel_to_json,
+        convert_csv_to_json,
+        convert_json_to_csv,
+        convert_excel_to_json_streaming,
+        convert_csv_to_json_streaming,
+        convert_json_to_csv_streaming,
+        convert_csv_to_parquet,
+        convert_json_to_parquet,
+        convert_parquet_to_csv,
+        convert_parquet_to_json,
+    )
+    from fileflow.uploads import upload_buffer
+
     with st.container(border=True):
         st.title("Ferramentas de Dados")
-        st.markdown("Converta formatos de dados estruturados (Excel, CSV, JSON).")
+        st.markdown("Converta formatos de dados estruturados (Excel, CSV, JSON, Parquet).")
         
+        # Opção -> (extensões aceitas, formato de saída)
         data_options = {
-            "Excel (.xlsx) para JSON": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
-            "CSV para JSON": ("csv", "text/csv"),
-            "JSON para CSV": ("json", "application/json"),
+            "Excel (.xlsx) para JSON": (["xlsx"], "json"),
+            "CSV para JSON": (["csv"], "json"),
+            "JSON para CSV": (["json", "jsonl", "ndjson"], "csv"),
         }
+        if arrow_available():
+            data_options.update({
+                "CSV para Parquet": (["csv"], "parquet"),
+                "JSON para Parquet": (["json", "jsonl", "ndjson"], "parquet"),
+                "Parquet para CSV": (["parquet"], "csv"),
+                "Parquet para JSON": (["parquet"], "json"),
+            })
         
         data_option = st.selectbox(
             "Selecione o tipo de conversão:",
             list(data_options.keys())
         )
         
-        selected_data_types = data_options[data_option][0]
+        selected_data_types, output_kind = data_options[data_option]
+
+        # Parquet é lido sempre em lotes; a escrita de Parquet é em memória
+        if data_option.startswith("Parquet"):
+            modo_streaming = True
+        elif output_kind == "parquet":
+            modo_streaming = False
+        else:
+            modo_streaming = st.toggle(
+                "Modo streaming (arquivos grandes)",
+                help="Lê e escreve o arquivo em blocos, mantendo o uso de memória constante."
+            )
+        ndjson_output = False
+        if output_kind == "json" and modo_streaming:
+            ndjson_output = st.radio(
+                "Formato de saída:",
+                ["JSON", "NDJSON (uma linha por registro)"],
+                horizontal=True
+            ) != "JSON"
         
         uploaded_data_file = st.file_uploader(
-            f"Faça upload do seu arquivo ({selected_data_types})",
+            f"Faça upload do seu arquivo ({', '.join(selected_data_types)})",
             type=selected_data_types,
             accept_multiple_files=False,
             label_visibility="collapsed"
         )
+        upload_total = _check_uploads(uploaded_data_file, "uploaded_data_file")
         
         if uploaded_data_file:
-            with st.spinner("Convertendo dados..."):
+            with _converting(upload_total, "Convertendo dados..."):
                 try:
-                    data_bytes = uploaded_data_file.getvalue()
                     output_data_bytes = None
-                    data_file_name = "dados"
-                    data_mime = "application/octet-stream"
                     data_base_name = uploaded_data_file.name.split('.')[0]
 
-                    if data_option == "Excel (.xlsx) para JSON":
-                        output_data_bytes = convert_excel_to_json(data_bytes)
-                        data_file_name = f"{data_base_name}.json"
-                        data_mime = "application/json"
-                    elif data_option == "CSV para JSON":
-                        output_data_bytes = convert_csv_to_json(data_bytes)
-                        data_file_name = f"{data_base_name}.json"
-                        data_mime = "application/json"
-                    elif data_option == "JSON para CSV":
-                        output_data_bytes = convert_json_to_csv(data_bytes)
+                    if modo_streaming:
+                        # O UploadedFile é passado direto, sem ler o arquivo inteiro
+                        uploaded_data_file.seek(0)
+                        if data_option == "Excel (.xlsx) para JSON":
+                            output_data_bytes = convert_excel_to_json_streaming(uploaded_data_file, ndjson=ndjson_output)
+                        elif data_option == "CSV para JSON":
+                            output_data_bytes = convert_csv_to_json_streaming(uploaded_data_file, ndjson=ndjson_output)
+                        elif data_option == "JSON para CSV":
+                            output_data_bytes = convert_json_to_csv_streaming(uploaded_data_file)
+                        elif data_option == "Parquet para CSV":
+                            output_data_bytes = convert_parquet_to_csv(uploaded_data_file)
+                        elif data_option == "Parquet para JSON":
+                            output_data_bytes = convert_parquet_to_json(uploaded_data_file, ndjson=ndjson_output)
+                    else:
+                        data_bytes = upload_buffer(uploaded_data_file)
+                        if data_option == "Excel (.xlsx) para JSON":
+                            output_data_bytes = convert_excel_to_json(data_bytes)
+                        elif data_option == "CSV para JSON":
+                            output_data_bytes = convert_csv_to_json(data_bytes)
+                        elif data_option == "JSON para CSV":
+                            output_data_bytes = convert_json_to_csv(data_bytes)
+                        elif data_option == "CSV para Parquet":
+                            output_data_bytes = convert_csv_to_parquet(data_bytes)
+                        elif data_option == "JSON para Parquet":
+                            output_data_bytes = convert_json_to_parquet(data_bytes)
+
+                    if output_kind == "json":
+                        data_file_name = f"{data_base_name}.{'ndjson' if ndjson_output else 'json'}"
+                        data_mime = "application/x-ndjson" if ndjson_output else "application/json"
+                    elif output_kind == "csv":
                         data_file_name = f"{data_base_name}.csv"
                         data_mime = "text/csv"
+                    else:
+                        data_file_name = f"{data_base_name}.parquet"
+                        data_mime = "application/vnd.apache.parquet"
 
                     if output_data_bytes:
                         st.success("Conversão de dados concluída!")
@@ -663,6 +1140,162 @@ elif tool_selection == "Dados":
                     st.error(f"Ocorreu um erro ao converter os dados: {e}")
                     st.exception(e)
 
+elif tool_selection == "Pipeline":
+    from fileflow.pipeline import IMAGE, PDF, TABLE, INPUT_FORMATS, STEPS, plan_pipeline, run_pipeline
+    from fileflow.data import TABLE_WRITE_FORMATS
+    from fileflow.pdf import COMPRESS_DEFAULT_DPI
+    from fileflow.imaging import FORMAT_MIMES, normalize_format
+    from fileflow.archive import StreamingZip
+    from fileflow.batch import iter_batch
+    from fileflow.uploads import upload_buffer
+
+    with st.container(border=True):
+        st.title("Pipeline de Operações")
+        st.markdown(
+            "Encadeie etapas (ex.: remover fundo → otimizar → PDF). O arquivo é decodificado "
+            "uma vez e codificado só no fim, sem arquivos intermediários."
+        )
+
+        pipeline_inputs = {"Imagem": IMAGE, "PDF": PDF, "Dados": TABLE}
+        pipeline_input = st.selectbox("Tipo de arquivo de entrada:", list(pipeline_inputs.keys()))
+        pipeline_kind = pipeline_inputs[pipeline_input]
+
+        # As etapas ficam na sessão, separadas por tipo de entrada
+        pipeline_steps = st.session_state.setdefault("pipeline_steps", {}).setdefault(pipeline_kind, [])
+
+        current_kind = pipeline_kind
+        for name, _ in pipeline_steps:
+            current_kind = STEPS[name].output
+
+        if pipeline_steps:
+            st.markdown("##### Etapas:")
+            for i, (name, step_options) in enumerate(pipeline_steps):
+                col_step, col_remove = st.columns([5, 1])
+                details = ", ".join(f"{key}={value}" for key, value in step_options.items() if value not in (None, "", False))
+                col_step.markdown(f"{i + 1}. {STEPS[name].help}" + (f" ({details})" if details else ""))
+                if col_remove.button("Remover", key=f"remover_etapa_{pipeline_kind}_{i}", use_container_width=True):
+                    # Remove também as etapas seguintes, que dependiam do tipo desta
+                    del pipeline_steps[i:]
+                    st.rerun()
+
+        available_steps = {step.help: name for name, step in STEPS.items() if step.input == current_kind}
+        with st.expander("Adicionar etapa", expanded=not pipeline_steps):
+            new_step = available_steps[st.selectbox("Etapa:", list(available_steps.keys()))]
+            new_options = {}
+            if new_step == "remove-background":
+                new_options["fast"] = st.toggle("Modo rápido (fotos grandes)", key="rapido_pipeline")
+            elif new_step == "resize":
+                new_options["max_size"] = st.number_input("Lado máximo (px)", min_value=16, max_value=20000, value=1600, step=256)
+            elif new_step == "optimize":
+                formato_pipeline = st.selectbox("Formato de saída", ["Original", "PNG", "JPG", "WEBP", "AVIF"])
+                new_options["format"] = None if formato_pipeline == "Original" else formato_pipeline
+                new_options["quality"] = st.slider("Qualidade", min_value=1, max_value=100, value=85)
+                max_kb_pipeline = st.number_input(
+                    "Tamanho máximo do arquivo (KB, 0 = sem limite)", min_value=0, max_value=100000, value=0, step=50
+                )
+                new_options["max_bytes"] = max_kb_pipeline * 1024 or None
+            elif new_step == "to-pdf":
+                new_options["dpi"] = st.number_input("Resolução (DPI)", min_value=10, max_value=1200, value=100, step=50)
+            elif new_step == "rotate-pages":
+                new_options["rotation"] = st.selectbox("Rotação (graus, horário)", [90, 180, 270])
+                new_options["pages"] = st.text_input("Páginas (vazio = todas)", placeholder="1-3, 5")
+            elif new_step == "compress-pdf":
+                new_options["dpi"] = st.select_slider(
+                    "Resolução máxima das imagens (DPI)", options=[72, 96, 150, 200, 300], value=COMPRESS_DEFAULT_DPI
+                )
+            elif new_step == "delete-pages":
+                new_options["pages"] = st.text_input("Páginas a excluir", placeholder="1-3, 5")
+            elif new_step == "select-columns":
+                new_options["columns"] = st.text_input("Colunas (separadas por vírgula)")
+            elif new_step == "sort-rows":
+                new_options["column"] = st.text_input("Coluna")
+                new_options["descending"] = st.checkbox("Ordem decrescente")
+            elif new_step == "table-format":
+                new_options["format"] = st.selectbox("Formato de saída", list(TABLE_WRITE_FORMATS))
+
+            if st.button("Adicionar etapa", use_container_width=True):
+                pipeline_steps.append((new_step, new_options))
+                st.rerun()
+
+        uploaded_pipeline_files = st.file_uploader(
+            f"Faça upload do(s) arquivo(s) ({', '.join(INPUT_FORMATS[pipeline_kind])})",
+            type=list(INPUT_FORMATS[pipeline_kind]),
+            accept_multiple_files=True,
+            label_visibility="collapsed"
+        )
+        upload_total = _check_uploads(uploaded_pipeline_files, "uploaded_pipeline_files")
+
+        pipeline_mimes = {
+            "pdf": "application/pdf",
+            "csv": "text/csv",
+            "json": "application/json",
+            "ndjson": "application/x-ndjson",
+            "parquet": "application/vnd.apache.parquet",
+        }
+
+        if uploaded_pipeline_files and pipeline_steps and st.button("Executar pipeline", use_container_width=True):
+            try:
+                extensions = [f.name.rsplit('.', 1)[-1].lower() for f in uploaded_pipeline_files]
+                output_extensions = [plan_pipeline(ext, pipeline_steps) for ext in extensions]
+
+                if len(uploaded_pipeline_files) == 1:
+                    with _converting(upload_total, "Executando pipeline..."):
+                        output_pipeline_bytes = run_pipeline(
+                            upload_buffer(uploaded_pipeline_files[0]), extensions[0], pipeline_steps
+                        )
+                    output_ext = output_extensions[0]
+                    st.success("Pipeline concluído!")
+                    st.download_button(
+                        label="Baixar Resultado",
+                        data=output_pipeline_bytes,
+                        file_name=f"{uploaded_pipeline_files[0].name.rsplit('.', 1)[0]}_pipeline.{output_ext}",
+                        mime=pipeline_mimes.get(output_ext) or FORMAT_MIMES[normalize_format(output_ext)],
+                        use_container_width=True
+                    )
+                else:
+                    total_pipeline = len(uploaded_pipeline_files)
+                    progress_bar_pipeline = st.progress(0.0, text=f"Processando {total_pipeline} arquivos...")
+
+                    def update_progress_pipeline(done, total):
+                        progress_bar_pipeline.progress(done / total, text=f"Processando arquivos... ({done}/{total})")
+
+                    with _converting(upload_total):
+                        results_pipeline = iter_batch(
+                            run_pipeline,
+                            [(upload_buffer(f), ext, pipeline_steps) for f, ext in zip(uploaded_pipeline_files, extensions)],
+                            on_progress=update_progress_pipeline,
+                            # Com remoção de fundo, threads compartilham a sessão do rembg
+                            use_threads=any(name == "remove-background" for name, _ in pipeline_steps)
+                        )
+                        failed_pipeline = []
+                        with StreamingZip() as archive_pipeline:
+                            for uploaded_file, output_ext, result in zip(uploaded_pipeline_files, output_extensions, results_pipeline):
+                                if result.ok:
+                                    archive_pipeline.add(
+                                        f"{uploaded_file.name.rsplit('.', 1)[0]}_pipeline.{output_ext}", result.output
+                                    )
+                                else:
+                                    failed_pipeline.append(f"{uploaded_file.name}: {result.error}")
+
+                        progress_bar_pipeline.empty()
+                        if failed_pipeline:
+                            st.warning(f"{len(failed_pipeline)} de {total_pipeline} arquivos não puderam ser processados:")
+                            st.code("\n".join(failed_pipeline), language=None)
+                        if len(failed_pipeline) < total_pipeline:
+                            st.success("Pipeline concluído!")
+                            st.download_button(
+                                label="Baixar Resultados (.zip)",
+                                data=archive_pipeline.file,
+                                file_name="pipeline.zip",
+                                mime="application/zip",
+                                use_container_width=True
+                        )
+            except Exception as e:
+                st.error(f"Ocorreu um erro ao executar o pipeline: {e}")
+
+_show_jobs_panel()
+_show_metrics_panel()
+
 github_icon_svg = """
 <svg role="img" viewBox="0 0 24 24" xmlns="http://www.w3.org/2000/svg">
 <title>GitHub</title>
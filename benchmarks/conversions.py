@@ -0,0 +1,468 @@
+"""
+Suíte de benchmarks das conversões do FileFlow, por faixa de tamanho.
+
+Gera offline um corpus sintético e determinístico para cada faixa (PDFs de
+várias páginas, XLSX/CSV grandes, JSON aninhado e fotos PNG/JPG em alta
+resolução) e mede cada função pública usada pelo app: tempo (menor de
+--repeat execuções), vazão e pico de memória (acréscimo de RSS de um
+processo filho por caso). Com --save/--compare, os resultados viram uma
+linha de base em JSON e as regressões fazem o script sair com código 1.
+Requer Linux.
+
+    python benchmarks/conversions.py --tiers pequeno medio
+    python benchmarks/conversions.py --save conversoes.json
+    python benchmarks/conversions.py --compare conversoes.json --tolerance 0.25
+    python benchmarks/conversions.py --cases pdf csv  # filtra pelo nome
+"""
+import argparse
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+# Sem cache (mediria o acerto, não a conversão) e sem métricas
+os.environ["FILEFLOW_CACHE"] = "0"
+os.environ["FILEFLOW_METRICS"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fileflow import metrics  # noqa: E402
+from images import build_corpus as build_photos  # noqa: E402
+
+# Tamanho de cada faixa: páginas dos PDFs, linhas das planilhas/CSV/JSON,
+# megapixels e quantidade de fotos
+TIERS = {
+    "pequeno": {"pdf_pages": 5, "rows": 2_000, "json_rows": 1_000, "megapixels": 1, "photos": 4},
+    "medio": {"pdf_pages": 40, "rows": 50_000, "json_rows": 20_000, "megapixels": 6, "photos": 8},
+    "grande": {"pdf_pages": 200, "rows": 300_000, "json_rows": 100_000, "megapixels": 24, "photos": 16},
+}
+
+_CITIES = ["São Paulo", "Rio de Janeiro", "Belo Horizonte", "Curitiba", "Recife", "Porto Alegre"]
+_CATEGORIES = ["serviço", "produto", "assinatura", "frete"]
+
+
+# --- Corpus ---
+
+def _build_pdf(path, num_pages, rng):
+    import fitz  # PyMuPDF
+
+    logo = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 200, 200), False)
+    logo.clear_with(200)
+    logo = logo.tobytes("png")
+    doc = fitz.open()
+    for p in range(num_pages):
+        page = doc.new_page()
+        page.insert_image(fitz.Rect(40, 30, 120, 110), stream=logo)
+        page.insert_text((140, 70), f"Relatório mensal - página {p + 1}", fontsize=16)
+        for line in range(45):
+            page.insert_text(
+                (40, 140 + line * 14),
+                f"{line + 1:03d}  {rng.choice(_CITIES):<16} {rng.choice(_CATEGORIES):<12} R$ {rng.uniform(10, 9999):>10.2f}",
+                fontname="cour", fontsize=9,
+            )
+    doc.save(path, garbage=1, deflate=True)
+    doc.close()
+
+
+def _rows(num_rows, rng):
+    start = datetime.date(2024, 1, 1)
+    for i in range(num_rows):
+        yield (
+            i + 1,
+            f"Cliente {rng.randrange(10_000):05d}",
+            rng.choice(_CITIES),
+            rng.choice(_CATEGORIES),
+            round(rng.uniform(10, 9999), 2),
+            rng.randrange(1, 50),
+            (start + datetime.timedelta(days=rng.randrange(730))).isoformat(),
+        )
+
+
+_HEADER = ("id", "cliente", "cidade", "categoria", "valor", "quantidade", "data")
+
+
+def _build_csv(path, num_rows, rng):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(",".join(_HEADER) + "\n")
+        for row in _rows(num_rows, rng):
+            f.write(",".join(str(v) for v in row) + "\n")
+
+
+def _build_xlsx(path, num_rows, rng):
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Vendas")
+    ws.append(_HEADER)
+    for row in _rows(num_rows, rng):
+        ws.append(row)
+    wb.save(path)
+
+
+def _build_json(path, num_rows, rng):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i, row in enumerate(_rows(num_rows, rng)):
+            record = {
+                "id": row[0],
+                "cliente": {"nome": row[1], "endereco": {"cidade": row[2], "uf": "SP"}},
+                "pedido": {"categoria": row[3], "valor": row[4], "quantidade": row[5]},
+                "data": row[6],
+            }
+            f.write(("," if i else "") + json.dumps(record, ensure_ascii=False))
+        f.write("]")
+
+
+def build_corpus(directory, tier):
+    """Escreve o corpus da faixa em directory e retorna {tipo: caminho(s)}."""
+    size = TIERS[tier]
+    rng = random.Random(f"fileflow-{tier}")
+    corpus = {
+        "pdf": os.path.join(directory, "relatorio.pdf"),
+        "csv": os.path.join(directory, "vendas.csv"),
+        "xlsx": os.path.join(directory, "vendas.xlsx"),
+        "json": os.path.join(directory, "vendas.json"),
+    }
+    _build_pdf(corpus["pdf"], size["pdf_pages"], rng)
+    _build_csv(corpus["csv"], size["rows"], rng)
+    _build_xlsx(corpus["xlsx"], size["rows"], rng)
+    _build_json(corpus["json"], size["json_rows"], rng)
+
+    photos, _ = build_photos(size["photos"], size["megapixels"], seed=len(tier))
+    corpus["jpg"], corpus["png"] = [], []
+    for name, data in photos:
+        path = os.path.join(directory, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        corpus["jpg" if name.endswith(".jpg") else "png"].append(path)
+    return corpus
+
+
+# --- Casos ---
+
+# Cada caso recebe o corpus, faz os imports e a leitura (fora da medição) e
+# devolve (bytes de entrada, itens, unidade, função medida); a função medida
+# retorna o tamanho da saída em bytes.
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _size(result):
+    if isinstance(result, (bytes, bytearray)):
+        return len(result)
+    size = os.fstat(result.fileno()).st_size if hasattr(result, "fileno") else len(result.read())
+    result.close()
+    return size
+
+
+def _pdf_pages(data):
+    from fileflow.thumbnails import pdf_page_count
+    return pdf_page_count(data)
+
+
+def case_pdf_to_word(corpus):
+    from fileflow.convert import convert_pdf_to_word
+    data = _read(corpus["pdf"])
+    return len(data), _pdf_pages(data), "páginas", lambda: _size(convert_pdf_to_word(data))
+
+
+def case_merge_pdfs(corpus):
+    from fileflow.pdf import merge_pdfs
+    data = _read(corpus["pdf"])
+    return 4 * len(data), 4 * _pdf_pages(data), "páginas", lambda: _size(merge_pdfs([data] * 4))
+
+
+def case_split_pdf(corpus):
+    from fileflow.pdf import split_pdf
+    data = _read(corpus["pdf"])
+    return len(data), _pdf_pages(data), "páginas", lambda: _size(split_pdf(data))
+
+
+def case_edit_pdf(corpus):
+    from fileflow.pdf import edit_pdf_structure
+    data = _read(corpus["pdf"])
+    pages = _pdf_pages(data)
+    to_delete, to_rotate = list(range(2, pages + 1, 3)), list(range(1, pages + 1, 2))
+    return len(data), pages, "páginas", lambda: _size(edit_pdf_structure(data, to_delete, to_rotate))
+
+
+def case_compress_pdf(corpus):
+    import fitz  # PyMuPDF
+
+    from fileflow.batch import default_workers
+    from fileflow.pdf import compress_pdf
+
+    # "Digitalização": cada foto ocupando uma página A4 inteira
+    doc = fitz.open()
+    for path in corpus["jpg"] + corpus["png"]:
+        page = doc.new_page()
+        page.insert_image(page.rect, filename=path)
+    data = doc.tobytes(garbage=1)
+    doc.close()
+    return len(data), _pdf_pages(data), "páginas", lambda: _size(compress_pdf(data, workers=default_workers()))
+
+
+def case_render_pdf(corpus):
+    from fileflow.pdf import render_pdf_pages
+    data = _read(corpus["pdf"])
+    return len(data), _pdf_pages(data), "páginas", lambda: sum(len(image) for image in render_pdf_pages(data)[0])
+
+
+def _photos_case(corpus, kind, convert):
+    photos = [_read(path) for path in corpus[kind]]
+    return sum(map(len, photos)), len(photos), "imagens", lambda: sum(_size(convert(data)) for data in photos)
+
+
+def case_png_to_jpg(corpus):
+    from fileflow.convert import convert_image_to_format
+    return _photos_case(corpus, "png", lambda data: convert_image_to_format(data, "JPG"))
+
+
+def case_jpg_to_png(corpus):
+    from fileflow.convert import convert_image_to_format
+    return _photos_case(corpus, "jpg", lambda data: convert_image_to_format(data, "PNG"))
+
+
+def case_jpg_to_webp(corpus):
+    from fileflow.convert import convert_image_to_format
+    return _photos_case(corpus, "jpg", lambda data: convert_image_to_format(data, "WEBP"))
+
+
+def case_image_to_pdf(corpus):
+    from fileflow.convert import convert_image_to_pdf
+    return _photos_case(corpus, "jpg", convert_image_to_pdf)
+
+
+def case_images_to_pdf(corpus):
+    from fileflow.convert import convert_images_to_pdf
+    paths = corpus["jpg"] + corpus["png"]
+    data = [_read(path) for path in paths]
+    return sum(map(len, data)), len(data), "imagens", lambda: _size(convert_images_to_pdf(data))
+
+
+def case_optimize_image(corpus):
+    from fileflow.image import optimize_image
+    return _photos_case(corpus, "jpg", lambda data: optimize_image(data, max_size=2048))
+
+
+def case_optimize_image_200kb(corpus):
+    from fileflow.image import optimize_image
+    return _photos_case(corpus, "jpg", lambda data: optimize_image(data, max_bytes=200 * 1024))
+
+
+def case_remove_background(corpus):
+    from fileflow.image import remove_background
+    return _photos_case(corpus, "jpg", remove_background)
+
+
+def case_remove_background_fast(corpus):
+    from fileflow.image import remove_background
+    return _photos_case(corpus, "jpg", lambda data: remove_background(data, fast=True))
+
+
+def _table_case(path, rows, convert):
+    data = _read(path)
+    return len(data), rows, "linhas", lambda: _size(convert(data))
+
+
+def case_excel_to_pdf(corpus):
+    from fileflow.convert import convert_excel_to_pdf
+    return _table_case(corpus["xlsx"], corpus["rows"], convert_excel_to_pdf)
+
+
+def case_excel_to_json(corpus):
+    from fileflow.data import convert_excel_to_json
+    return _table_case(corpus["xlsx"], corpus["rows"], convert_excel_to_json)
+
+
+def case_excel_to_json_streaming(corpus):
+    from fileflow.data import convert_excel_to_json_streaming
+    return _table_case(corpus["xlsx"], corpus["rows"], convert_excel_to_json_streaming)
+
+
+def case_csv_to_json(corpus):
+    from fileflow.data import convert_csv_to_json
+    return _table_case(corpus["csv"], corpus["rows"], convert_csv_to_json)
+
+
+def case_csv_to_json_streaming(corpus):
+    from fileflow.data import convert_csv_to_json_streaming
+    return _table_case(corpus["csv"], corpus["rows"], convert_csv_to_json_streaming)
+
+
+def case_json_to_csv(corpus):
+    from fileflow.data import convert_json_to_csv
+    return _table_case(corpus["json"], corpus["json_rows"], convert_json_to_csv)
+
+
+def case_json_to_csv_streaming(corpus):
+    from fileflow.data import convert_json_to_csv_streaming
+    return _table_case(corpus["json"], corpus["json_rows"], convert_json_to_csv_streaming)
+
+
+def case_csv_to_parquet(corpus):
+    from fileflow.data import convert_csv_to_parquet
+    return _table_case(corpus["csv"], corpus["rows"], convert_csv_to_parquet)
+
+
+def case_json_to_parquet(corpus):
+    from fileflow.data import convert_json_to_parquet
+    return _table_case(corpus["json"], corpus["json_rows"], convert_json_to_parquet)
+
+
+def _parquet_case(corpus, convert):
+    from fileflow.data import convert_csv_to_parquet
+    data = convert_csv_to_parquet(_read(corpus["csv"]))
+    return len(data), corpus["rows"], "linhas", lambda: _size(convert(data))
+
+
+def case_parquet_to_csv(corpus):
+    from fileflow.data import convert_parquet_to_csv
+    return _parquet_case(corpus, convert_parquet_to_csv)
+
+
+def case_parquet_to_json(corpus):
+    from fileflow.data import convert_parquet_to_json
+    return _parquet_case(corpus, convert_parquet_to_json)
+
+
+CASES = {name[len("case_"):]: func for name, func in globals().items() if name.startswith("case_")}
+
+# Fora do padrão: o modelo do rembg é baixado da internet na primeira vez
+OPTIONAL_CASES = {"remove_background", "remove_background_fast"}
+
+
+# --- Execução ---
+
+def _rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 1024 / 1024
+
+
+def _run_case(name, corpus, queue):
+    logging.disable(logging.INFO)  # progresso do pdf2docx
+    try:
+        input_bytes, items, unit, run = CASES[name](corpus)
+        # Pico zerado depois da preparação: conta só a conversão (sem
+        # clear_refs, fica o pico do processo, como no merge_pdfs.py)
+        metrics._reset_peak_rss()
+        rss_start = _rss_mb()
+        start = time.perf_counter()
+        output_bytes = run()
+        elapsed = time.perf_counter() - start
+        peak_mb = metrics._peak_rss() / 1024 / 1024 - rss_start
+        queue.put({
+            "seconds": elapsed, "peak_mb": peak_mb, "input_bytes": input_bytes,
+            "items": items, "unit": unit, "output_bytes": output_bytes,
+        })
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def measure(ctx, name, corpus, repeat):
+    """Executa o caso repeat vezes, cada uma em um processo novo; fica com a mais rápida."""
+    best = None
+    for _ in range(repeat):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run_case, args=(name, corpus, queue))
+        proc.start()
+        result = queue.get()
+        proc.join()
+        if "error" in result:
+            return result
+        if best is None or result["seconds"] < best["seconds"]:
+            # O pico considerado é o maior entre as execuções
+            result["peak_mb"] = max(result["peak_mb"], best["peak_mb"] if best else 0)
+            best = result
+        else:
+            best["peak_mb"] = max(best["peak_mb"], result["peak_mb"])
+    return best
+
+
+def compare(results, baseline, tolerance, memory_tolerance):
+    """Lista as regressões de tempo e de memória em relação à linha de base."""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None or "error" in result or "error" in base:
+            continue
+        if result["seconds"] > base["seconds"] * (1 + tolerance):
+            regressions.append(f"{key}: {base['seconds']:.3f} -> {result['seconds']:.3f} s")
+        # Picos pequenos variam muito em termos relativos: margem de 20 MB
+        if result["peak_mb"] > base["peak_mb"] * (1 + memory_tolerance) + 20:
+            regressions.append(f"{key}: pico {base['peak_mb']:.0f} -> {result['peak_mb']:.0f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tiers", nargs="+", choices=list(TIERS), default=["pequeno", "medio"])
+    parser.add_argument("--cases", nargs="+", help="filtra os casos pelo nome (substring)")
+    parser.add_argument("--with-rembg", action="store_true", help="inclui a remoção de fundo (baixa o modelo)")
+    parser.add_argument("--repeat", type=int, default=3, help="execuções por caso (usa a mais rápida)")
+    parser.add_argument("--save", help="grava os resultados em JSON (linha de base)")
+    parser.add_argument("--compare", help="compara com uma linha de base em JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="piora de tempo aceita (fração)")
+    parser.add_argument("--memory-tolerance", type=float, default=0.25, help="piora de pico de memória aceita (fração)")
+    args = parser.parse_args()
+
+    names = [
+        name for name in CASES
+        if (args.with_rembg or name not in OPTIONAL_CASES)
+        and (not args.cases or any(pattern in name for pattern in args.cases))
+    ]
+    # PyMuPDF carregado no pai: o aviso de importação sai uma vez só
+    import fitz  # noqa: F401
+
+    ctx = multiprocessing.get_context("fork")
+    results = {}
+    print(f"{'caso':<30}{'faixa':<9}{'tempo (s)':>10}{'itens/s':>12}{'MB/s':>8}{'pico RSS (+MB)':>16}{'saída (MB)':>12}")
+    for tier in args.tiers:
+        with tempfile.TemporaryDirectory() as directory:
+            # Corpus gerado em outro processo: os filhos herdam o RSS do pai
+            with ctx.Pool(1) as pool:
+                corpus = pool.apply(build_corpus, (directory, tier))
+            corpus["rows"] = TIERS[tier]["rows"]
+            corpus["json_rows"] = TIERS[tier]["json_rows"]
+
+            for name in names:
+                result = measure(ctx, name, corpus, args.repeat)
+                key = f"{name}/{tier}"
+                results[key] = result
+                if "error" in result:
+                    print(f"{name:<30}{tier:<9}  FALHOU: {result['error']}")
+                    continue
+                seconds = result["seconds"]
+                rate = result["items"] / seconds
+                print(
+                    f"{name:<30}{tier:<9}{seconds:>10.3f}"
+                    f"{rate:>8.{1 if rate < 10 else 0}f} {result['unit'][:3]}"
+                    f"{result['input_bytes'] / 1024 / 1024 / seconds:>8.1f}"
+                    f"{result['peak_mb']:>16.1f}{result['output_bytes'] / 1024 / 1024:>12.2f}"
+                )
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+        if regressions:
+            print("\nRegressões:\n  " + "\n  ".join(regressions))
+            return 1
+        print("\nSem regressões em relação à linha de base.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Benchmark do pipeline de imagens (fileflow.imaging): vazão e tamanho de
+saída por formato, lado máximo e qualidade, sobre um corpus sintético de
+fotos (gradientes, formas e ruído de sensor) salvas em JPEG e PNG.
+
+    python benchmarks/images.py --count 4 --megapixels 24
+    python benchmarks/images.py --formats JPG WEBP --max-sizes 0 2048 1024
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fileflow.imaging import encode_image, open_image  # noqa: E402
+
+
+def build_corpus(count, megapixels, seed=0):
+    """Gera count fotos sintéticas (metade JPEG q92, metade PNG) em bytes."""
+    rng = np.random.default_rng(seed)
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    corpus = []
+    for i in range(count):
+        y, x = np.mgrid[0:height, 0:width]
+        base = np.stack([
+            x * 255 // width,
+            y * 255 // height,
+            (x + y + i * 40) * 255 // (width + height),
+        ], axis=-1).astype(np.int16)
+        base += rng.normal(0, 6, base.shape).astype(np.int16)
+        img = Image.fromarray(np.clip(base, 0, 255).astype(np.uint8))
+        draw = ImageDraw.Draw(img)
+        for _ in range(30):
+            x0, y0 = rng.integers(0, width), rng.integers(0, height)
+            size = int(rng.integers(width // 40, width // 8))
+            draw.ellipse((x0, y0, x0 + size, y0 + size), fill=tuple(int(c) for c in rng.integers(0, 255, 3)))
+
+        buffer = io.BytesIO()
+        if i % 2 == 0:
+            img.save(buffer, format="JPEG", quality=92)
+            corpus.append((f"foto_{i}.jpg", buffer.getvalue()))
+        else:
+            img.save(buffer, format="PNG", compress_level=1)
+            corpus.append((f"foto_{i}.png", buffer.getvalue()))
+    return corpus, width * height / 1_000_000
+
+
+def run(corpus, target_format, max_size, quality):
+    start = time.perf_counter()
+    output_bytes = 0
+    for _, data in corpus:
+        img = open_image(data, max_size=max_size)
+        output_bytes += len(encode_image(img, target_format, quality=quality))
+    return time.perf_counter() - start, output_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=4)
+    parser.add_argument("--megapixels", type=float, default=12)
+    parser.add_argument("--formats", nargs="+", default=["JPG", "WEBP", "AVIF", "PNG"])
+    parser.add_argument("--max-sizes", nargs="+", type=int, default=[0, 2048, 1024], help="0 = tamanho original")
+    parser.add_argument("--qualities", nargs="+", type=int, default=[0], help="0 = padrão do formato")
+    args = parser.parse_args()
+
+    corpus, megapixels = build_corpus(args.count, args.megapixels)
+    input_mb = sum(len(data) for _, data in corpus) / 1024 / 1024
+    print(f"Corpus: {len(corpus)} imagens de {megapixels:.1f} MP ({input_mb:.1f} MB)\n")
+    print(f"{'formato':<8}{'lado máx.':>10}{'qualidade':>10}{'img/s':>8}{'MP/s':>8}{'KB/img':>10}{'% entrada':>11}")
+
+    for target_format in args.formats:
+        for max_size in args.max_sizes:
+            for quality in args.qualities:
+                elapsed, output_bytes = run(corpus, target_format, max_size or None, quality or None)
+                per_second = len(corpus) / elapsed
+                print(
+                    f"{target_format:<8}{max_size or '-':>10}{quality or 'padrão':>10}"
+                    f"{per_second:>8.2f}{per_second * megapixels:>8.1f}"
+                    f"{output_bytes / len(corpus) / 1024:>10.0f}"
+                    f"{100 * output_bytes / (input_mb * 1024 * 1024):>10.1f}%"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark da junção de PDFs: caminho antigo (pypdf, tudo em memória) x
+fileflow.pdf.merge_pdfs (PyMuPDF, entradas consumidas uma a uma e saída
+gravada em disco por lotes).
+
+Gera um corpus sintético de faturas que compartilham o mesmo logotipo e a
+mesma fonte embutida, e mede tempo, pico de memória (acréscimo de RSS do
+processo filho) e tamanho da saída de cada motor. Requer Linux.
+
+    python benchmarks/merge_pdfs.py --files 300 --pages 3
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+from pypdf import PdfReader, PdfWriter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("FILEFLOW_CACHE", "0")
+from fileflow.pdf import merge_pdfs  # noqa: E402
+
+
+def _logo_png():
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 400, 400), False)
+    for x in range(0, 400, 4):
+        for y in range(0, 400, 40):
+            pix.set_pixel(x, y, ((x * 7) % 256, (y * 3) % 256, 128))
+    return pix.tobytes("png")
+
+
+def build_corpus(directory, num_files, pages_per_file):
+    """Escreve num_files PDFs com logotipo e fonte embutida em comum."""
+    logo = _logo_png()
+    font = fitz.Font("cour")
+    paths = []
+    for i in range(num_files):
+        doc = fitz.open()
+        for p in range(pages_per_file):
+            page = doc.new_page()
+            page.insert_image(fitz.Rect(40, 40, 160, 160), stream=logo)
+            page.insert_font(fontname="F0", fontbuffer=font.buffer)
+            for line in range(40):
+                page.insert_text(
+                    (40, 200 + line * 14),
+                    f"Fatura {i:05d} - página {p + 1} - item {line:02d} ........ R$ {line * 10.5:.2f}",
+                    fontname="F0", fontsize=9,
+                )
+        path = os.path.join(directory, f"fatura_{i:05d}.pdf")
+        doc.save(path)
+        doc.close()
+        paths.append(path)
+    return paths
+
+
+def _merge_pypdf(paths):
+    # Reproduz o caminho anterior: lista de bytes materializada + PdfWriter
+    files_list = []
+    for path in paths:
+        with open(path, "rb") as f:
+            files_list.append(f.read())
+    writer = PdfWriter()
+    for file_bytes in files_list:
+        for page in PdfReader(io.BytesIO(file_bytes)).pages:
+            writer.add_page(page)
+    output_buffer = io.BytesIO()
+    writer.write(output_buffer)
+    writer.close()
+    return len(output_buffer.getvalue())
+
+
+def _merge_fileflow(paths):
+    inputs = (open(path, "rb") for path in paths)
+    output = merge_pdfs(inputs)
+    size = os.fstat(output.fileno()).st_size
+    output.close()
+    return size
+
+
+ENGINES = {
+    "pypdf (anterior)": (_merge_pypdf, {}),
+    "fileflow": (_merge_fileflow, {}),
+}
+
+
+def _rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 1024 / 1024
+
+
+def _run_engine(name, paths, queue):
+    func, kwargs = ENGINES[name]
+    rss_start = _rss_mb()
+    start = time.perf_counter()
+    size = func(paths, **kwargs)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss (KiB no Linux) inclui o que o filho herdou do pai
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 - rss_start
+    queue.put((elapsed, peak_mb, size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=3)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("fork")
+    with tempfile.TemporaryDirectory() as directory:
+        # Corpus gerado em outro processo: os filhos herdam o RSS do pai
+        with ctx.Pool(1) as pool:
+            paths = pool.apply(build_corpus, (directory, args.files, args.pages))
+        input_mb = sum(os.path.getsize(p) for p in paths) / 1024 / 1024
+        print(f"Corpus: {args.files} arquivos x {args.pages} páginas ({input_mb:.1f} MB)\n")
+        print(f"{'motor':<34}{'tempo (s)':>10}{'pico RSS (+MB)':>16}{'saída (MB)':>12}")
+
+        for name in ENGINES:
+            # Cada motor em um processo novo, para medir o pico isoladamente
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_run_engine, args=(name, paths, queue))
+            proc.start()
+            elapsed, peak_mb, size = queue.get()
+            proc.join()
+            print(f"{name:<34}{elapsed:>10.2f}{peak_mb:>16.1f}{size / 1024 / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
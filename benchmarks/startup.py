@@ -0,0 +1,129 @@
+"""
+Relatório de tempo de inicialização (importações) do FileFlow.
+
+Cada alvo roda em um interpretador novo com ``python -X importtime``; o
+relatório traz o tempo total de importação, os pacotes mais pesados e quais
+dependências pesadas foram carregadas. O alvo "app" executa o app.py em
+modo bare (sem servidor), como na abertura da aba padrão.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --save startup.json
+    python benchmarks/startup.py --compare startup.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependências cujo carregamento deve acontecer só na ferramenta que as usa
+HEAVY_MODULES = ["rembg", "onnxruntime", "pdf2docx", "fitz", "pandas", "openpyxl", "pypdf"]
+
+TARGETS = {
+    "app": "import runpy; runpy.run_path('app.py', run_name='__main__')",
+    "fileflow": "import fileflow",
+    "fileflow.convert": "import fileflow.convert",
+    "fileflow.image": "import fileflow.image",
+    "fileflow.pdf": "import fileflow.pdf",
+    "fileflow.data": "import fileflow.data",
+    "fileflow.cli": "import fileflow.cli",
+}
+
+_REPORT_HEAVY = (
+    "; import sys; print('HEAVY=' + ','.join("
+    "m for m in {heavy!r} if m in sys.modules))"
+)
+
+
+def _parse_importtime(stderr):
+    """
+    Retorna (total em ms, {pacote: ms}) a partir do -X importtime: o total
+    soma as importações de topo e cada pacote soma o tempo próprio de todos
+    os seus módulos.
+    """
+    total = 0
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_time, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue
+        if not name.startswith("  "):
+            total += int(cumulative) / 1000
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_time) / 1000
+    return total, packages
+
+
+def measure(code):
+    """Mede um alvo em um processo novo."""
+    env = dict(os.environ, STREAMLIT_SERVER_HEADLESS="true")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code + _REPORT_HEAVY.format(heavy=HEAVY_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    total, packages = _parse_importtime(proc.stderr)
+    heavy = []
+    for line in proc.stdout.splitlines():
+        if line.startswith("HEAVY="):
+            heavy = [m for m in line[len("HEAVY="):].split(",") if m]
+    return {"total_ms": round(total, 1), "packages": packages, "heavy": heavy}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("targets", nargs="*", help=f"alvos (padrão: todos): {', '.join(TARGETS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="execuções por alvo (usa a menor)")
+    parser.add_argument("--top", type=int, default=5, help="pacotes mais pesados exibidos")
+    parser.add_argument("--save", help="grava os tempos em JSON (linha de base)")
+    parser.add_argument("--compare", help="compara com uma linha de base em JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="piora aceita na comparação (fração)")
+    args = parser.parse_args()
+    unknown = set(args.targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"alvos desconhecidos: {', '.join(sorted(unknown))}")
+
+    results = {}
+    for name in args.targets or TARGETS:
+        runs = [measure(TARGETS[name]) for _ in range(args.repeat)]
+        best = min(runs, key=lambda r: r["total_ms"])
+        results[name] = best
+        heaviest = sorted(best["packages"].items(), key=lambda kv: -kv[1])[:args.top]
+        print(f"{name:<20}{best['total_ms']:>9.1f} ms   pesadas: {', '.join(best['heavy']) or '-'}")
+        for module, ms in heaviest:
+            print(f"    {module:<36}{ms:>9.1f} ms")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(
+                {name: {"total_ms": r["total_ms"], "heavy": r["heavy"]} for name, r in results.items()},
+                f, indent=4,
+            )
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = []
+        for name, result in results.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            if result["total_ms"] > base["total_ms"] * (1 + args.tolerance):
+                regressions.append(f"{name}: {base['total_ms']:.1f} -> {result['total_ms']:.1f} ms")
+            new_heavy = set(result["heavy"]) - set(base["heavy"])
+            if new_heavy:
+                regressions.append(f"{name}: passou a carregar {', '.join(sorted(new_heavy))}")
+        if regressions:
+            print("\nRegressões:\n  " + "\n  ".join(regressions))
+            return 1
+        print("\nSem regressões em relação à linha de base.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
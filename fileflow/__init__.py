@@ -0,0 +1,71 @@
+"""
+Núcleo de conversão do FileFlow, independente da interface Streamlit.
+
+As funções são carregadas sob demanda: importar uma delas (ex.:
+``from fileflow import convert_csv_to_json``) carrega só o módulo onde ela
+está, sem trazer rembg/onnxruntime ou pdf2docx junto.
+"""
+
+import importlib
+
+_EXPORTS = {
+    "fileflow.convert": [
+        "convert_pdf_to_word",
+        "convert_image_to_format",
+        "convert_excel_to_pdf",
+        "convert_image_to_pdf",
+        "convert_images_to_pdf",
+    ],
+    "fileflow.image": [
+        "get_rembg_session",
+        "remove_background",
+        "background_mask",
+        "remove_background_batch",
+        "optimize_image",
+    ],
+    "fileflow.pdf": [
+        "merge_pdfs",
+        "split_pdf",
+        "parse_page_ranges",
+        "render_pdf_pages",
+        "edit_pdf_structure",
+        "compress_pdf",
+    ],
+    "fileflow.data": [
+        "convert_excel_to_json",
+        "convert_csv_to_json",
+        "convert_json_to_csv",
+        "convert_excel_to_json_streaming",
+        "convert_csv_to_json_streaming",
+        "convert_json_to_csv_streaming",
+        "convert_csv_to_parquet",
+        "convert_json_to_parquet",
+        "convert_parquet_to_csv",
+        "convert_parquet_to_json",
+        "detect_encoding",
+    ],
+    "fileflow.pipeline": ["STEPS", "plan_pipeline", "run_pipeline"],
+    "fileflow.cache": ["cache_stats", "content_hash", "result_cache"],
+    "fileflow.thumbnails": ["pdf_page_count", "render_thumbnails", "prefetch_thumbnails"],
+    "fileflow.previews": ["image_preview", "preview_width"],
+    "fileflow.archive": ["StreamingZip"],
+    "fileflow.batch": ["BatchResult", "default_workers", "iter_batch", "run_batch"],
+    "fileflow.jobs": ["JobQueue", "job_queue", "start_workers"],
+}
+
+_MODULE_OF = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = list(_MODULE_OF)
+
+
+def __getattr__(name):
+    module = _MODULE_OF.get(name)
+    if module is None:
+        raise AttributeError(f"module 'fileflow' has no attribute '{name}'")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
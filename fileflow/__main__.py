@@ -0,0 +1,5 @@
+import sys
+
+from fileflow.cli import main
+
+sys.exit(main())
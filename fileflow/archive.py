@@ -0,0 +1,77 @@
+import os
+import tempfile
+import zipfile
+
+# --- Montagem de Arquivos .zip ---
+
+ARCHIVE_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+# Formatos já comprimidos: recomprimir com deflate só gasta CPU
+STORED_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".webp", ".gif", ".avif",
+    ".pdf", ".docx", ".xlsx", ".pptx", ".zip", ".gz",
+}
+
+
+def compress_type_for(name):
+    """ZIP_STORED para formatos já comprimidos, ZIP_DEFLATED para o resto."""
+    if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+class StreamingZip:
+    """
+    Escreve entradas de um .zip em um arquivo temporário (em memória até
+    ARCHIVE_SPOOL_MAX_SIZE, depois em disco) conforme cada saída fica pronta.
+
+        with StreamingZip() as archive:
+            archive.add("a.pdf", pdf_bytes)
+        zip_file = archive.file  # posicionado no início
+    """
+
+    def __init__(self, spool_max_size=ARCHIVE_SPOOL_MAX_SIZE, file=None):
+        # file: arquivo binário já aberto para escrita (ex.: a saída final)
+        self._owns_file = file is None
+        if file is None:
+            file = tempfile.SpooledTemporaryFile(max_size=spool_max_size, mode="w+b")
+        self.file = file
+        self._zip = zipfile.ZipFile(self.file, "w")
+        self._names = set()
+        self.count = 0
+
+    def _unique_name(self, name):
+        if name not in self._names:
+            return name
+        base, ext = os.path.splitext(name)
+        n = 2
+        while f"{base} ({n}){ext}" in self._names:
+            n += 1
+        return f"{base} ({n}){ext}"
+
+    def add(self, name, data):
+        """Adiciona uma entrada; nomes repetidos ganham sufixo " (2)", " (3)"..."""
+        name = self._unique_name(name)
+        self._names.add(name)
+        self._zip.writestr(name, data, compress_type=compress_type_for(name))
+        self.count += 1
+        return name
+
+    def close(self):
+        """Finaliza o .zip e devolve o arquivo temporário posicionado no início."""
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+            # SpooledTemporaryFile só ganhou readable()/seekable() no 3.11; o
+            # do caller pode ser um stream sem seek (pipe, resposta HTTP)
+            if self._owns_file or getattr(self.file, "seekable", lambda: False)():
+                self.file.seek(0)
+        return self.file
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        if exc_type is not None:
+            self.file.close()
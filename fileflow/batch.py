@@ -0,0 +1,165 @@
+import contextvars
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+from fileflow import metrics
+
+# --- Processamento em Lote ---
+
+# Método de início dos processos (pools e workers da fila): "forkserver"
+# onde existe, senão "spawn". "fork" é mais rápido para abrir os workers, mas
+# só é seguro em processos de uma thread (ex.: a linha de comando): no
+# servidor do Streamlit, locks de bibliotecas (ONNX, MuPDF, logging) presos
+# por outra thread ficariam travados no filho.
+START_METHOD = os.environ.get("FILEFLOW_START_METHOD")
+# Módulos importados uma vez no forkserver, que os workers herdam prontos
+FORKSERVER_PRELOAD = ["fileflow.pdf", "fileflow.convert", "fileflow.image"]
+
+@dataclass
+class BatchResult:
+    """Resultado de um item do lote: saída convertida ou mensagem de erro."""
+    index: int
+    output: bytes = None
+    error: str = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _run_item(func, args):
+    """Executa a conversão de um item, capturando a falha como texto."""
+    try:
+        return func(*args), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+class _Buffer:
+    """
+    Upload (memoryview, veja fileflow.uploads) enviado a um worker: chega lá
+    como bytes, e a cópia só é feita quando o pool serializa o item.
+    """
+    __slots__ = ("view",)
+
+    def __init__(self, view):
+        self.view = view
+
+    def __reduce__(self):
+        return bytes, (self.view.tobytes(),)
+
+
+def _picklable(value):
+    if isinstance(value, memoryview):
+        return _Buffer(value)
+    if isinstance(value, (list, tuple)):
+        return type(value)(_picklable(item) for item in value)
+    return value
+
+
+def _run_item_in_process(func, args):
+    """Worker do pool de processos: devolve também as métricas do item."""
+    with metrics.collecting() as measurements:
+        output, error = _run_item(func, args)
+    return output, error, measurements
+
+
+def _mp_context():
+    # Com "spawn" e "forkserver" cada worker prepara o __main__ de quem o
+    # criou; o app.py se declara sem módulo a reexecutar (veja __spec__ lá).
+    # Com "fork", os módulos do fileflow recriam seus locks no filho
+    # (os.register_at_fork).
+    method = START_METHOD
+    if method is None:
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    ctx = multiprocessing.get_context(method)
+    if method == "forkserver":
+        ctx.set_forkserver_preload(FORKSERVER_PRELOAD)
+    return ctx
+
+
+def default_workers():
+    """Número de workers padrão: um por núcleo disponível."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def iter_batch(func, args_list, max_workers=None, on_progress=None, use_threads=False):
+    """
+    Executa func(*args) para cada item de args_list em um pool de processos,
+    entregando cada BatchResult na ordem de args_list assim que ele e os
+    anteriores ficam prontos (ex.: para gravar num .zip sem esperar o lote).
+
+    Falhas são isoladas por item. on_progress(concluidos, total) é chamado a
+    cada item finalizado, na thread de quem chamou. Com use_threads=True usa
+    um pool de threads, para funções que liberam o GIL e compartilham estado
+    pesado (ex.: a sessão ONNX do rembg).
+    """
+    total = len(args_list)
+    if total == 0:
+        return
+    if max_workers is None:
+        max_workers = default_workers()
+    max_workers = max(1, min(max_workers, total))
+    if not use_threads and multiprocessing.current_process().daemon:
+        # Já estamos em um worker de outro lote: processos daemon não podem
+        # ter filhos, então o trabalho é feito aqui mesmo.
+        max_workers = 1
+
+    if max_workers == 1:
+        for i, args in enumerate(args_list):
+            output, error = _run_item(func, args)
+            if on_progress:
+                on_progress(i + 1, total)
+            yield BatchResult(i, output, error)
+        return
+
+    if use_threads:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    else:
+        executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=_mp_context())
+
+    with executor:
+        if use_threads:
+            # Cada thread herda o contexto de quem chamou (ex.: a coleta de
+            # métricas de um worker da fila)
+            futures = {
+                executor.submit(contextvars.copy_context().run, _run_item, func, args): i
+                for i, args in enumerate(args_list)
+            }
+        else:
+            futures = {
+                executor.submit(_run_item_in_process, func, _picklable(args)): i
+                for i, args in enumerate(args_list)
+            }
+        finished = {}
+        next_index = 0
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures.pop(future)
+            try:
+                output, error, *measurements = future.result()
+                if measurements:
+                    metrics.report(measurements[0])
+            except Exception as e:
+                # Ex.: worker encerrado pelo sistema (falta de memória)
+                output, error = None, f"{type(e).__name__}: {e}"
+            finished[i] = BatchResult(i, output, error)
+            if on_progress:
+                on_progress(done, total)
+            while next_index in finished:
+                yield finished.pop(next_index)
+                next_index += 1
+
+
+def run_batch(func, args_list, max_workers=None, on_progress=None, use_threads=False):
+    """
+    Executa func(*args) para cada item de args_list em um pool de processos.
+
+    Retorna uma lista de BatchResult na mesma ordem de args_list; veja
+    iter_batch para os parâmetros.
+    """
+    return list(iter_batch(func, args_list, max_workers, on_progress, use_threads))
@@ -0,0 +1,434 @@
+import functools
+import hashlib
+import inspect
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from collections.abc import Iterator
+
+from fileflow import metrics
+
+# --- Cache de Resultados (endereçado por conteúdo) ---
+
+CACHE_ENABLED = os.environ.get("FILEFLOW_CACHE", "1") != "0"
+CACHE_MEMORY_MAX_BYTES = int(os.environ.get("FILEFLOW_CACHE_MEMORY_MB", 128)) * 1024 * 1024
+CACHE_DISK_MAX_BYTES = int(os.environ.get("FILEFLOW_CACHE_DISK_MB", 1024)) * 1024 * 1024
+# Incrementar quando a saída de alguma conversão mudar, invalidando o cache
+CACHE_VERSION = 2
+
+
+
+def _user_tag():
+    if hasattr(os, "getuid"):
+        return str(os.getuid())
+    import getpass
+
+    return getpass.getuser()
+
+
+def private_dir(path):
+    """
+    Cria (ou confere) um diretório só do usuário atual, com modo 0o700, para
+    os arquivos convertidos. Levanta PermissionError se o caminho for um link,
+    pertencer a outro usuário ou puder ser escrito por outros (entradas
+    plantadas ali seriam servidas como resultados).
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"{path} não é um diretório.")
+    if hasattr(os, "getuid"):
+        if info.st_uid != os.getuid():
+            raise PermissionError(f"{path} pertence a outro usuário.")
+        if info.st_mode & 0o022:
+            raise PermissionError(f"{path} pode ser alterado por outros usuários.")
+        if info.st_mode & 0o077:
+            os.chmod(path, 0o700)
+    return path
+
+
+# Um diretório por usuário: o de outro usuário é recusado por private_dir
+CACHE_DIR = os.environ.get(
+    "FILEFLOW_CACHE_DIR", os.path.join(tempfile.gettempdir(), f"fileflow-cache-{_user_tag()}")
+)
+
+# Caches vivos no processo, para recriar seus locks após um fork
+_caches = weakref.WeakSet()
+
+
+def content_hash(file_bytes):
+    """Hash SHA-256 (hex) do conteúdo, usado como chave de cache."""
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+class LRUCache:
+    """Cache LRU thread-safe limitado pelo total de bytes dos valores."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        _caches.add(self)
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._data[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache:
+    """Cache em disco (um arquivo por chave), com remoção LRU por tamanho total."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._index = None
+        self._lock = threading.Lock()
+        _caches.add(self)
+
+    def _load_index(self):
+        # Reconstrói a ordem de uso pelo mtime dos arquivos já existentes
+        private_dir(self.directory)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file(follow_symlinks=False) and not entry.name.endswith(".tmp"):
+                info = entry.stat()
+                entries.append((info.st_mtime, entry.name, info.st_size))
+        self._index = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self.size = sum(self._index.values())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        f = self.open(key)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def open(self, key):
+        """Abre a entrada para leitura (sem carregá-la na memória), ou None."""
+        with self._lock:
+            if self._index is None:
+                self._load_index()
+            if key not in self._index:
+                return None
+            self._index.move_to_end(key)
+        try:
+            f = open(self._path(key), "rb")
+            os.utime(self._path(key))
+            return f
+        except OSError:
+            with self._lock:
+                self.size -= self._index.pop(key, 0)
+            return None
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        self._store(key, len(value), lambda f: f.write(value))
+
+    def put_file(self, key, file_obj):
+        """Copia um arquivo aberto para o cache em blocos e volta à posição original."""
+        position = file_obj.tell()
+        file_obj.seek(0, os.SEEK_END)
+        size = file_obj.tell() - position
+        file_obj.seek(position)
+        if size > self.max_bytes:
+            return
+        try:
+            self._store(key, size, lambda f: shutil.copyfileobj(file_obj, f))
+        finally:
+            file_obj.seek(position)
+
+    def _store(self, key, size, write):
+        with self._lock:
+            if self._index is None:
+                self._load_index()
+        # A gravação fica fora do lock: get/put de outras threads não esperam
+        # pela cópia de um resultado grande. Se a entrada for removida por
+        # outra thread nesse meio-tempo, open() a descarta do índice.
+        tmp_path = self._path(key) + f".{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                write(f)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            self.size += size - self._index.pop(key, 0)
+            self._index[key] = size
+            while self.size > self.max_bytes:
+                evicted, evicted_size = self._index.popitem(last=False)
+                self.size -= evicted_size
+                try:
+                    os.remove(self._path(evicted))
+                except OSError:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            if self._index is None:
+                self._load_index()
+            for key in self._index:
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._index.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._index or ())
+
+
+class ResultCache:
+    """Cache de resultados em dois níveis (memória e disco), com contadores."""
+
+    def __init__(self, memory_max_bytes=CACHE_MEMORY_MAX_BYTES, disk_dir=CACHE_DIR, disk_max_bytes=CACHE_DISK_MAX_BYTES):
+        self.memory = LRUCache(memory_max_bytes)
+        self.disk = DiskCache(disk_dir, disk_max_bytes) if disk_dir and disk_max_bytes else None
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        _caches.add(self)
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("hits_memory")
+            return value
+        if self.disk is not None:
+            try:
+                value = self.disk.get(key)
+            except OSError:
+                # Diretório recusado por private_dir ou ilegível
+                value = None
+            if value is not None:
+                self._count("hits_disk")
+                self.memory.put(key, value)
+                return value
+        self._count("misses")
+        return None
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, value)
+            except OSError:
+                # Disco cheio ou sem permissão: segue só com a memória
+                pass
+
+    def get_file(self, key):
+        """Resultados em arquivo ficam só no disco; devolve um arquivo aberto ou None."""
+        try:
+            f = self.disk.open(key) if self.disk is not None else None
+        except OSError:
+            f = None
+        self._count("hits_disk" if f is not None else "misses")
+        return f
+
+    def put_file(self, key, file_obj):
+        if self.disk is not None:
+            try:
+                self.disk.put_file(key, file_obj)
+            except OSError:
+                pass
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            try:
+                self.disk.clear()
+            except OSError:
+                pass
+
+    def stats(self):
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.size,
+            "disk_entries": len(self.disk) if self.disk is not None else 0,
+            "disk_bytes": self.disk.size if self.disk is not None else 0,
+        }
+
+
+result_cache = ResultCache()
+
+
+def _reset_locks_after_fork():
+    # O filho de um fork (workers de fileflow.batch e fileflow.jobs) só tem a
+    # thread que o criou: um lock que outra thread do servidor segurava
+    # naquele instante ficaria travado para sempre.
+    for cache in list(_caches):
+        cache._lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+
+class _Uncacheable(TypeError):
+    """Argumento cujo conteúdo não dá para representar na chave."""
+
+
+_SCALARS = (str, int, float, complex, bool, type(None))
+
+
+def _update_key(digest, value):
+    if isinstance(value, _SCALARS):
+        digest.update(repr(value).encode("utf-8") + b";")
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}:{len(value)}:".encode())
+        for item in value:
+            _update_key(digest, item)
+    elif isinstance(value, (set, frozenset)):
+        digest.update(f"set:{len(value)}:".encode())
+        for item in sorted(value, key=repr):
+            _update_key(digest, item)
+    elif isinstance(value, dict):
+        digest.update(f"dict:{len(value)}:".encode())
+        for name, item in value.items():
+            _update_key(digest, name)
+            _update_key(digest, item)
+    else:
+        # bytes, mmap, arrays... entram pelo conteúdo; o repr de outros objetos
+        # não identifica o conteúdo (dois mmaps do mesmo tamanho são iguais nele)
+        try:
+            view = memoryview(value)
+        except TypeError:
+            raise _Uncacheable(type(value).__name__) from None
+        with view:
+            digest.update(b"bytes:" + hashlib.sha256(view.cast("B")).digest())
+
+
+def _is_stream(value):
+    """Iteradores e arquivos abertos não têm conteúdo estável para a chave."""
+    if isinstance(value, (list, tuple)):
+        return any(_is_stream(item) for item in value)
+    return isinstance(value, Iterator)
+
+
+def cache_key(operation, arguments):
+    """Chave SHA-256 a partir da operação e dos argumentos (bytes entram pelo hash)."""
+    digest = hashlib.sha256(f"v{CACHE_VERSION}|{operation}|".encode("utf-8"))
+    for name, value in sorted(arguments.items()):
+        digest.update(name.encode("utf-8") + b"=")
+        _update_key(digest, value)
+    return digest.hexdigest()
+
+
+def cached_result(operation, ignore=(), returns_file=False):
+    """
+    Decorador que guarda no result_cache o resultado (bytes) da função,
+    indexado pelo conteúdo das entradas e pelos demais parâmetros.
+    Parâmetros em ignore (ex.: sessão, número de workers) não entram na chave.
+    Com returns_file=True a função devolve um arquivo aberto, que é copiado
+    para o nível em disco e, nos acertos, reaberto de lá. Chamadas com
+    iteradores, arquivos abertos ou outros objetos sem conteúdo conhecido
+    nos argumentos não passam pelo cache.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def cached_call(measurement, args, kwargs):
+            if not CACHE_ENABLED:
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = {k: v for k, v in bound.arguments.items() if k not in ignore}
+            if any(_is_stream(v) for v in arguments.values()):
+                return func(*args, **kwargs)
+            try:
+                key = cache_key(operation, arguments)
+            except _Uncacheable:
+                return func(*args, **kwargs)
+
+            if returns_file:
+                value = result_cache.get_file(key)
+                if value is None:
+                    value = func(*args, **kwargs)
+                    if value is not None:
+                        result_cache.put_file(key, value)
+                    _set_cache_status(measurement, "miss")
+                else:
+                    _set_cache_status(measurement, "hit")
+                return value
+
+            value = result_cache.get(key)
+            if value is not None:
+                _set_cache_status(measurement, "hit")
+                return value
+            value = func(*args, **kwargs)
+            if isinstance(value, (bytes, bytearray)) and value:
+                result_cache.put(key, bytes(value))
+            _set_cache_status(measurement, "miss")
+            return value
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Toda conversão com cache também é medida (fileflow.metrics)
+            with metrics.measure(operation.split(":")[0], args + tuple(kwargs.values())) as measurement:
+                value = cached_call(measurement, args, kwargs)
+                if measurement is not None:
+                    measurement.output_bytes = metrics.payload_size(value)
+                return value
+
+        return wrapper
+    return decorator
+
+
+def _set_cache_status(measurement, status):
+    if measurement is not None:
+        measurement.cache = status
+
+
+def cache_stats():
+    """Contadores de acertos/erros e ocupação do cache de resultados."""
+    return result_cache.stats()
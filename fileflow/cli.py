@@ -0,0 +1,221 @@
+"""
+Linha de comando do FileFlow: converte arquivos e diretórios inteiros sem a
+interface Streamlit, um arquivo por worker (--jobs).
+
+    fileflow pdf-to-word relatorios/ -o saida/ --jobs 8
+    fileflow image-to-format fotos/ --format JPG --recursive
+    fileflow merge a.pdf b.pdf -o juntado.pdf
+    fileflow images-to-pdf digitalizacoes/ -o documento.pdf
+"""
+import argparse
+import os
+import shutil
+import sys
+
+from fileflow.batch import default_workers, iter_batch
+from fileflow.operations import OPERATIONS, output_name, write_result
+
+# --- Execução ---
+
+def _collect_inputs(paths, extensions, recursive):
+    """
+    Expande diretórios nos arquivos com as extensões da operação (ordenados).
+    Retorna pares (caminho, subdiretório relativo à entrada informada).
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            if recursive:
+                found = [
+                    os.path.join(root, name)
+                    for root, _, names in os.walk(path)
+                    for name in names
+                ]
+            else:
+                found = [os.path.join(path, name) for name in os.listdir(path)]
+            files += sorted(
+                (f, os.path.relpath(os.path.dirname(f), path))
+                for f in found
+                if os.path.isfile(f) and os.path.splitext(f)[1].lower() in extensions
+            )
+        elif os.path.isfile(path):
+            files.append((path, "."))
+        else:
+            raise FileNotFoundError(f"Arquivo ou diretório não encontrado: {path}")
+    return files
+
+
+def _output_path(input_path, subdir, operation_name, output_dir, options):
+    """Caminho de saída; com -o, a estrutura de subdiretórios é mantida."""
+    name = output_name(operation_name, input_path, options)
+    if not output_dir:
+        return os.path.join(os.path.dirname(input_path), name)
+    return os.path.normpath(os.path.join(output_dir, subdir, name))
+
+
+def _convert_file(operation_name, input_path, output_path, options):
+    """Worker: lê a entrada, converte e grava a saída direto no disco."""
+    with open(input_path, "rb") as file_obj:
+        result = OPERATIONS[operation_name].handler(file_obj, options)
+    return write_result(result, output_path)
+
+
+def _run_operation(args, options):
+    operation = OPERATIONS[args.command]
+    inputs = _collect_inputs(args.inputs, operation.extensions, args.recursive)
+
+    tasks = []
+    skipped = 0
+    for path, subdir in inputs:
+        output_path = _output_path(path, subdir, args.command, args.output_dir, options)
+        if os.path.abspath(output_path) == os.path.abspath(path):
+            raise ValueError(f"A saída sobrescreveria a entrada ({path}); use -o.")
+        if args.skip_existing and os.path.exists(output_path):
+            skipped += 1
+            continue
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        tasks.append((args.command, path, output_path, options))
+
+    if not tasks:
+        print(f"Nenhum arquivo para converter ({skipped} já existentes).", file=sys.stderr)
+        return 0
+
+    failures = 0
+    total = len(tasks)
+    for result in iter_batch(_convert_file, tasks, max_workers=args.jobs, use_threads=operation.use_threads):
+        path = tasks[result.index][1]
+        if result.ok:
+            print(f"[{result.index + 1}/{total}] {path} -> {result.output}", file=sys.stderr)
+        else:
+            failures += 1
+            print(f"[{result.index + 1}/{total}] FALHOU {path}: {result.error}", file=sys.stderr)
+
+    print(f"{total - failures} convertidos, {failures} com erro, {skipped} ignorados.", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def _run_merge(args):
+    from fileflow.pdf import merge_pdfs
+
+    inputs = [path for path, _ in _collect_inputs(args.inputs, (".pdf",), args.recursive)]
+    if len(inputs) < 2:
+        print("São necessários pelo menos 2 PDFs para juntar.", file=sys.stderr)
+        return 2
+
+    # Os arquivos são abertos um a um conforme o merge avança
+    opened = (open(path, "rb") for path in inputs)
+    merged = merge_pdfs(opened, dedupe=not args.no_dedupe)
+    with merged, open(args.output, "wb") as out:
+        shutil.copyfileobj(merged, out)
+    print(f"{len(inputs)} PDFs juntados em {args.output}.", file=sys.stderr)
+    return 0
+
+
+def _run_images_to_pdf(args):
+    from fileflow.convert import convert_images_to_pdf
+
+    extensions = (".jpg", ".jpeg", ".png", ".webp", ".tif", ".tiff")
+    inputs = [path for path, _ in _collect_inputs(args.inputs, extensions, args.recursive)]
+    if not inputs:
+        print("Nenhuma imagem encontrada.", file=sys.stderr)
+        return 2
+
+    opened = (open(path, "rb") for path in inputs)
+    pdf = convert_images_to_pdf(opened, max_size=args.max_size, quality=args.quality, workers=args.jobs)
+    with pdf, open(args.output, "wb") as out:
+        shutil.copyfileobj(pdf, out)
+    print(f"{len(inputs)} imagens reunidas em {args.output}.", file=sys.stderr)
+    return 0
+
+
+def _run_worker(args):
+    from fileflow.jobs import JOBS_DIR, start_workers
+
+    workers = start_workers(args.workers)
+    print(f"{len(workers)} workers processando a fila em {JOBS_DIR} (Ctrl+C para encerrar).", file=sys.stderr)
+    for proc in workers:
+        proc.join()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="fileflow",
+        description="Conversões do FileFlow pela linha de comando.",
+    )
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--no-cache", action="store_true",
+        help="não consulta nem grava o cache de resultados",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for name, operation in OPERATIONS.items():
+        sub = subparsers.add_parser(name, parents=[common], help=operation.help, description=operation.help)
+        sub.add_argument("inputs", nargs="+", help="arquivos ou diretórios de entrada")
+        sub.add_argument("-o", "--output-dir", help="diretório de saída (padrão: o da entrada)")
+        sub.add_argument("-j", "--jobs", type=int, default=default_workers(), help="workers em paralelo (padrão: núcleos)")
+        sub.add_argument("-r", "--recursive", action="store_true", help="percorre subdiretórios")
+        sub.add_argument("--skip-existing", action="store_true", help="pula saídas que já existem")
+        for flags, kwargs in operation.arguments:
+            sub.add_argument(*flags, **kwargs)
+
+    merge = subparsers.add_parser(
+        "merge", parents=[common], help="Junta PDFs em um só", description="Junta PDFs em um só"
+    )
+    merge.add_argument("inputs", nargs="+", help="PDFs ou diretórios, na ordem da junção")
+    merge.add_argument("-o", "--output", required=True, help="PDF de saída")
+    merge.add_argument("-r", "--recursive", action="store_true", help="percorre subdiretórios")
+    merge.add_argument("--no-dedupe", action="store_true", help="não unifica imagens e fontes repetidas")
+
+    images = subparsers.add_parser(
+        "images-to-pdf", parents=[common],
+        help="Junta imagens em um único PDF",
+        description="Junta imagens em um único PDF, uma página por imagem (JPEGs sem recompressão).",
+    )
+    images.add_argument("inputs", nargs="+", help="imagens ou diretórios, na ordem das páginas")
+    images.add_argument("-o", "--output", required=True, help="PDF de saída")
+    images.add_argument("-j", "--jobs", type=int, default=default_workers(), help="workers para reduzir/recomprimir")
+    images.add_argument("-r", "--recursive", action="store_true", help="percorre subdiretórios")
+    images.add_argument("--max-size", type=int, help="limita o maior lado (px) das imagens")
+    images.add_argument("--quality", type=int, help="recomprime as imagens em JPEG com esta qualidade")
+
+    worker = subparsers.add_parser(
+        "worker", parents=[common],
+        help="Processa a fila de trabalhos do app",
+        description="Processa a fila de trabalhos do app (útil com FILEFLOW_JOB_WORKERS=0 no servidor).",
+    )
+    worker.add_argument("-w", "--workers", type=int, default=default_workers(), help="processos (padrão: núcleos)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.no_cache:
+        import fileflow.cache
+        fileflow.cache.CACHE_ENABLED = False
+    if os.environ.get("FILEFLOW_METRICS_FILE"):
+        from fileflow.metrics import start_metrics_writer
+        start_metrics_writer()
+
+    try:
+        if args.command == "merge":
+            return _run_merge(args)
+        if args.command == "images-to-pdf":
+            return _run_images_to_pdf(args)
+        if args.command == "worker":
+            return _run_worker(args)
+        known = {"command", "inputs", "output_dir", "jobs", "recursive", "skip_existing", "no_cache"}
+        options = {k: v for k, v in vars(args).items() if k not in known}
+        return _run_operation(args, options)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
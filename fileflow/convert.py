@@ -0,0 +1,235 @@
+import io
+import os
+import tempfile
+
+from fileflow import metrics
+from fileflow.batch import iter_batch, run_batch
+from fileflow.cache import cached_result
+from fileflow.imaging import encode_image, normalize_format, open_image
+from fileflow.uploads import open_buffer, upload_buffer
+
+# --- Funções de Conversão (Bloco 1) ---
+
+# pdf2docx, pandas e PyMuPDF (table_pdf) são importados dentro das funções
+# que os usam: converter um PNG para JPG não deve carregá-los.
+
+# Páginas mínimas por worker ao dividir a conversão PDF -> Word
+PDF_TO_WORD_MIN_PAGES_PER_WORKER = 8
+
+# Imagens para um PDF: resolução assumida quando a imagem não informa DPI
+# (a mesma do convert_image_to_pdf) e imagens preparadas por janela no modo
+# paralelo, o que limita quantas ficam em memória ao mesmo tempo
+IMAGE_PDF_DEFAULT_DPI = 100
+IMAGES_WINDOW_PER_WORKER = 2
+
+
+def _parse_pdf_pages(file_bytes, start, end, settings):
+    """Analisa um intervalo de páginas e devolve as páginas serializadas (worker)."""
+    from pdf2docx import Converter as PDFToWordConverter
+
+    cv = PDFToWordConverter(stream=file_bytes)
+    try:
+        cv.load_pages(start, end)
+        cv.parse_document(**settings).parse_pages(**settings)
+        return [page.store() for page in cv.pages if page.finalized]
+    finally:
+        cv.close()
+
+
+def _page_segments(start, end, parts):
+    """Divide [start, end) em até parts intervalos contíguos."""
+    total = end - start
+    size, extra = divmod(total, parts)
+    segments = []
+    for i in range(parts):
+        seg_end = start + size + (1 if i < extra else 0)
+        if seg_end > start:
+            segments.append((start, seg_end))
+        start = seg_end
+    return segments
+
+
+@cached_result("convert_pdf_to_word", ignore=("workers",))
+def convert_pdf_to_word(file_bytes, start=0, end=None, workers=1):
+    """
+    Converte bytes de PDF para bytes de DOCX, inteiramente em memória.
+
+    Com workers > 1, PDFs grandes têm os intervalos de páginas analisados em
+    paralelo (pool de processos) e o DOCX é montado no processo atual.
+    """
+    from pdf2docx import Converter as PDFToWordConverter
+
+    cv = PDFToWordConverter(stream=file_bytes)
+    try:
+        num_pages = len(cv.fitz_doc)
+        end = num_pages if end is None else min(end, num_pages)
+        parts = min(workers, (end - start) // PDF_TO_WORD_MIN_PAGES_PER_WORKER)
+        metrics.count("pages", end - start)
+
+        output_buffer = io.BytesIO()
+        if parts <= 1:
+            cv.convert(output_buffer, start=start, end=end)
+            return output_buffer.getvalue()
+
+        settings = cv.default_settings
+        results = run_batch(
+            _parse_pdf_pages,
+            [(file_bytes, s, e, settings) for s, e in _page_segments(start, end, parts)],
+            max_workers=parts,
+        )
+        cv.load_pages(start, end)
+        for result in results:
+            if not result.ok:
+                raise RuntimeError(result.error)
+            cv.restore({'pages': result.output})
+        cv.make_docx(output_buffer, **settings)
+        return output_buffer.getvalue()
+    finally:
+        cv.close()
+
+
+@cached_result("convert_image_to_format")
+def convert_image_to_format(file_bytes, target_format, max_size=None, quality=None):
+    """
+    Converte bytes de imagem para PNG, JPG (progressivo), WebP ou AVIF.
+    Com max_size, o maior lado é reduzido a max_size pixels na decodificação.
+    """
+    img = open_image(file_bytes, max_size=max_size)
+    return encode_image(img, normalize_format(target_format), quality=quality)
+
+@cached_result("convert_excel_to_pdf")
+def convert_excel_to_pdf(file_bytes, all_sheets=False):
+    """
+    Converte o primeiro sheet de um Excel (ou todos, com all_sheets=True)
+    para um PDF com tabelas paginadas.
+    """
+    import pandas as pd
+
+    from fileflow.table_pdf import render_tables_pdf
+
+    sheets = pd.read_excel(open_buffer(file_bytes), sheet_name=None if all_sheets else 0, engine='openpyxl')
+    if all_sheets:
+        tables = list(sheets.items())
+    else:
+        tables = [(None, sheets)]
+    metrics.count("rows", sum(len(df) for _, df in tables))
+    return render_tables_pdf(tables)
+
+@cached_result("convert_image_to_pdf")
+def convert_image_to_pdf(file_bytes, max_size=None):
+    """Salva uma imagem (JPG ou PNG) como um arquivo PDF."""
+    img = open_image(file_bytes, max_size=max_size)
+
+    if img.mode == 'RGBA':
+        img = img.convert('RGB')
+
+    output_buffer = io.BytesIO()
+    img.save(output_buffer, format="PDF", resolution=100.0)
+    return output_buffer.getvalue()
+
+
+def _image_dpi(img):
+    dpi = img.info.get("dpi")
+    try:
+        dpi = float(dpi[0])
+    except (TypeError, ValueError, IndexError):
+        return IMAGE_PDF_DEFAULT_DPI
+    return dpi if 10 <= dpi <= 10000 else IMAGE_PDF_DEFAULT_DPI
+
+
+def _prepare_pdf_image(file_bytes, max_size=None, quality=None):
+    """
+    Worker: devolve (bytes da imagem a embutir, largura e altura da página
+    em pontos). JPEGs que não precisam de ajuste (RGB/cinza, sem rotação
+    EXIF, dentro de max_size) passam direto, sem decodificar; os demais são
+    reduzidos e recodificados (JPEG na qualidade pedida, PNG se sem perdas).
+    """
+    from PIL import Image
+
+    with Image.open(open_buffer(file_bytes)) as img:
+        source_format, source_size, mode = img.format, img.size, img.mode
+        dpi = _image_dpi(img)
+        orientation = img.getexif().get(0x0112, 1)
+    width, height = source_size
+    if orientation in (5, 6, 7, 8):
+        width, height = height, width
+    page_size = (width * 72 / dpi, height * 72 / dpi)
+
+    fits = not max_size or max(source_size) <= max_size
+    if source_format == "JPEG" and mode in ("RGB", "L") and orientation == 1 and fits and quality is None:
+        return bytes(file_bytes), page_size
+
+    img = open_image(file_bytes, max_size=max_size)
+    if source_format == "JPEG" or quality is not None:
+        return encode_image(img, "JPEG", quality=quality), page_size
+    return encode_image(img, "PNG", effort=1), page_size
+
+
+def _prepared_images(inputs, max_size, quality, workers):
+    """Prepara as imagens em janelas, em paralelo, mantendo a ordem."""
+    window_size = workers * IMAGES_WINDOW_PER_WORKER
+    window = []
+    start = 0
+    for item in inputs:
+        window.append(_as_bytes(item))
+        if len(window) == window_size:
+            yield from _prepare_window(window, start, max_size, quality, workers)
+            start += len(window)
+            window = []
+    if window:
+        yield from _prepare_window(window, start, max_size, quality, workers)
+
+
+def _prepare_window(window, start, max_size, quality, workers):
+    tasks = [(data, max_size, quality) for data in window]
+    for result in iter_batch(_prepare_pdf_image, tasks, max_workers=workers):
+        if not result.ok:
+            raise ValueError(f"Imagem {start + result.index + 1}: {result.error}")
+        yield result.output
+
+
+def _as_bytes(item):
+    """Aceita bytes, buffers ou um arquivo binário (ex.: UploadedFile), sem copiar."""
+    return upload_buffer(item)
+
+
+@cached_result("convert_images_to_pdf", ignore=("workers",), returns_file=True)
+def convert_images_to_pdf(files_list, max_size=None, quality=None, workers=1):
+    """
+    Junta várias imagens (lista ou iterador de bytes/arquivos) em um único
+    PDF, uma página por imagem, e retorna um arquivo temporário posicionado
+    no início.
+
+    As páginas são adicionadas uma a uma com o PyMuPDF: o documento guarda
+    só as imagens comprimidas, nunca os bitmaps decodificados. JPEGs são
+    embutidos sem recodificar; max_size/quality ativam a redução e
+    recompressão, feita em paralelo com workers > 1.
+    """
+    import fitz  # PyMuPDF
+
+    inputs = iter(files_list)
+    # Só a redução/recompressão compensa o envio das imagens aos workers
+    if workers > 1 and (max_size or quality is not None):
+        prepared = _prepared_images(inputs, max_size, quality, workers)
+    else:
+        prepared = (_prepare_pdf_image(_as_bytes(item), max_size, quality) for item in inputs)
+
+    doc = fitz.open()
+    try:
+        for data, (width, height) in prepared:
+            page = doc.new_page(width=width, height=height)
+            page.insert_image(page.rect, stream=data)
+        if len(doc) == 0:
+            raise ValueError("Nenhuma imagem informada.")
+        metrics.count("pages", len(doc))
+
+        # Mesmo esquema do merge_pdfs: grava pelo caminho e devolve aberto
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        os.close(fd)
+        try:
+            doc.save(path, garbage=1, deflate=True)
+            return open(path, "rb")
+        finally:
+            os.remove(path)
+    finally:
+        doc.close()
@@ -0,0 +1,520 @@
+import codecs
+import functools
+import importlib.util
+import io
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+from fileflow import metrics
+from fileflow.cache import cached_result
+from fileflow.uploads import open_buffer
+
+# --- Funções de Dados (Bloco 4) ---
+
+# Engine de leitura dos CSVs: "arrow" usa o leitor multithread do pyarrow,
+# "pandas" o parser C do pandas e "auto" o pyarrow quando está instalado.
+# A codificação (UTF-8 ou Latin-1) é detectada uma vez, numa amostra do
+# início do arquivo.
+DATA_ENGINE = os.environ.get("FILEFLOW_DATA_ENGINE", "auto")
+ENCODING_SAMPLE_SIZE = 1024 * 1024
+ARROW_BLOCK_SIZE = 16 * 1024 * 1024
+# Valores que o read_csv do pandas lê como nulos por padrão (veja na_values
+# na documentação); o leitor do pyarrow recebe a mesma lista
+CSV_NA_VALUES = (
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+)
+
+
+@functools.lru_cache(maxsize=None)
+def arrow_available():
+    """Indica se o pyarrow (engine Arrow e Parquet) está instalado."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _require_arrow(feature):
+    if not arrow_available():
+        raise RuntimeError(f"{feature} requer o pyarrow (pip install pyarrow).")
+
+
+def _use_arrow(engine):
+    engine = engine or DATA_ENGINE
+    if engine == "arrow":
+        _require_arrow("O engine 'arrow'")
+        return True
+    if engine == "auto":
+        return arrow_available()
+    if engine == "pandas":
+        return False
+    raise ValueError(f"Engine de dados desconhecido: {engine}")
+
+
+def detect_encoding(sample):
+    """Codificação de um texto pela amostra: utf-8-sig (com BOM), utf-8 ou latin-1."""
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        # final=False: a amostra pode terminar no meio de um caractere
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return 'latin-1'
+    return 'utf-8'
+
+
+class _ArrowFallback(Exception):
+    """O pyarrow não leu o CSV (tipos inferidos no primeiro bloco, UTF-8 inválido)."""
+
+
+def _arrow_csv_options(file_obj, encoding):
+    import pyarrow as pa
+    import pyarrow.csv as pv
+
+    # O pyarrow só lê UTF-8 direto (o BOM é ignorado); o resto é transcodificado
+    read_options = pv.ReadOptions(
+        encoding='utf8' if encoding.startswith('utf-8') else encoding, block_size=ARROW_BLOCK_SIZE
+    )
+    # Datas e horários inferidos pelo pyarrow continuam como texto, como no
+    # pandas: o JSON mantém os valores do arquivo. Os tipos saem do primeiro
+    # bloco, o mesmo que o leitor usa para inferir.
+    start = file_obj.tell()
+    schema = pv.open_csv(file_obj, read_options=read_options).schema
+    file_obj.seek(start)
+    column_types = {f.name: pa.string() for f in schema if pa.types.is_temporal(f.type)}
+    # Mesmos valores nulos do parser do pandas, também nas colunas de texto
+    convert_options = pv.ConvertOptions(
+        column_types=column_types, null_values=list(CSV_NA_VALUES), strings_can_be_null=True
+    )
+    return read_options, convert_options
+
+
+def _check_utf8(schema, encoding):
+    import pyarrow as pa
+
+    # Bytes que não são UTF-8 viram colunas binárias no pyarrow
+    if encoding != 'latin-1' and any(pa.types.is_binary(f.type) for f in schema):
+        raise UnicodeDecodeError('utf-8', b'', 0, 1, 'bytes inválidos após a amostra')
+
+
+def _arrow_read_csv(file_obj, encoding):
+    import pyarrow as pa
+    import pyarrow.csv as pv
+
+    try:
+        read_options, convert_options = _arrow_csv_options(file_obj, encoding)
+        table = pv.read_csv(file_obj, read_options=read_options, convert_options=convert_options)
+    except pa.ArrowInvalid as e:
+        raise _ArrowFallback(str(e)) from e
+    _check_utf8(table.schema, encoding)
+    return table.to_pandas()
+
+
+def _iter_arrow_csv(file_obj, encoding):
+    import pyarrow as pa
+    import pyarrow.csv as pv
+
+    try:
+        read_options, convert_options = _arrow_csv_options(file_obj, encoding)
+        for batch in pv.open_csv(file_obj, read_options=read_options, convert_options=convert_options):
+            _check_utf8(batch.schema, encoding)
+            yield batch.to_pandas()
+    except pa.ArrowInvalid as e:
+        raise _ArrowFallback(str(e)) from e
+
+
+def _csv_encodings(encoding):
+    """A detectada na amostra e, se houver bytes inválidos depois dela, Latin-1."""
+    return (encoding,) if encoding == 'latin-1' else (encoding, 'latin-1')
+
+
+def _read_csv(file_bytes, engine=None):
+    """
+    Lê o CSV inteiro num DataFrame. Se o pyarrow recusar o arquivo (ex.: uma
+    coluna numérica com texto depois do primeiro bloco), lê com o pandas.
+    """
+    detected = detect_encoding(bytes(file_bytes[:ENCODING_SAMPLE_SIZE]))
+    readers = (_arrow_read_csv, pd.read_csv) if _use_arrow(engine) else (pd.read_csv,)
+    for read in readers:
+        for encoding in _csv_encodings(detected):
+            try:
+                return read(open_buffer(file_bytes), encoding=encoding)
+            except UnicodeDecodeError:
+                continue
+            except _ArrowFallback:
+                break
+
+
+def _read_json(file_bytes):
+    """Lê um JSON (lista de objetos ou objeto) ou NDJSON num DataFrame achatado."""
+    try:
+        json_data = json.loads(str(file_bytes, 'utf-8'))
+    except json.JSONDecodeError as e:
+        if not e.msg.startswith("Extra data"):
+            raise
+        # Vários valores seguidos (NDJSON): parser incremental
+        json_data = list(_iter_json_records(open_buffer(file_bytes)))
+    return pd.json_normalize(json_data)
+
+
+# Formatos de tabela aceitos por read_table e write_table
+TABLE_READ_FORMATS = ("csv", "json", "ndjson", "jsonl", "xlsx", "parquet")
+TABLE_WRITE_FORMATS = ("csv", "json", "ndjson", "parquet")
+
+
+def read_table(file_bytes, file_format, engine=None):
+    """
+    Lê bytes de CSV, JSON/NDJSON, Excel (primeiro sheet) ou Parquet
+    (file_format = extensão, sem o ponto) num DataFrame.
+    """
+    file_format = file_format.lower()
+    if file_format == "csv":
+        return _read_csv(file_bytes, engine)
+    if file_format in ("json", "ndjson", "jsonl"):
+        return _read_json(file_bytes)
+    if file_format == "xlsx":
+        return pd.read_excel(open_buffer(file_bytes), engine='openpyxl')
+    if file_format == "parquet":
+        _require_arrow("Parquet")
+        return pd.read_parquet(open_buffer(file_bytes))
+    raise ValueError(f"Formato de tabela não suportado: {file_format}")
+
+
+def write_table(df, file_format):
+    """Escreve o DataFrame como CSV, JSON (records), NDJSON ou Parquet e retorna os bytes."""
+    file_format = file_format.lower()
+    if file_format == "csv":
+        return df.to_csv(index=False).encode('utf-8')
+    if file_format == "json":
+        return df.to_json(orient='records', indent=4, force_ascii=False).encode('utf-8')
+    if file_format == "ndjson":
+        return df.to_json(orient='records', lines=True, force_ascii=False).encode('utf-8')
+    if file_format == "parquet":
+        _require_arrow("Parquet")
+        output_buffer = io.BytesIO()
+        df.to_parquet(output_buffer, index=False)
+        return output_buffer.getvalue()
+    raise ValueError(f"Formato de tabela não suportado: {file_format}")
+
+
+@cached_result("convert_excel_to_json")
+def convert_excel_to_json(file_bytes):
+    """Converte o primeiro sheet de um Excel para JSON (orient=records)."""
+    df = pd.read_excel(open_buffer(file_bytes), engine='openpyxl')
+    metrics.count("rows", len(df))
+    json_string = df.to_json(orient='records', indent=4, force_ascii=False)
+    return json_string.encode('utf-8')
+
+@cached_result("convert_csv_to_json")
+def convert_csv_to_json(file_bytes, engine=None):
+    """
+    Converte um CSV para JSON (orient=records). engine: "arrow", "pandas" ou
+    None (FILEFLOW_DATA_ENGINE).
+    """
+    df = _read_csv(file_bytes, engine)
+    metrics.count("rows", len(df))
+
+    json_string = df.to_json(orient='records', indent=4, force_ascii=False)
+    return json_string.encode('utf-8')
+
+@cached_result("convert_json_to_csv")
+def convert_json_to_csv(file_bytes):
+    """Converte um JSON (lista de objetos) ou NDJSON para CSV."""
+    df = _read_json(file_bytes)
+    metrics.count("rows", len(df))
+    output_buffer = io.StringIO()
+    df.to_csv(output_buffer, index=False)
+    return output_buffer.getvalue().encode('utf-8')
+
+
+# --- Conversão em streaming (memória constante) ---
+
+# Linhas por bloco lido/escrito e limite do arquivo temporário em memória
+# antes de ir para o disco. Os tipos das colunas são inferidos por bloco.
+CHUNK_ROWS = 50_000
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+_JSON_READ_SIZE = 1024 * 1024
+_NUMBER_CHARS = frozenset("0123456789+-.eE")
+
+
+def _as_file(file_obj):
+    """Aceita bytes, buffers ou um arquivo binário (ex.: UploadedFile) e devolve um arquivo."""
+    if isinstance(file_obj, (bytes, bytearray, memoryview)):
+        return open_buffer(file_obj)
+    return file_obj
+
+
+def _new_spool():
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode="w+b")
+
+
+class _JsonRecordsWriter:
+    """Escreve blocos de DataFrame como uma lista JSON (indent=4) ou NDJSON."""
+
+    def __init__(self, output, ndjson=False):
+        self.output = output
+        self.ndjson = ndjson
+        self.empty = True
+        if not ndjson:
+            self.output.write(b"[")
+
+    def write(self, df):
+        if df.empty:
+            return
+        metrics.count("rows", len(df))
+        if self.ndjson:
+            text = df.to_json(orient='records', lines=True, force_ascii=False)
+            self.output.write(text.rstrip("\n").encode('utf-8') + b"\n")
+        else:
+            text = df.to_json(orient='records', indent=4, force_ascii=False)
+            body = text.strip()[1:-1].strip("\n")
+            self.output.write((b"\n" if self.empty else b",\n") + body.encode('utf-8'))
+        self.empty = False
+
+    def close(self):
+        if not self.ndjson:
+            self.output.write(b"]" if self.empty else b"\n]")
+        self.output.seek(0)
+        return self.output
+
+
+def _excel_header(values):
+    """Replica os nomes de coluna do pandas (Unnamed: i, duplicadas com .n)."""
+    header = []
+    seen = {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if value is None else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        header.append(name)
+    return header
+
+
+@metrics.measured("convert_excel_to_json_streaming")
+def convert_excel_to_json_streaming(file_obj, ndjson=False, chunksize=CHUNK_ROWS):
+    """
+    Converte o primeiro sheet de um Excel para JSON (ou NDJSON) em blocos de
+    linhas, lendo com o openpyxl em modo read_only. Retorna um arquivo
+    temporário posicionado no início.
+    """
+    import openpyxl
+
+    wb = openpyxl.load_workbook(_as_file(file_obj), read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        writer = _JsonRecordsWriter(_new_spool(), ndjson)
+        header = next(rows, None)
+        if header is None:
+            return writer.close()
+        header = _excel_header(header)
+
+        chunk = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            chunk.append(row)
+            if len(chunk) >= chunksize:
+                writer.write(pd.DataFrame(chunk, columns=header))
+                chunk = []
+        if chunk:
+            writer.write(pd.DataFrame(chunk, columns=header))
+        return writer.close()
+    finally:
+        wb.close()
+
+
+@metrics.measured("convert_csv_to_json_streaming")
+def convert_csv_to_json_streaming(file_obj, ndjson=False, chunksize=CHUNK_ROWS, engine=None):
+    """
+    Converte um CSV para JSON (ou NDJSON) em blocos: de ARROW_BLOCK_SIZE
+    bytes com o pyarrow ou de chunksize linhas com pd.read_csv. Retorna um
+    arquivo temporário posicionado no início.
+    """
+    file_obj = _as_file(file_obj)
+    start = file_obj.tell()
+    detected = detect_encoding(file_obj.read(ENCODING_SAMPLE_SIZE))
+    readers = ("arrow", "pandas") if _use_arrow(engine) else ("pandas",)
+
+    output = _new_spool()
+    try:
+        # Cada leitura que falhar recomeça a saída com a seguinte
+        for reader in readers:
+            for encoding in _csv_encodings(detected):
+                file_obj.seek(start)
+                output.seek(0)
+                output.truncate()
+                writer = _JsonRecordsWriter(output, ndjson)
+                if reader == "arrow":
+                    chunks = _iter_arrow_csv(file_obj, encoding)
+                else:
+                    chunks = pd.read_csv(file_obj, chunksize=chunksize, encoding=encoding)
+                try:
+                    for df in chunks:
+                        writer.write(df)
+                except UnicodeDecodeError:
+                    continue
+                except _ArrowFallback:
+                    break
+                return writer.close()
+    except Exception:
+        output.close()
+        raise
+
+
+def _iter_json_records(file_obj, read_size=_JSON_READ_SIZE):
+    """
+    Itera sobre os itens de uma lista JSON, ou sobre uma sequência de valores
+    JSON (NDJSON), lendo o arquivo em pedaços.
+    """
+    decode = codecs.getincrementaldecoder('utf-8-sig')().decode
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    in_array = None
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                return
+            chunk = file_obj.read(read_size)
+            eof = not chunk
+            buffer, pos = decode(chunk, final=eof), 0
+            continue
+
+        if in_array is None:
+            in_array = buffer[pos] == "["
+            if in_array:
+                pos += 1
+                continue
+        if in_array and buffer[pos] == "]":
+            return
+
+        try:
+            obj, end = decoder.raw_decode(buffer, pos)
+            # Um número no fim do buffer (ou seguido de "e", "." etc. ainda
+            # incompletos) pode continuar no próximo pedaço
+            if not eof and (end == len(buffer) or buffer[end] in _NUMBER_CHARS):
+                raise json.JSONDecodeError("Valor possivelmente incompleto", buffer, end)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file_obj.read(read_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + decode(chunk, final=eof), 0
+            continue
+        pos = end
+        yield obj
+
+
+def _iter_json_chunks(file_obj, chunksize):
+    chunk = []
+    for record in _iter_json_records(file_obj):
+        chunk.append(record)
+        if len(chunk) >= chunksize:
+            yield pd.json_normalize(chunk)
+            chunk = []
+    if chunk:
+        yield pd.json_normalize(chunk)
+
+
+@metrics.measured("convert_json_to_csv_streaming")
+def convert_json_to_csv_streaming(file_obj, chunksize=CHUNK_ROWS):
+    """
+    Converte um JSON (lista de objetos) ou NDJSON para CSV em blocos.
+
+    Faz duas passagens sobre a entrada: a primeira coleta todas as colunas
+    (como o json_normalize faria no documento inteiro) e a segunda escreve o
+    CSV. Retorna um arquivo temporário posicionado no início.
+    """
+    file_obj = _as_file(file_obj)
+    start = file_obj.tell()
+
+    columns = {}
+    for df in _iter_json_chunks(file_obj, chunksize):
+        columns.update(dict.fromkeys(df.columns))
+    columns = list(columns)
+
+    file_obj.seek(start)
+    output = _new_spool()
+    header = True
+    for df in _iter_json_chunks(file_obj, chunksize):
+        csv_text = df.reindex(columns=columns).to_csv(index=False, header=header)
+        metrics.count("rows", len(df))
+        output.write(csv_text.encode('utf-8'))
+        header = False
+    if header and columns:
+        output.write((",".join(columns) + "\n").encode('utf-8'))
+    output.seek(0)
+    return output
+
+
+# --- Parquet (requer pyarrow) ---
+
+@cached_result("convert_csv_to_parquet")
+def convert_csv_to_parquet(file_bytes, engine=None):
+    """Converte um CSV para Parquet (compressão snappy)."""
+    _require_arrow("Parquet")
+    df = _read_csv(file_bytes, engine)
+    metrics.count("rows", len(df))
+    output_buffer = io.BytesIO()
+    df.to_parquet(output_buffer, index=False)
+    return output_buffer.getvalue()
+
+
+@cached_result("convert_json_to_parquet")
+def convert_json_to_parquet(file_bytes):
+    """Converte um JSON (lista de objetos) ou NDJSON para Parquet."""
+    _require_arrow("Parquet")
+    df = _read_json(file_bytes)
+    metrics.count("rows", len(df))
+    output_buffer = io.BytesIO()
+    df.to_parquet(output_buffer, index=False)
+    return output_buffer.getvalue()
+
+
+def _iter_parquet(file_obj, chunksize):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(_as_file(file_obj))
+    return parquet_file.schema_arrow.names, (
+        batch.to_pandas() for batch in parquet_file.iter_batches(batch_size=chunksize)
+    )
+
+
+@metrics.measured("convert_parquet_to_json")
+def convert_parquet_to_json(file_obj, ndjson=False, chunksize=CHUNK_ROWS):
+    """
+    Converte um Parquet (bytes ou arquivo) para JSON ou NDJSON, lote a lote.
+    Retorna um arquivo temporário posicionado no início.
+    """
+    _require_arrow("Parquet")
+    _, chunks = _iter_parquet(file_obj, chunksize)
+    writer = _JsonRecordsWriter(_new_spool(), ndjson)
+    for df in chunks:
+        writer.write(df)
+    return writer.close()
+
+
+@metrics.measured("convert_parquet_to_csv")
+def convert_parquet_to_csv(file_obj, chunksize=CHUNK_ROWS):
+    """
+    Converte um Parquet (bytes ou arquivo) para CSV, lote a lote. Retorna um
+    arquivo temporário posicionado no início.
+    """
+    _require_arrow("Parquet")
+    columns, chunks = _iter_parquet(file_obj, chunksize)
+    output = _new_spool()
+    header = True
+    for df in chunks:
+        metrics.count("rows", len(df))
+        output.write(df.to_csv(index=False, header=header).encode('utf-8'))
+        header = False
+    if header and columns:
+        output.write((",".join(columns) + "\n").encode('utf-8'))
+    output.seek(0)
+    return output
@@ -0,0 +1,228 @@
+import functools
+import os
+
+# O pymatting (dependência do rembg) inicia o pool de threads do numba já na
+# importação; com a camada TBB, um fork posterior (fileflow.batch) deixa os
+# workers travados. A camada "workqueue" é segura para fork.
+os.environ.setdefault("NUMBA_THREADING_LAYER", "workqueue")
+
+from fileflow.batch import iter_batch
+from fileflow.cache import cached_result
+from fileflow.imaging import encode_image, encode_to_size, normalize_format, open_image, open_image_with_size
+from fileflow.uploads import open_buffer
+
+# --- Funções de Imagem (Bloco 2) ---
+
+# rembg/onnxruntime (mais de um segundo de importação) só são carregados na
+# primeira remoção de fundo.
+
+# Configuração da sessão do rembg (0 = padrão do ONNX Runtime, um por núcleo)
+REMBG_MODEL = os.environ.get("FILEFLOW_REMBG_MODEL")
+ONNX_INTRA_OP_THREADS = int(os.environ.get("FILEFLOW_ONNX_INTRA_THREADS", 0))
+ONNX_INTER_OP_THREADS = int(os.environ.get("FILEFLOW_ONNX_INTER_THREADS", 0))
+REMBG_BATCH_WORKERS = int(os.environ.get("FILEFLOW_REMBG_WORKERS", 2))
+
+# Modo rápido: a máscara é inferida numa cópia com o maior lado em
+# REMBG_FAST_SIZE pixels (os modelos do rembg trabalham entre 320 e 1024 px)
+# e ampliada para o tamanho original. Na ampliação, o que fica abaixo de
+# MASK_LOW vira fundo, o que fica acima de MASK_HIGH vira objeto e a faixa
+# entre os dois é suavizada, afinando a borda borrada pela interpolação.
+REMBG_FAST_SIZE = int(os.environ.get("FILEFLOW_REMBG_FAST_SIZE", 1024))
+MASK_LOW = 16
+MASK_HIGH = 240
+# Compressão do PNG no modo rápido (sem perdas; só o arquivo fica maior)
+REMBG_FAST_PNG_EFFORT = 1
+
+# Formatos de saída da remoção de fundo (com transparência)
+REMBG_FORMATS = ("PNG", "WEBP", "AVIF")
+
+
+@functools.lru_cache(maxsize=None)
+def _create_rembg_session(model_name, intra_op_threads, inter_op_threads):
+    import onnxruntime as ort
+    from rembg import new_session
+
+    sess_opts = ort.SessionOptions()
+    sess_opts.intra_op_num_threads = intra_op_threads
+    sess_opts.inter_op_num_threads = inter_op_threads
+    if model_name:
+        return new_session(model_name, sess_opts=sess_opts)
+    return new_session(sess_opts=sess_opts)
+
+
+def get_rembg_session(model_name=None, intra_op_threads=None, inter_op_threads=None):
+    """
+    Retorna a sessão ONNX do rembg, criada sob demanda uma única vez por
+    processo para cada combinação de modelo e threads.
+    """
+    if model_name is None:
+        model_name = REMBG_MODEL
+    if intra_op_threads is None:
+        intra_op_threads = ONNX_INTRA_OP_THREADS
+    if inter_op_threads is None:
+        inter_op_threads = ONNX_INTER_OP_THREADS
+    return _create_rembg_session(model_name, intra_op_threads, inter_op_threads)
+
+
+def _infer_mask(img, session=None):
+    """Máscara do objeto (imagem "L" do tamanho de img) inferida pelo rembg."""
+    from rembg import remove
+
+    if session is None:
+        session = get_rembg_session()
+    try:
+        return remove(img, session=session, only_mask=True)
+    except Exception as e:
+        raise RuntimeError(
+            f"Erro ao remover fundo: {e}. A imagem pode ser muito complexa ou estar em um formato inesperado."
+        ) from e
+
+
+@functools.lru_cache(maxsize=1)
+def _refine_table():
+    import numpy as np
+
+    # Smoothstep entre MASK_LOW e MASK_HIGH, aplicado como tabela (point)
+    t = np.clip((np.arange(256) - MASK_LOW) / (MASK_HIGH - MASK_LOW), 0, 1)
+    return (t * t * (3 - 2 * t) * 255).round().astype("uint8").tolist()
+
+
+def _upscale_mask(mask, size):
+    """Amplia a máscara de baixa resolução para size e afina a borda."""
+    from PIL import Image
+
+    if mask.size != size:
+        mask = mask.resize(size, Image.Resampling.BILINEAR)
+    return mask.point(_refine_table())
+
+
+def _apply_mask(img, mask):
+    """
+    Aplica a máscara como canal alfa na própria imagem (sem as cópias RGBA
+    do composite) e zera a cor do fundo, que assim comprime melhor.
+    """
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    img.putalpha(mask)
+    img.paste((0, 0, 0, 0), mask=mask.point([255] + [0] * 255))
+    return img
+
+
+# A sessão não entra na chave; o modelo configurado sim
+@cached_result(f"background_mask:{REMBG_MODEL}", ignore=("session", "img"))
+def background_mask(file_bytes, max_size=None, session=None, img=None):
+    """
+    Máscara do objeto (PNG em tons de cinza), inferida com o maior lado da
+    imagem limitado a max_size. Fica no cache pelo conteúdo da imagem: gerar
+    a saída em outro formato não repete a inferência. img é a imagem já
+    decodificada (sem max_size), se quem chama a tiver.
+    """
+    if img is None or max_size:
+        img = open_image(file_bytes, max_size=max_size)
+    return encode_image(_infer_mask(img, session), "PNG", effort=1)
+
+
+def _output_format(target_format):
+    save_format = normalize_format(target_format or "PNG")
+    if save_format not in REMBG_FORMATS:
+        raise ValueError("A remoção de fundo gera transparência: use PNG, WebP ou AVIF.")
+    return save_format
+
+
+@cached_result(f"remove_background:{REMBG_MODEL}", ignore=("session",))
+def remove_background(file_bytes, session=None, fast=False, target_format=None):
+    """
+    Remove o fundo de uma imagem e a codifica em PNG (ou target_format: WebP
+    ou AVIF). Com fast=True, a máscara é inferida em baixa resolução
+    (REMBG_FAST_SIZE) e ampliada para a imagem original.
+    """
+    from PIL import Image
+
+    save_format = _output_format(target_format)
+    img = open_image(file_bytes)
+    max_size = REMBG_FAST_SIZE if fast else None
+    mask = Image.open(open_buffer(background_mask(file_bytes, max_size, session, img)))
+    if not fast:
+        # Mesmo recorte do rembg.remove
+        cutout = Image.composite(img.convert("RGBA"), Image.new("RGBA", img.size, 0), mask)
+        return encode_image(cutout, save_format)
+    cutout = _apply_mask(img, _upscale_mask(mask, img.size))
+    # O PNG domina o tempo em fotos grandes: no modo rápido, o menor esforço
+    return encode_image(cutout, save_format, effort=REMBG_FAST_PNG_EFFORT if save_format == "PNG" else None)
+
+
+def remove_background_image(img, session=None, fast=False):
+    """
+    Remove o fundo de uma imagem já decodificada (PIL) e devolve a imagem
+    RGBA. fast como em remove_background.
+    """
+    from rembg import remove
+
+    if fast:
+        from PIL import Image
+
+        from fileflow.imaging import REDUCING_GAP
+
+        small = img
+        scale = REMBG_FAST_SIZE / max(img.size)
+        if scale < 1:
+            size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+            small = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+        return _apply_mask(img, _upscale_mask(_infer_mask(small, session), img.size))
+
+    if session is None:
+        session = get_rembg_session()
+    try:
+        return remove(img, session=session)
+    except Exception as e:
+        raise RuntimeError(f"Erro ao remover fundo: {e}.") from e
+
+
+def remove_background_batch(files_list, max_workers=None, on_progress=None, fast=False, target_format=None):
+    """
+    Remove o fundo de várias imagens (lista de bytes) com uma única sessão.
+
+    O modelo é carregado uma vez e compartilhado entre threads: a inferência
+    do ONNX Runtime libera o GIL e usa todos os núcleos, enquanto as demais
+    threads decodificam e codificam as imagens seguintes. Retorna um iterador
+    de BatchResult na ordem de entrada (veja fileflow.batch.iter_batch).
+    fast e target_format como em remove_background.
+    """
+    session = get_rembg_session()
+    if max_workers is None:
+        max_workers = REMBG_BATCH_WORKERS
+    return iter_batch(
+        remove_background,
+        [(file_bytes, session, fast, target_format) for file_bytes in files_list],
+        max_workers=max_workers,
+        on_progress=on_progress,
+        use_threads=True,
+    )
+
+
+@cached_result("optimize_image", ignore=("workers",))
+def optimize_image(file_bytes, max_size=None, quality=None, target_format=None,
+                   max_bytes=None, allow_resize=True, workers=None):
+    """
+    Otimiza uma imagem para reduzir o tamanho: mantém o formato (ou converte
+    para target_format, ex.: WEBP/AVIF), com JPEG progressivo e, com
+    max_size, limitando o maior lado já na decodificação.
+
+    Com max_bytes, busca a maior qualidade (até quality) que cabe nesse
+    tamanho, reduzindo a escala se preciso (veja imaging.encode_to_size).
+    Se o resultado no mesmo formato não ficar menor, devolve a original.
+    """
+    img, source_size = open_image_with_size(file_bytes, max_size=max_size)
+    save_format = normalize_format(target_format or img.format)
+    if max_bytes:
+        output = encode_to_size(
+            img, save_format, max_bytes, max_quality=quality, allow_resize=allow_resize, workers=workers
+        )
+    else:
+        output = encode_image(img, save_format, quality=quality)
+
+    resized = bool(max_size) and max(source_size) > max_size
+    if save_format == img.format and not resized and len(output) >= memoryview(file_bytes).nbytes:
+        # bytes() não copia bytes; um buffer (upload) não pode ir para o cache
+        return bytes(file_bytes)
+    return output
@@ -0,0 +1,199 @@
+import io
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps, features
+
+from fileflow.uploads import open_buffer
+
+# --- Pipeline de Imagens (decodificação reduzida e codificação por formato) ---
+
+# Redução em duas etapas: o decodificador JPEG já entrega a imagem em 1/2,
+# 1/4 ou 1/8 do tamanho (draft) e os demais formatos passam por reduce()
+# inteiro antes do redimensionamento fino, sem decodificar/filtrar os
+# 40 megapixels completos. 1.5 fica entre a qualidade do 2.0 e a velocidade
+# do 1.0 (ex.: 7500x5000 -> 2048: 0,9 s sem redução, 0,5 s com 1.5).
+REDUCING_GAP = 1.5
+
+# Qualidade padrão por formato e "esforço" do codificador (maior = menor
+# arquivo e mais lento): JPEG optimize, WebP method 0-6, AVIF speed 0-10
+# (invertido) e PNG compress_level 0-9.
+DEFAULT_QUALITY = {"JPEG": 85, "WEBP": 80, "AVIF": 60}
+DEFAULT_EFFORT = {"JPEG": 1, "WEBP": 4, "AVIF": 4, "PNG": 6}
+
+# Nomes aceitos na entrada -> formato do Pillow
+FORMAT_ALIASES = {"JPG": "JPEG", "JPEG": "JPEG", "PNG": "PNG", "WEBP": "WEBP", "AVIF": "AVIF"}
+FORMAT_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "AVIF": "avif"}
+FORMAT_MIMES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "AVIF": "image/avif"}
+
+_ALPHA_FORMATS = {"PNG", "WEBP", "AVIF"}
+
+# Busca por tamanho-alvo: faixa de qualidade, precisão da busca, limite de
+# codificações (somando todas as escalas) e de reduções de escala. As
+# codificações de cada rodada rodam em threads (os codificadores do Pillow
+# liberam o GIL).
+TARGET_MIN_QUALITY = 30
+TARGET_MAX_QUALITY = 95
+TARGET_QUALITY_TOLERANCE = 2
+TARGET_MAX_ATTEMPTS = 16
+TARGET_MAX_SCALE_STEPS = 4
+TARGET_WORKERS = int(os.environ.get("FILEFLOW_TARGET_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+def normalize_format(name):
+    """Converte "JPG", "webp" etc. no nome de formato do Pillow."""
+    save_format = FORMAT_ALIASES.get(str(name).upper())
+    if save_format is None:
+        raise ValueError(f"Formato de imagem não suportado: {name}")
+    if save_format in ("WEBP", "AVIF") and not features.check(save_format.lower()):
+        raise ValueError(f"Esta instalação do Pillow não tem suporte a {save_format}.")
+    return save_format
+
+
+def open_image(file_bytes, max_size=None):
+    """
+    Abre e decodifica a imagem (bytes ou buffer) aplicando a orientação
+    EXIF. Com max_size, o maior lado fica limitado a max_size pixels já na
+    decodificação.
+    """
+    return open_image_with_size(file_bytes, max_size)[0]
+
+
+def open_image_with_size(file_bytes, max_size=None):
+    """Como open_image, mas devolve (imagem, tamanho original no arquivo)."""
+    img = Image.open(open_buffer(file_bytes))
+    source_size = img.size
+    if max_size and max(img.size) > max_size:
+        img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+    # in_place: sem orientação no EXIF, nada é copiado (e img.format fica)
+    ImageOps.exif_transpose(img, in_place=True)
+    return img, source_size
+
+
+def _prepare_mode(img, save_format):
+    if save_format in _ALPHA_FORMATS:
+        if img.mode in ("RGBA", "RGB", "L", "LA") or (save_format == "PNG" and img.mode == "P"):
+            return img
+        return img.convert("RGBA" if "A" in img.mode or "transparency" in img.info else "RGB")
+    # JPEG não tem transparência
+    if img.mode in ("RGB", "L", "CMYK"):
+        return img
+    return img.convert("RGB")
+
+
+def encode_image(img, target_format, quality=None, effort=None, progressive=True):
+    """
+    Codifica a imagem no formato pedido com qualidade/esforço configuráveis
+    (None = padrão do formato). JPEG sai progressivo por padrão.
+    """
+    save_format = normalize_format(target_format)
+    img = _prepare_mode(img, save_format)
+    if quality is None:
+        quality = DEFAULT_QUALITY.get(save_format)
+    if effort is None:
+        effort = DEFAULT_EFFORT.get(save_format)
+
+    options = {}
+    if save_format == "JPEG":
+        options = {"quality": quality, "optimize": bool(effort), "progressive": progressive}
+    elif save_format == "WEBP":
+        options = {"quality": quality, "method": effort}
+    elif save_format == "AVIF":
+        options = {"quality": quality, "speed": 10 - effort}
+    elif save_format == "PNG":
+        options = {"compress_level": effort}
+
+    output_buffer = io.BytesIO()
+    img.save(output_buffer, format=save_format, **options)
+    return output_buffer.getvalue()
+
+
+def _quality_points(lo, hi, ok, bad, count):
+    """Qualidades da próxima rodada: extremos na primeira, depois o meio."""
+    if ok is None and bad is None:
+        count = max(count, 2)
+        points = [round(lo + (hi - lo) * i / (count - 1)) for i in range(count)]
+    else:
+        low = lo - 1 if ok is None else ok
+        high = hi + 1 if bad is None else bad
+        points = [round(low + (high - low) * i / (count + 1)) for i in range(1, count + 1)]
+        points = [q for q in points if low < q < high]
+    return sorted(set(points), reverse=True)
+
+
+def _search_quality(img, save_format, max_bytes, lo, hi, attempts, executor, workers):
+    """
+    Busca (em rodadas de até workers codificações) a maior qualidade em
+    [lo, hi] cujo resultado cabe em max_bytes. Retorna (melhor resultado que
+    cabe ou None, menor resultado gerado, codificações feitas).
+    """
+    ok = bad = None
+    fitting = smallest = None
+    used = 0
+    while used < attempts:
+        points = _quality_points(lo, hi, ok, bad, min(workers, attempts - used))
+        if not points:
+            break
+        # save() guarda as opções no próprio objeto: uma cópia por codificação
+        outputs = list(executor.map(lambda q: encode_image(img.copy(), save_format, quality=q), points))
+        used += len(points)
+        for q, data in zip(points, outputs):
+            if smallest is None or len(data) < len(smallest):
+                smallest = data
+            if len(data) <= max_bytes:
+                if ok is None or q > ok:
+                    ok, fitting = q, data
+            elif bad is None or q < bad:
+                bad = q
+        if ok is not None and bad is not None and bad <= ok:
+            # Tamanho não monotônico na qualidade: fica com o que já cabe
+            break
+        if ok is None and bad is not None and bad <= lo:
+            break
+        if ok is not None and (ok >= hi or (bad is not None and bad - ok <= TARGET_QUALITY_TOLERANCE)):
+            break
+    return fitting, smallest, used
+
+
+def encode_to_size(img, target_format, max_bytes, max_quality=None, allow_resize=True, workers=None):
+    """
+    Codifica a imagem com a maior qualidade que cabe em max_bytes, por busca
+    binária (com workers > 1, várias qualidades por rodada, em paralelo e em
+    memória). Se nem a qualidade mínima cabe e allow_resize=True, reduz a
+    escala pela razão de tamanhos e busca de novo. PNG (sem qualidade) só é
+    reduzido. O total de codificações é limitado a TARGET_MAX_ATTEMPTS.
+
+    Retorna o melhor resultado que cabe ou, se nenhum couber, o menor gerado.
+    """
+    save_format = normalize_format(target_format)
+    img = _prepare_mode(img, save_format)
+    workers = max(1, workers or TARGET_WORKERS)
+    hi = max_quality or TARGET_MAX_QUALITY
+    lo = min(TARGET_MIN_QUALITY, hi)
+    attempts = TARGET_MAX_ATTEMPTS
+    smallest = None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for step in range(TARGET_MAX_SCALE_STEPS + 1):
+            if save_format in DEFAULT_QUALITY:
+                fitting, result, used = _search_quality(img, save_format, max_bytes, lo, hi, attempts, executor, workers)
+            else:
+                result, used = encode_image(img, save_format), 1
+                fitting = result if len(result) <= max_bytes else None
+            attempts -= used
+            if fitting is not None:
+                return fitting
+            if smallest is None or len(result) < len(smallest):
+                smallest = result
+            # Cada nova escala precisa testar ao menos as duas pontas da faixa
+            if not allow_resize or attempts < 2 or step == TARGET_MAX_SCALE_STEPS:
+                break
+            # O tamanho cai mais ou menos com a área: escala pela raiz da
+            # razão, com folga, e nunca menos de 10% por passo
+            scale = min(0.9, math.sqrt(max_bytes / len(result)) * 0.95)
+            size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+            if size == img.size:
+                break
+            img = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+    return smallest
@@ -0,0 +1,402 @@
+import contextlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+from fileflow import metrics
+from fileflow.archive import StreamingZip
+from fileflow.batch import _mp_context, default_workers, iter_batch
+from fileflow.cache import _user_tag, private_dir
+from fileflow.operations import OPERATIONS, output_name, write_result
+
+# --- Fila de Trabalhos (segundo plano) ---
+
+# Os trabalhos ficam num SQLite local e os arquivos de entrada/saída em
+# JOBS_DIR/<id>/: nenhum serviço externo, e um trabalho sobrevive à sessão
+# do navegador (e a um reinício do servidor, voltando para a fila). Como no
+# cache, o diretório é por usuário e só ele tem acesso (0o700).
+
+JOBS_DIR = os.environ.get(
+    "FILEFLOW_JOBS_DIR", os.path.join(tempfile.gettempdir(), f"fileflow-jobs-{_user_tag()}")
+)
+JOB_TTL_SECONDS = int(os.environ.get("FILEFLOW_JOB_TTL_HOURS", 24)) * 3600
+JOB_WORKERS = int(os.environ.get("FILEFLOW_JOB_WORKERS", max(1, default_workers() // 2)))
+POLL_INTERVAL = 0.5
+PURGE_INTERVAL = 300
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    operation TEXT NOT NULL,
+    options TEXT NOT NULL,
+    inputs TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    expires REAL,
+    worker_pid INTEGER,
+    done INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL,
+    output_name TEXT,
+    error TEXT,
+    failures TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+CREATE TABLE IF NOT EXISTS metrics (
+    id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+
+@dataclass
+class Job:
+    """Estado de um trabalho na fila."""
+    id: str
+    operation: str
+    status: str
+    created: float
+    started: float = None
+    finished: float = None
+    expires: float = None
+    done: int = 0
+    total: int = 0
+    output_name: str = None
+    error: str = None
+    failures: list = None
+
+    @property
+    def ok(self):
+        return self.status == STATUS_DONE
+
+    @property
+    def pending(self):
+        return self.status in (STATUS_QUEUED, STATUS_RUNNING)
+
+
+def _safe_name(name):
+    return re.sub(r"[^\w.\- ]", "_", os.path.basename(name)) or "arquivo"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobQueue:
+    """Fila de trabalhos em SQLite; cada chamada usa sua própria conexão."""
+
+    def __init__(self, directory=JOBS_DIR, ttl_seconds=JOB_TTL_SECONDS):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.db_path = os.path.join(directory, "jobs.sqlite3")
+        self._initialized = False
+
+    @contextlib.contextmanager
+    def _connect(self):
+        if not self._initialized:
+            private_dir(self.directory)
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.row_factory = sqlite3.Row
+            if not self._initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                self._initialized = True
+            yield conn
+        finally:
+            conn.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """
+        Conexão numa transação com o lock de escrita já obtido (BEGIN
+        IMMEDIATE): leituras e escritas do bloco são atômicas entre processos.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def job_dir(self, job_id):
+        return os.path.join(self.directory, job_id)
+
+    def submit(self, operation, inputs, options=None):
+        """
+        Enfileira uma operação de fileflow.operations sobre uma ou mais
+        entradas (pares (nome, bytes ou arquivo aberto)) e retorna o ID.
+        Uma entrada gera um arquivo de saída; várias geram um .zip.
+        """
+        if operation not in OPERATIONS:
+            raise ValueError(f"Operação desconhecida: {operation}")
+        if not inputs:
+            raise ValueError("Nenhum arquivo enviado.")
+        options = dict(options or {})
+        job_id = uuid.uuid4().hex
+        input_dir = os.path.join(self.job_dir(job_id), "entrada")
+        os.makedirs(input_dir)
+
+        stored = []
+        for i, (name, data) in enumerate(inputs):
+            path = os.path.join(input_dir, f"{i:05d}_{_safe_name(name)}")
+            with open(path, "wb") as f:
+                if isinstance(data, (bytes, bytearray, memoryview)):
+                    f.write(data)
+                else:
+                    data.seek(0)
+                    shutil.copyfileobj(data, f)
+            stored.append({"name": name, "path": path})
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, operation, options, inputs, status, created, total)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, operation, json.dumps(options), json.dumps(stored), STATUS_QUEUED, time.time(), len(stored)),
+            )
+        return job_id
+
+    def get(self, job_id):
+        """Estado atual do trabalho, ou None se não existe (ou expirou)."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or (row["expires"] and row["expires"] < time.time()):
+            return None
+        return Job(
+            id=row["id"],
+            operation=row["operation"],
+            status=row["status"],
+            created=row["created"],
+            started=row["started"],
+            finished=row["finished"],
+            expires=row["expires"],
+            done=row["done"],
+            total=row["total"],
+            output_name=row["output_name"],
+            error=row["error"],
+            failures=json.loads(row["failures"]),
+        )
+
+    def open_result(self, job_id):
+        """Arquivo de saída de um trabalho concluído (aberto), ou None."""
+        job = self.get(job_id)
+        if job is None or not job.ok:
+            return None
+        try:
+            return open(os.path.join(self.job_dir(job_id), job.output_name), "rb")
+        except FileNotFoundError:
+            return None
+
+    def claim(self):
+        """Reserva o trabalho mais antigo da fila para este processo."""
+        # SELECT + UPDATE numa transação (e não UPDATE ... RETURNING, que
+        # exige SQLite 3.35): dois workers nunca reservam o mesmo trabalho
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id, operation, options, inputs FROM jobs WHERE status = ? ORDER BY created LIMIT 1",
+                (STATUS_QUEUED,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, started = ?, worker_pid = ? WHERE id = ?",
+                (STATUS_RUNNING, time.time(), os.getpid(), row["id"]),
+            )
+        return row["id"], row["operation"], json.loads(row["options"]), json.loads(row["inputs"])
+
+    def set_progress(self, job_id, done):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET done = ? WHERE id = ?", (done, job_id))
+
+    def finish(self, job_id, output_name=None, error=None, failures=()):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished = ?, expires = ?, output_name = ?,"
+                " error = ?, failures = ? WHERE id = ?",
+                (
+                    STATUS_FAILED if error else STATUS_DONE, now, now + self.ttl_seconds,
+                    output_name, error, json.dumps(list(failures)), job_id,
+                ),
+            )
+        # As entradas não são mais necessárias; a saída fica até expirar
+        shutil.rmtree(os.path.join(self.job_dir(job_id), "entrada"), ignore_errors=True)
+
+    def add_metrics(self, measurements):
+        """Guarda medições de um worker para o processo do app (drain_metrics)."""
+        if not measurements:
+            return
+        with self._connect() as conn:
+            conn.executemany("INSERT INTO metrics (data) VALUES (?)", [(json.dumps(m),) for m in measurements])
+
+    def drain_metrics(self):
+        """Retira e devolve as medições guardadas pelos workers."""
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT data FROM metrics").fetchall()
+            conn.execute("DELETE FROM metrics")
+        return [json.loads(row["data"]) for row in rows]
+
+    def requeue_orphans(self):
+        """Devolve à fila os trabalhos cujo worker morreu (ex.: reinício)."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, worker_pid FROM jobs WHERE status = ?", (STATUS_RUNNING,)
+            ).fetchall()
+            orphans = [row["id"] for row in rows if not row["worker_pid"] or not _pid_alive(row["worker_pid"])]
+            for job_id in orphans:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, started = NULL, worker_pid = NULL, done = 0 WHERE id = ?",
+                    (STATUS_QUEUED, job_id),
+                )
+        return len(orphans)
+
+    def purge_expired(self):
+        """Remove trabalhos (e arquivos) com o prazo de retenção vencido."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id FROM jobs WHERE expires < ?", (time.time(),)).fetchall()
+            for row in rows:
+                shutil.rmtree(self.job_dir(row["id"]), ignore_errors=True)
+                conn.execute("DELETE FROM jobs WHERE id = ?", (row["id"],))
+        return len(rows)
+
+
+job_queue = JobQueue()
+
+
+# --- Execução ---
+
+def _convert_input(operation_name, input_path, options):
+    with open(input_path, "rb") as file_obj:
+        result = OPERATIONS[operation_name].handler(file_obj, options)
+    if isinstance(result, (bytes, bytearray)):
+        return result
+    with result:
+        return result.read()
+
+
+def run_job(queue, job_id, operation_name, options, inputs):
+    """Executa um trabalho já reservado e grava a saída em JOBS_DIR/<id>/."""
+    operation = OPERATIONS[operation_name]
+    job_dir = queue.job_dir(job_id)
+    try:
+        if len(inputs) == 1:
+            name = output_name(operation_name, inputs[0]["name"], options)
+            with open(inputs[0]["path"], "rb") as file_obj:
+                result = operation.handler(file_obj, options)
+            write_result(result, os.path.join(job_dir, name))
+            queue.set_progress(job_id, 1)
+            queue.finish(job_id, output_name=name)
+            return
+
+        # Lote: as saídas vão para o .zip final conforme ficam prontas
+        name = "fileflow_lote.zip"
+        failures = []
+        tmp_path = os.path.join(job_dir, name + ".part")
+        with open(tmp_path, "wb") as out, StreamingZip(file=out) as archive:
+            results = iter_batch(
+                _convert_input,
+                [(operation_name, item["path"], options) for item in inputs],
+                use_threads=operation.use_threads,
+                on_progress=lambda done, total: queue.set_progress(job_id, done),
+            )
+            for item, result in zip(inputs, results):
+                if result.ok:
+                    archive.add(output_name(operation_name, item["name"], options), result.output)
+                else:
+                    failures.append({"name": item["name"], "error": result.error})
+        if archive.count == 0:
+            os.remove(tmp_path)
+            queue.finish(job_id, error="Nenhum arquivo pôde ser convertido.", failures=failures)
+            return
+        os.replace(tmp_path, os.path.join(job_dir, name))
+        queue.finish(job_id, output_name=name, failures=failures)
+    except Exception as e:
+        queue.finish(job_id, error=f"{type(e).__name__}: {e}")
+
+
+def worker_loop(directory=JOBS_DIR, watch_parent=False, stop_event=None):
+    """
+    Laço de um worker: reserva e executa trabalhos até stop_event ser
+    acionado ou, com watch_parent, o processo que o iniciou terminar.
+    """
+    # Com forkserver o pai no sistema é o servidor, não quem pediu o worker
+    parent = multiprocessing.parent_process() if watch_parent else None
+    queue = JobQueue(directory)
+    last_purge = 0
+    while not (stop_event and stop_event.is_set()):
+        if parent is not None and not parent.is_alive():
+            return
+        if time.time() - last_purge > PURGE_INTERVAL:
+            queue.purge_expired()
+            last_purge = time.time()
+        claimed = queue.claim()
+        if claimed is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        with metrics.collecting() as measurements:
+            run_job(queue, *claimed)
+        queue.add_metrics(measurements)
+
+
+_workers = []
+_workers_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # Os workers listados são filhos do pai, não deste processo
+    global _workers_lock
+    _workers_lock = threading.Lock()
+    _workers.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def start_workers(num_workers=None, directory=JOBS_DIR):
+    """
+    Inicia (uma vez por processo) os workers da fila em processos daemon.
+    Trabalhos que estavam em execução por um worker morto voltam à fila.
+    """
+    if num_workers is None:
+        num_workers = JOB_WORKERS
+    queue = job_queue if directory == job_queue.directory else JobQueue(directory)
+    # As métricas dos trabalhos (inclusive de "fileflow worker" em outro
+    # processo) chegam ao processo que iniciou os workers
+    metrics.registry.add_source(queue.drain_metrics)
+    with _workers_lock:
+        alive = [p for p in _workers if p.is_alive()]
+        if len(alive) >= num_workers:
+            return alive
+        queue.requeue_orphans()
+        ctx = _mp_context()
+        for _ in range(num_workers - len(alive)):
+            proc = ctx.Process(
+                target=worker_loop, args=(directory, True), daemon=True, name="fileflow-job-worker"
+            )
+            proc.start()
+            alive.append(proc)
+        _workers[:] = alive
+        return alive
@@ -0,0 +1,428 @@
+import atexit
+import contextlib
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+
+# --- Métricas por Operação ---
+
+# Cada conversão (todas as funções com cached_result, mais as de streaming)
+# registra tempo de parede e de CPU, pico de memória, bytes de entrada e
+# saída e páginas/linhas processadas. Os registros ficam em memória no
+# processo do app; os feitos em workers do lote (fileflow.batch) e da fila
+# (fileflow.jobs) são devolvidos a ele. Exportação no formato texto do
+# Prometheus: arquivo (FILEFLOW_METRICS_FILE, regravado a cada
+# FILEFLOW_METRICS_FILE_INTERVAL segundos), HTTP (FILEFLOW_METRICS_PORT)
+# ou o painel de administração do app.
+
+METRICS_ENABLED = os.environ.get("FILEFLOW_METRICS", "1") != "0"
+METRICS_FILE = os.environ.get("FILEFLOW_METRICS_FILE")
+METRICS_FILE_INTERVAL = float(os.environ.get("FILEFLOW_METRICS_FILE_INTERVAL", 15))
+METRICS_PORT = int(os.environ.get("FILEFLOW_METRICS_PORT", 0))
+# Zera o pico de memória (clear_refs) no início de cada operação: o pico
+# passa a ser o da operação, mas o kernel percorre as tabelas de páginas do
+# processo a cada reset. Sem isso, o pico registrado é o do processo.
+RESET_PEAK_RSS = os.environ.get("FILEFLOW_METRICS_RESET_PEAK", "0") == "1"
+
+# Limites (segundos) do histograma de tempo e amostras guardadas por
+# operação para os percentis do painel
+WALL_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+RECENT_SAMPLES = 256
+
+_current = contextvars.ContextVar("fileflow_measurement", default=None)
+_sink = contextvars.ContextVar("fileflow_metrics_sink", default=None)
+
+
+@dataclass
+class Measurement:
+    """Uma chamada de operação."""
+    operation: str
+    wall: float = 0.0
+    cpu: float = 0.0
+    peak_rss: int = 0
+    input_bytes: int = 0
+    output_bytes: int = 0
+    items: dict = field(default_factory=dict)
+    cache: str = "none"
+    error: bool = False
+
+
+@dataclass
+class OperationStats:
+    """Acumulado de uma operação desde o início do processo."""
+    calls: dict = field(default_factory=dict)
+    errors: int = 0
+    wall: float = 0.0
+    cpu: float = 0.0
+    peak_rss: int = 0
+    input_bytes: int = 0
+    output_bytes: int = 0
+    items: dict = field(default_factory=dict)
+    buckets: list = field(default_factory=lambda: [0] * len(WALL_BUCKETS))
+    recent: deque = field(default_factory=lambda: deque(maxlen=RECENT_SAMPLES))
+
+    @property
+    def count(self):
+        return sum(self.calls.values())
+
+    def add(self, m):
+        self.calls[m.cache] = self.calls.get(m.cache, 0) + 1
+        self.errors += m.error
+        self.wall += m.wall
+        self.cpu += m.cpu
+        self.peak_rss = max(self.peak_rss, m.peak_rss)
+        self.input_bytes += m.input_bytes
+        self.output_bytes += m.output_bytes
+        for unit, amount in m.items.items():
+            self.items[unit] = self.items.get(unit, 0) + amount
+        for i, limit in enumerate(WALL_BUCKETS):
+            if m.wall <= limit:
+                self.buckets[i] += 1
+        self.recent.append(m.wall)
+
+
+# --- Memória ---
+
+def _read_status_kb(field_name):
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith(field_name):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _peak_rss():
+    """Pico de memória residente do processo (desde o último reset)."""
+    peak = _read_status_kb("VmHWM:")
+    if peak is None:
+        # Sem /proc: pico desde o início do processo. O módulo resource só
+        # existe em Unix (no Windows o pico fica em 0).
+        try:
+            import resource
+        except ImportError:
+            return 0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss vem em bytes no macOS e em KB nos demais
+        if sys.platform != "darwin":
+            peak *= 1024
+    return peak
+
+
+def _reset_peak_rss():
+    # Linux: "5" em clear_refs zera o VmHWM; sem permissão o pico continua
+    # sendo o do processo
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+
+
+def payload_size(value):
+    """Tamanho em bytes de bytes, listas deles ou arquivos (0 se desconhecido)."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return memoryview(value).nbytes
+    if isinstance(value, (list, tuple)):
+        return sum(payload_size(item) for item in value)
+    size = getattr(value, "size", None)
+    if isinstance(size, int):
+        return size  # UploadedFile do Streamlit
+    if hasattr(value, "seek") and hasattr(value, "tell"):
+        try:
+            position = value.tell()
+            size = value.seek(0, os.SEEK_END)
+            value.seek(position)
+            return size
+        except (OSError, ValueError, TypeError):
+            # TypeError: seek() de outra natureza (ex.: quadros de PIL.Image)
+            return 0
+    return 0
+
+
+# --- Registro ---
+
+class MetricsRegistry:
+    """Acumula as medições por operação (seguro entre threads)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._sources = []
+        self._active = 0
+
+    def _add(self, measurements):
+        with self._lock:
+            for measurement in measurements:
+                if isinstance(measurement, dict):
+                    measurement = Measurement(**measurement)
+                self._stats.setdefault(measurement.operation, OperationStats()).add(measurement)
+
+    def record(self, measurement):
+        self.merge([measurement])
+
+    def merge(self, measurements):
+        """Incorpora medições (ou dicts, vindos de workers de outros processos)."""
+        if measurements:
+            self._add(measurements)
+
+    def add_source(self, source):
+        """source() devolve medições pendentes de outro processo (ex.: a fila)."""
+        with self._lock:
+            if source not in self._sources:
+                self._sources.append(source)
+
+    def snapshot(self):
+        """Cópia das estatísticas por operação, já com as fontes externas."""
+        for source in list(self._sources):
+            try:
+                self._add(source())
+            except Exception:
+                pass
+        with self._lock:
+            return {
+                name: OperationStats(
+                    dict(s.calls), s.errors, s.wall, s.cpu, s.peak_rss, s.input_bytes,
+                    s.output_bytes, dict(s.items), list(s.buckets), deque(s.recent, maxlen=RECENT_SAMPLES),
+                )
+                for name, s in self._stats.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+registry = MetricsRegistry()
+
+
+@contextlib.contextmanager
+def measure(operation, inputs=()):
+    """
+    Mede o bloco como uma chamada de operation e devolve a Measurement (ou
+    None com as métricas desativadas): quem chama pode preencher cache e
+    output_bytes. inputs são os argumentos cujo tamanho conta como entrada.
+    """
+    if not METRICS_ENABLED:
+        yield None
+        return
+    measurement = Measurement(operation, input_bytes=sum(payload_size(value) for value in inputs))
+    with registry._lock:
+        # O pico só é zerado sem outra operação em andamento no processo
+        registry._active += 1
+        if RESET_PEAK_RSS and registry._active == 1:
+            _reset_peak_rss()
+    token = _current.set(measurement)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield measurement
+    except BaseException:
+        measurement.error = True
+        raise
+    finally:
+        measurement.wall = time.perf_counter() - wall_start
+        # Tempo de CPU do processo inteiro (inclui as threads do ONNX etc.)
+        measurement.cpu = time.process_time() - cpu_start
+        measurement.peak_rss = _peak_rss()
+        _current.reset(token)
+        with registry._lock:
+            registry._active -= 1
+        report([asdict(measurement)])
+
+
+def measured(operation):
+    """Decorador: mede cada chamada da função (veja measure)."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with measure(operation, args + tuple(kwargs.values())) as measurement:
+                result = func(*args, **kwargs)
+                if measurement is not None:
+                    measurement.output_bytes = payload_size(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def count(unit, amount):
+    """Soma itens processados (ex.: "pages", "rows") à operação em andamento."""
+    measurement = _current.get()
+    if measurement is not None:
+        measurement.items[unit] = measurement.items.get(unit, 0) + amount
+
+
+def report(measurements):
+    """Registra medições (dicts), ou as guarda se houver coleta em andamento."""
+    sink = _sink.get()
+    if sink is not None:
+        sink.extend(measurements)
+    else:
+        registry.merge(measurements)
+
+
+@contextlib.contextmanager
+def collecting():
+    """
+    Em um worker: guarda as medições do bloco numa lista (de dicts) em vez
+    de registrá-las, para devolvê-las ao processo principal (merge).
+    """
+    measurements = []
+    token = _sink.set(measurements)
+    try:
+        yield measurements
+    finally:
+        _sink.reset(token)
+
+
+# --- Exportação ---
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+def render_prometheus(metrics_registry=None):
+    """Estatísticas no formato texto de exposição do Prometheus."""
+    stats = (metrics_registry or registry).snapshot()
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+
+    family("fileflow_operation_calls_total", "counter", "Chamadas por operação e resultado do cache.", [
+        f"fileflow_operation_calls_total{_labels(operation=op, cache=cache)} {n}"
+        for op, s in stats.items() for cache, n in sorted(s.calls.items())
+    ])
+    family("fileflow_operation_errors_total", "counter", "Chamadas que terminaram em erro.", [
+        f"fileflow_operation_errors_total{_labels(operation=op)} {s.errors}" for op, s in stats.items()
+    ])
+    wall = []
+    for op, s in stats.items():
+        for limit, n in zip(WALL_BUCKETS, s.buckets):
+            wall.append(f"fileflow_operation_wall_seconds_bucket{_labels(operation=op, le=limit)} {n}")
+        wall.append(f'fileflow_operation_wall_seconds_bucket{_labels(operation=op, le="+Inf")} {s.count}')
+        wall.append(f"fileflow_operation_wall_seconds_sum{_labels(operation=op)} {s.wall:.6f}")
+        wall.append(f"fileflow_operation_wall_seconds_count{_labels(operation=op)} {s.count}")
+    family("fileflow_operation_wall_seconds", "histogram", "Tempo de parede por chamada.", wall)
+    family("fileflow_operation_cpu_seconds_total", "counter", "Tempo de CPU do processo durante as chamadas.", [
+        f"fileflow_operation_cpu_seconds_total{_labels(operation=op)} {s.cpu:.6f}" for op, s in stats.items()
+    ])
+    family("fileflow_operation_peak_rss_bytes", "gauge", "Maior pico de memória residente observado.", [
+        f"fileflow_operation_peak_rss_bytes{_labels(operation=op)} {s.peak_rss}" for op, s in stats.items()
+    ])
+    family("fileflow_operation_input_bytes_total", "counter", "Bytes de entrada.", [
+        f"fileflow_operation_input_bytes_total{_labels(operation=op)} {s.input_bytes}" for op, s in stats.items()
+    ])
+    family("fileflow_operation_output_bytes_total", "counter", "Bytes de saída.", [
+        f"fileflow_operation_output_bytes_total{_labels(operation=op)} {s.output_bytes}" for op, s in stats.items()
+    ])
+    family("fileflow_operation_items_total", "counter", "Páginas, linhas etc. processadas.", [
+        f"fileflow_operation_items_total{_labels(operation=op, unit=unit)} {n}"
+        for op, s in stats.items() for unit, n in sorted(s.items.items())
+    ])
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path, metrics_registry=None):
+    """Grava as métricas (ex.: para o textfile collector do node_exporter)."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        out.write(render_prometheus(metrics_registry))
+    os.replace(tmp_path, path)
+
+
+def _metrics_handler():
+    # http.server (e o que ele importa) só é carregado se o endpoint for usado
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None, host="127.0.0.1"):
+    """
+    Serve /metrics em uma thread daemon (uma vez por processo) e retorna o
+    servidor. port=None usa FILEFLOW_METRICS_PORT.
+    """
+    from http.server import ThreadingHTTPServer
+
+    global _server
+    if port is None:
+        port = METRICS_PORT
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _metrics_handler())
+            threading.Thread(target=_server.serve_forever, daemon=True, name="fileflow-metrics").start()
+        return _server
+
+
+_writer = None
+
+
+def start_metrics_writer(path=None, interval=None):
+    """
+    Regrava o arquivo de métricas a cada interval segundos em uma thread
+    daemon (uma vez por processo) e uma última vez na saída do processo.
+    path=None usa FILEFLOW_METRICS_FILE; interval=None, o intervalo padrão.
+    """
+    global _writer
+    path = path or METRICS_FILE
+    interval = METRICS_FILE_INTERVAL if interval is None else interval
+    with _server_lock:
+        if _writer is None:
+            def run():
+                while True:
+                    time.sleep(interval)
+                    _write_quietly(path)
+
+            _writer = threading.Thread(target=run, daemon=True, name="fileflow-metrics-file")
+            _writer.start()
+            atexit.register(_write_quietly, path)
+        return _writer
+
+
+def _write_quietly(path):
+    try:
+        write_prometheus(path)
+    except OSError:
+        pass
+
+
+def _reset_after_fork():
+    # Veja cache._reset_locks_after_fork: o filho não herda as threads que
+    # seguravam os locks nem as operações que elas mediam
+    global _server, _server_lock, _writer
+    registry._lock = threading.Lock()
+    registry._active = 0
+    _server, _server_lock, _writer = None, threading.Lock(), None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,243 @@
+"""
+Operações de conversão por arquivo, compartilhadas pela linha de comando
+(fileflow.cli) e pela fila de trabalhos (fileflow.jobs).
+"""
+import os
+import shutil
+from dataclasses import dataclass, field
+
+from fileflow.uploads import upload_buffer
+
+# --- Operações ---
+
+# Cada handler recebe o arquivo de entrada aberto e as opções (da linha de
+# comando ou do trabalho na fila), e importa só o módulo de que precisa (os
+# workers não carregam rembg/onnxruntime para converter um CSV). A entrada é
+# mapeada em memória (upload_buffer), sem ser lida inteira para bytes.
+
+
+def _pdf_to_word(file_obj, options):
+    from fileflow.convert import convert_pdf_to_word
+    return convert_pdf_to_word(upload_buffer(file_obj))
+
+
+def _image_to_format(file_obj, options):
+    from fileflow.convert import convert_image_to_format
+    return convert_image_to_format(
+        upload_buffer(file_obj), options["format"], max_size=options.get("max_size"), quality=options.get("quality")
+    )
+
+
+def _image_to_pdf(file_obj, options):
+    from fileflow.convert import convert_image_to_pdf
+    return convert_image_to_pdf(upload_buffer(file_obj), max_size=options.get("max_size"))
+
+
+def _excel_to_pdf(file_obj, options):
+    from fileflow.convert import convert_excel_to_pdf
+    return convert_excel_to_pdf(upload_buffer(file_obj), all_sheets=options.get("all_sheets", False))
+
+
+def _remove_background(file_obj, options):
+    from fileflow.image import remove_background
+    return remove_background(
+        upload_buffer(file_obj), fast=options.get("fast", False), target_format=options.get("format"),
+    )
+
+
+def _optimize_image(file_obj, options):
+    from fileflow.image import optimize_image
+    return optimize_image(
+        upload_buffer(file_obj),
+        max_size=options.get("max_size"),
+        quality=options.get("quality"),
+        target_format=options.get("format"),
+        max_bytes=options["max_kb"] * 1024 if options.get("max_kb") else None,
+        allow_resize=not options.get("no_resize", False),
+    )
+
+
+def _split_pdf(file_obj, options):
+    from fileflow.pdf import parse_page_ranges, split_pdf
+    file_bytes = upload_buffer(file_obj)
+    page_ranges = None
+    if options.get("ranges"):
+        from fileflow.thumbnails import pdf_page_count
+        page_ranges = parse_page_ranges(options["ranges"], pdf_page_count(file_bytes))
+    return split_pdf(file_bytes, pages_per_file=options.get("pages_per_file"), page_ranges=page_ranges)
+
+
+def _compress_pdf(file_obj, options):
+    from fileflow.pdf import COMPRESS_DEFAULT_DPI, COMPRESS_DEFAULT_QUALITY, compress_pdf
+    return compress_pdf(
+        upload_buffer(file_obj),
+        dpi=options.get("dpi") or COMPRESS_DEFAULT_DPI,
+        quality=options.get("quality") or COMPRESS_DEFAULT_QUALITY,
+    )
+
+
+def _excel_to_json(file_obj, options):
+    from fileflow.data import convert_excel_to_json_streaming
+    return convert_excel_to_json_streaming(file_obj, ndjson=options.get("ndjson", False))
+
+
+def _csv_to_json(file_obj, options):
+    from fileflow.data import convert_csv_to_json_streaming
+    return convert_csv_to_json_streaming(file_obj, ndjson=options.get("ndjson", False), engine=options.get("engine"))
+
+
+def _json_to_csv(file_obj, options):
+    from fileflow.data import convert_json_to_csv_streaming
+    return convert_json_to_csv_streaming(file_obj)
+
+
+def _csv_to_parquet(file_obj, options):
+    from fileflow.data import convert_csv_to_parquet
+    return convert_csv_to_parquet(upload_buffer(file_obj), engine=options.get("engine"))
+
+
+def _json_to_parquet(file_obj, options):
+    from fileflow.data import convert_json_to_parquet
+    return convert_json_to_parquet(upload_buffer(file_obj))
+
+
+def _parquet_to_csv(file_obj, options):
+    from fileflow.data import convert_parquet_to_csv
+    return convert_parquet_to_csv(file_obj)
+
+
+def _parquet_to_json(file_obj, options):
+    from fileflow.data import convert_parquet_to_json
+    return convert_parquet_to_json(file_obj, ndjson=options.get("ndjson", False))
+
+
+# Opções de linha de comando comuns às operações de imagem
+_IMAGE_FORMATS = ["PNG", "JPG", "WEBP", "AVIF"]
+_MAX_SIZE_ARGUMENT = (("--max-size",), {"type": int, "help": "limita o maior lado (px), reduzindo já na leitura"})
+_QUALITY_ARGUMENT = (("--quality",), {"type": int, "help": "qualidade 1-100 (padrão: do formato)"})
+
+# Opções comuns às operações de dados
+_NDJSON_ARGUMENT = (("--ndjson",), {"action": "store_true", "help": "um objeto JSON por linha"})
+_ENGINE_ARGUMENT = (
+    ("--engine",),
+    {"choices": ["auto", "arrow", "pandas"], "help": "leitor de CSV (padrão: FILEFLOW_DATA_ENGINE ou auto)"},
+)
+
+
+@dataclass
+class Operation:
+    """Conversão de um arquivo para outro, aplicada a cada entrada."""
+    handler: object
+    extensions: tuple
+    output: str
+    help: str
+    # Threads em vez de processos: a sessão ONNX é compartilhada (ver image.py)
+    use_threads: bool = False
+    arguments: list = field(default_factory=list)
+
+
+OPERATIONS = {
+    "pdf-to-word": Operation(_pdf_to_word, (".pdf",), "{base}.docx", "PDF para Word (.docx)"),
+    "image-to-format": Operation(
+        _image_to_format, (".png", ".jpg", ".jpeg", ".webp"), "{base}.{format_ext}",
+        "Imagem para PNG, JPG, WebP ou AVIF",
+        arguments=[
+            (("--format",), {"choices": _IMAGE_FORMATS, "required": True, "type": str.upper}),
+            _MAX_SIZE_ARGUMENT,
+            _QUALITY_ARGUMENT,
+        ],
+    ),
+    "image-to-pdf": Operation(
+        _image_to_pdf, (".png", ".jpg", ".jpeg"), "{base}.pdf", "Imagem para PDF",
+        arguments=[_MAX_SIZE_ARGUMENT],
+    ),
+    "excel-to-pdf": Operation(
+        _excel_to_pdf, (".xlsx",), "{base}.pdf", "Excel para PDF",
+        arguments=[(("--all-sheets",), {"action": "store_true", "help": "todas as planilhas"})],
+    ),
+    "remove-background": Operation(
+        _remove_background, (".png", ".jpg", ".jpeg"), "{base}_sem_fundo.{alpha_ext}",
+        "Remove o fundo de imagens", use_threads=True,
+        arguments=[
+            (("--fast",), {"action": "store_true", "help": "máscara em baixa resolução (fotos grandes)"}),
+            (("--format",), {"choices": ["PNG", "WEBP", "AVIF"], "type": str.upper, "help": "padrão: PNG"}),
+        ],
+    ),
+    "optimize-image": Operation(
+        _optimize_image, (".png", ".jpg", ".jpeg", ".webp"), "{base}_otimizada.{format_ext}", "Otimiza imagens",
+        arguments=[
+            (("--format",), {"choices": _IMAGE_FORMATS, "type": str.upper, "help": "padrão: o da entrada"}),
+            _MAX_SIZE_ARGUMENT,
+            (("--quality",), {"type": int, "help": "qualidade 1-100 (com --max-kb, a máxima)"}),
+            (("--max-kb",), {"type": int, "help": "tamanho máximo do arquivo (KB), ajustando a qualidade"}),
+            (("--no-resize",), {"action": "store_true", "help": "com --max-kb, não reduz as dimensões"}),
+        ],
+    ),
+    "split-pdf": Operation(
+        _split_pdf, (".pdf",), "{base}_dividido.zip", "Divide PDFs em um .zip",
+        arguments=[
+            (("--pages-per-file",), {"type": int, "help": "agrupa a cada N páginas"}),
+            (("--ranges",), {"help": "intervalos, ex.: '1-3, 5, 8-'"}),
+        ],
+    ),
+    "compress-pdf": Operation(
+        _compress_pdf, (".pdf",), "{base}_comprimido.pdf", "Comprime PDFs (imagens reduzidas e gravação compacta)",
+        arguments=[
+            (("--dpi",), {"type": int, "help": "resolução máxima das imagens (padrão: 150)"}),
+            (("--quality",), {"type": int, "help": "qualidade JPEG 1-100 das imagens (padrão: 75)"}),
+        ],
+    ),
+    "excel-to-json": Operation(
+        _excel_to_json, (".xlsx",), "{base}.{json_ext}", "Excel para JSON", arguments=[_NDJSON_ARGUMENT],
+    ),
+    "csv-to-json": Operation(
+        _csv_to_json, (".csv",), "{base}.{json_ext}", "CSV para JSON", arguments=[_NDJSON_ARGUMENT, _ENGINE_ARGUMENT],
+    ),
+    "json-to-csv": Operation(_json_to_csv, (".json", ".ndjson", ".jsonl"), "{base}.csv", "JSON para CSV"),
+    "csv-to-parquet": Operation(
+        _csv_to_parquet, (".csv",), "{base}.parquet", "CSV para Parquet (requer pyarrow)",
+        arguments=[_ENGINE_ARGUMENT],
+    ),
+    "json-to-parquet": Operation(
+        _json_to_parquet, (".json", ".ndjson", ".jsonl"), "{base}.parquet", "JSON para Parquet (requer pyarrow)",
+    ),
+    "parquet-to-csv": Operation(_parquet_to_csv, (".parquet",), "{base}.csv", "Parquet para CSV (requer pyarrow)"),
+    "parquet-to-json": Operation(
+        _parquet_to_json, (".parquet",), "{base}.{json_ext}", "Parquet para JSON (requer pyarrow)",
+        arguments=[_NDJSON_ARGUMENT],
+    ),
+}
+
+
+def output_name(operation_name, input_name, options):
+    """Nome do arquivo de saída da operação para uma entrada."""
+    base, ext = os.path.splitext(os.path.basename(input_name))
+    target_format = (options.get("format") or ext.lstrip(".")).lower()
+    return OPERATIONS[operation_name].output.format(
+        base=base,
+        ext=ext,
+        format_ext="jpg" if target_format == "jpeg" else target_format,
+        json_ext="ndjson" if options.get("ndjson") else "json",
+        alpha_ext=(options.get("format") or "png").lower(),
+    )
+
+
+def write_result(result, output_path):
+    """
+    Grava o resultado de um handler (bytes ou arquivo aberto) em disco, via
+    arquivo .part renomeado no final: uma saída parcial nunca fica no lugar.
+    """
+    tmp_path = output_path + ".part"
+    try:
+        with open(tmp_path, "wb") as out:
+            if isinstance(result, (bytes, bytearray)):
+                out.write(result)
+            else:
+                with result:
+                    shutil.copyfileobj(result, out)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return output_path
@@ -0,0 +1,512 @@
+import hashlib
+import math
+import os
+import re
+import tempfile
+
+import fitz  # PyMuPDF
+
+from fileflow import metrics
+from fileflow.archive import StreamingZip
+from fileflow.batch import iter_batch
+from fileflow.cache import cached_result
+from fileflow.thumbnails import content_hash, pdf_page_count, render_thumbnails
+from fileflow.uploads import upload_buffer
+
+# --- Funções de PDF (Bloco 3) ---
+
+# Páginas copiadas entre gravações da saída do merge: a cada lote, o que já
+# foi copiado vai para o disco e deixa de ocupar memória
+MERGE_FLUSH_PAGES = 200
+
+
+def _as_pdf_bytes(item):
+    """Aceita bytes, buffers ou um arquivo binário (ex.: UploadedFile), sem copiar."""
+    return upload_buffer(item)
+
+
+def _flush_merged(doc, path):
+    """Grava o lote no arquivo (append incremental após o primeiro) e o reabre de lá."""
+    if doc.name:
+        doc.saveIncr()
+    else:
+        doc.save(path)
+    doc.close()
+    return fitz.open(path)
+
+
+_REF_RE = re.compile(rb"(\d+) 0 R")
+_RESOURCE_ENTRY_RE = re.compile(r"/([^\s/<>\[\]()]+)\s+(\d+) 0 R")
+
+
+def _object_signature(doc, xref, memo, depth=0):
+    """
+    Hash do objeto com as referências internas substituídas pelo hash dos
+    objetos apontados (mais o conteúdo bruto, se for stream): cópias do
+    mesmo logotipo ou fonte vindas de PDFs diferentes têm a mesma assinatura.
+    """
+    if xref in memo:
+        return memo[xref]
+    if depth > 16:
+        return f"xref:{xref}".encode()
+    memo[xref] = f"xref:{xref}".encode()  # evita ciclos
+    source = doc.xref_object(xref, compressed=True).encode("latin-1", errors="replace")
+    digest = hashlib.sha256(_REF_RE.sub(
+        lambda m: b"<" + _object_signature(doc, int(m.group(1)), memo, depth + 1) + b">", source
+    ))
+    if doc.xref_is_stream(xref):
+        digest.update(doc.xref_stream_raw(xref))
+    memo[xref] = digest.hexdigest().encode()
+    return memo[xref]
+
+
+def _dedupe_resources(doc):
+    """
+    Aponta as imagens e fontes repetidas entre as entradas para uma única
+    cópia; as demais ficam sem referência e são descartadas no save.
+    """
+    memo = {}
+    canonical = {}
+    for page in doc:
+        # xref_set_key não atravessa referências indiretas no caminho: cada
+        # nível indireto passa a ser o objeto alterado
+        holder, prefix = page.xref, "Resources/"
+        kind, value = doc.xref_get_key(holder, "Resources")
+        if kind == "xref":
+            holder, prefix = int(value.split()[0]), ""
+        for category in ("XObject", "Font"):
+            kind, value = doc.xref_get_key(holder, prefix + category)
+            if kind == "xref":
+                target, path = int(value.split()[0]), ""
+                value = doc.xref_object(target, compressed=True)
+            elif kind == "dict":
+                target, path = holder, f"{prefix}{category}/"
+            else:
+                continue
+            for name, xref in _RESOURCE_ENTRY_RE.findall(value):
+                xref = int(xref)
+                first = canonical.setdefault(_object_signature(doc, xref, memo), xref)
+                if first != xref:
+                    doc.xref_set_key(target, path + name, f"{first} 0 R")
+
+
+@cached_result("merge_pdfs", returns_file=True)
+def merge_pdfs(files_list, dedupe=True):
+    """
+    Junta múltiplos arquivos PDF (lista ou iterador de bytes/arquivos) em um
+    só e retorna um arquivo temporário posicionado no início.
+
+    As entradas são consumidas uma a uma e as páginas copiadas vão para o
+    disco a cada MERGE_FLUSH_PAGES: em memória ficam só a entrada atual e o
+    lote em andamento. Com dedupe=True, objetos idênticos entre as entradas
+    (fontes, imagens) são gravados uma vez só.
+    """
+    # O MuPDF grava pelo caminho; o arquivo aberto continua acessível
+    # depois de removido do diretório
+    fd, batch_path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    merged = fitz.open()
+    try:
+        pending = 0
+        for item in files_list:
+            with fitz.open(stream=_as_pdf_bytes(item), filetype="pdf") as src:
+                if src.needs_pass:
+                    raise ValueError("PDF protegido por senha.")
+                merged.insert_pdf(src)
+                pending += len(src)
+            if pending >= MERGE_FLUSH_PAGES:
+                merged = _flush_merged(merged, batch_path)
+                pending = 0
+        metrics.count("pages", len(merged))
+        if dedupe:
+            _dedupe_resources(merged)
+
+        # Gravação final completa: descarta as cópias que o dedupe deixou sem
+        # referência e as revisões intermediárias dos lotes
+        merged.save(path, garbage=1)
+        return open(path, "rb")
+    finally:
+        merged.close()
+        os.remove(batch_path)
+        os.remove(path)
+
+# Páginas mínimas por worker ao dividir em paralelo e grupos (arquivos de
+# saída) por tarefa: tarefas pequenas mantêm o .zip sendo escrito em ordem
+SPLIT_MIN_PAGES_PER_WORKER = 32
+SPLIT_GROUPS_PER_TASK = 64
+
+
+def parse_page_ranges(text, num_pages):
+    """
+    Interpreta intervalos como "1-3, 5, 8-" (páginas a partir de 1) e
+    retorna uma lista de pares (início, fim) inclusivos, na ordem digitada.
+    """
+    ranges = []
+    for part in text.replace(";", ",").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        try:
+            first = int(first) if first.strip() else 1
+            last = (int(last) if last.strip() else num_pages) if sep else first
+        except ValueError:
+            raise ValueError(f"Intervalo inválido: '{part}'.") from None
+        if not 1 <= first <= last <= num_pages:
+            raise ValueError(f"Intervalo fora do documento (1-{num_pages}): '{part}'.")
+        ranges.append((first, last))
+    if not ranges:
+        raise ValueError("Nenhum intervalo de páginas informado.")
+    return ranges
+
+
+def _split_groups(num_pages, pages_per_file, page_ranges):
+    """Lista de grupos (primeira, última), 0-based, um por arquivo de saída."""
+    if page_ranges is None:
+        page_ranges = [(1, num_pages)]
+        pages_per_file = pages_per_file or 1
+    groups = []
+    for first, last in page_ranges:
+        step = pages_per_file or (last - first + 1)
+        for start in range(first - 1, last, step):
+            groups.append((start, min(start + step, last) - 1))
+    return groups
+
+
+def _split_name(start, end):
+    if start == end:
+        return f"pagina_{start + 1}.pdf"
+    return f"paginas_{start + 1}-{end + 1}.pdf"
+
+
+def _extract_groups(src, groups):
+    """Copia cada grupo de páginas do documento já aberto para um PDF novo."""
+    outputs = []
+    for start, end in groups:
+        part = fitz.open()
+        part.insert_pdf(src, from_page=start, to_page=end)
+        outputs.append((_split_name(start, end), part.tobytes()))
+        part.close()
+    return outputs
+
+
+def _extract_groups_from_file(path, groups):
+    """Worker: abre o PDF (uma vez por tarefa) e extrai seus grupos."""
+    with fitz.open(path) as src:
+        return _extract_groups(src, groups)
+
+
+@cached_result("split_pdf", ignore=("workers",), returns_file=True)
+def split_pdf(file_bytes, pages_per_file=None, page_ranges=None, workers=1):
+    """
+    Divide um PDF e retorna um .zip (arquivo temporário posicionado no
+    início). Por padrão gera um arquivo por página.
+
+    pages_per_file agrupa as páginas a cada N; page_ranges (pares (início,
+    fim) inclusivos, ex.: de parse_page_ranges) gera um arquivo por
+    intervalo, ou a cada N páginas dentro dele com pages_per_file. O
+    documento é lido uma única vez; com workers > 1, PDFs grandes têm os
+    grupos extraídos em paralelo e gravados no .zip em ordem.
+    """
+    with fitz.open(stream=file_bytes, filetype="pdf") as src:
+        groups = _split_groups(len(src), pages_per_file, page_ranges)
+        num_pages = sum(end - start + 1 for start, end in groups)
+        metrics.count("pages", num_pages)
+        parts = min(workers, num_pages // SPLIT_MIN_PAGES_PER_WORKER)
+
+        with StreamingZip() as archive:
+            if parts <= 1:
+                for start, end in groups:
+                    name, data = _extract_groups(src, [(start, end)])[0]
+                    archive.add(name, data)
+                return archive.file
+
+            # Os workers leem o PDF do disco, sem receber os bytes a cada tarefa
+            with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+                tmp.write(file_bytes)
+                tmp.flush()
+                tasks = [
+                    (tmp.name, groups[i:i + SPLIT_GROUPS_PER_TASK])
+                    for i in range(0, len(groups), SPLIT_GROUPS_PER_TASK)
+                ]
+                for result in iter_batch(_extract_groups_from_file, tasks, max_workers=parts):
+                    if not result.ok:
+                        raise RuntimeError(result.error)
+                    for name, data in result.output:
+                        archive.add(name, data)
+        return archive.file
+
+@metrics.measured("render_pdf_pages")
+def render_pdf_pages(file_bytes, zoom=1):
+    """Renderiza as páginas do PDF como imagens PNG para preview (com cache)."""
+    doc_key = content_hash(file_bytes)
+    num_pages = pdf_page_count(file_bytes, doc_key=doc_key)
+    images = render_thumbnails(file_bytes, range(num_pages), zoom=zoom, doc_key=doc_key, image_format="PNG")
+    metrics.count("pages", num_pages)
+    return images, num_pages
+
+def _page_rotations(pages_to_rotate, rotation, num_pages):
+    """Normaliza lista (todas com rotation) ou dict página -> ângulo."""
+    if not isinstance(pages_to_rotate, dict):
+        pages_to_rotate = dict.fromkeys(pages_to_rotate, rotation)
+    rotations = {}
+    for page_number, angle in pages_to_rotate.items():
+        if not 1 <= page_number <= num_pages:
+            raise ValueError(f"Página fora do documento (1-{num_pages}): {page_number}.")
+        # O /Rotate do PDF só aceita múltiplos de 90 graus
+        if angle % 90:
+            raise ValueError(f"Ângulo de rotação inválido: {angle} (use múltiplos de 90).")
+        if angle % 360:
+            rotations[page_number - 1] = angle
+    return rotations
+
+
+@cached_result("edit_pdf_structure")
+def edit_pdf_structure(file_bytes, pages_to_delete=(), pages_to_rotate=(), page_order=None,
+                       rotation=90, garbage=1, deflate=False):
+    """
+    Edita a estrutura do PDF no próprio documento, sem copiar página a
+    página: exclui, reordena (page_order, lista de páginas a partir de 1;
+    repetir uma página a duplica) e rotaciona páginas.
+
+    pages_to_rotate é uma lista de páginas (giradas em rotation graus) ou um
+    dict página -> ângulo (múltiplos de 90). Só com rotações, as alterações
+    são anexadas ao arquivo original (save incremental); senão o documento é
+    regravado com garbage/deflate.
+    """
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        tmp.write(file_bytes)
+        tmp.flush()
+        with fitz.open(tmp.name) as doc:
+            num_pages = len(doc)
+            metrics.count("pages", num_pages)
+            rotations = _page_rotations(pages_to_rotate, rotation, num_pages)
+
+            order = range(1, num_pages + 1) if page_order is None else page_order
+            deleted = set(pages_to_delete)
+            keep = []
+            for page_number in order:
+                if not 1 <= page_number <= num_pages:
+                    raise ValueError(f"Página fora do documento (1-{num_pages}): {page_number}.")
+                if page_number not in deleted:
+                    keep.append(page_number - 1)
+            if not keep:
+                raise ValueError("O PDF editado ficaria sem páginas.")
+
+            for index, angle in rotations.items():
+                page = doc[index]
+                page.set_rotation((page.rotation + angle) % 360)
+
+            if keep == list(range(num_pages)) and doc.can_save_incrementally():
+                doc.save(tmp.name, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+                tmp.seek(0)
+                return tmp.read()
+
+            # Só exclusões: delete_pages é bem mais rápido que select, que
+            # remonta a árvore de páginas inteira
+            if keep == sorted(set(keep)):
+                doc.delete_pages(sorted(set(range(num_pages)) - set(keep)))
+            else:
+                doc.select(keep)
+            return doc.tobytes(garbage=garbage, deflate=deflate)
+
+
+# --- Compressão ---
+
+# Resolução e qualidade JPEG padrão das imagens, e quanto acima da
+# resolução-alvo uma imagem precisa estar para ser reduzida (como o
+# DownsampleThreshold do Ghostscript): 1.5 evita reamostrar por pouco
+COMPRESS_DEFAULT_DPI = 150
+COMPRESS_DEFAULT_QUALITY = 75
+COMPRESS_DOWNSAMPLE_THRESHOLD = 1.5
+# Gravação compacta: objetos iguais unificados e órfãos removidos
+# (garbage=4), streams comprimidos e objetos agrupados em object streams
+COMPRESS_SAVE_OPTIONS = {"garbage": 4, "deflate": True, "use_objstms": 1}
+# Imagens menores que isso (stream) não compensam a recompressão
+COMPRESS_MIN_IMAGE_BYTES = 8 * 1024
+# Páginas (na busca pelas imagens) e imagens por tarefa no modo paralelo:
+# cada tarefa reabre o PDF do disco
+COMPRESS_PAGES_PER_TASK = 16
+COMPRESS_IMAGES_PER_TASK = 2
+
+# Imagens que não são recomprimidas: máscaras, 1 bit (fax/JBIG2 já são
+# compactos) e transparência por cor (/Mask), que o JPEG não preserva
+_BITONAL_FILTERS = ("CCITTFaxDecode", "JBIG2Decode")
+
+
+def _image_scales(doc, dpi, pages):
+    """
+    xref -> escala que deixa a imagem com dpi na maior área em que ela
+    aparece, pelo tamanho exibido de cada ocorrência nas páginas (range).
+    O MuPDF decodifica as imagens para identificá-las: é a parte lenta.
+    """
+    scales = {}
+    for page_index in pages:
+        for info in doc[page_index].get_image_info(xrefs=True):
+            xref = info.get("xref")
+            if not xref or not info["width"] or not info["height"]:
+                continue
+            a, b, c, d, _, _ = info["transform"]
+            # Tamanho exibido em polegadas (vale também para imagens giradas)
+            needed = max(
+                (a * a + b * b) ** 0.5 / 72 * dpi / info["width"],
+                (c * c + d * d) ** 0.5 / 72 * dpi / info["height"],
+            )
+            scales[xref] = max(scales.get(xref, 0), needed)
+    return scales
+
+
+def _image_scales_from_file(path, pages, dpi):
+    """Worker: abre o PDF e mede as imagens de um intervalo de páginas."""
+    with fitz.open(path) as doc:
+        return _image_scales(doc, dpi, pages)
+
+
+def _all_image_scales(doc, path, dpi, workers):
+    num_pages = len(doc)
+    parts = min(workers, math.ceil(num_pages / COMPRESS_PAGES_PER_TASK))
+    if parts <= 1:
+        return _image_scales(doc, dpi, range(num_pages))
+    scales = {}
+    tasks = [
+        (path, range(start, min(start + COMPRESS_PAGES_PER_TASK, num_pages)), dpi)
+        for start in range(0, num_pages, COMPRESS_PAGES_PER_TASK)
+    ]
+    for result in iter_batch(_image_scales_from_file, tasks, max_workers=parts):
+        if not result.ok:
+            raise RuntimeError(result.error)
+        for xref, scale in result.output.items():
+            scales[xref] = max(scales.get(xref, 0), scale)
+    return scales
+
+
+def _compressible(doc, xref):
+    """Confere no dicionário da imagem se ela pode virar JPEG."""
+    if doc.xref_get_key(xref, "ImageMask")[1] == "true" or doc.xref_get_key(xref, "Mask")[0] != "null":
+        return False
+    if doc.xref_get_key(xref, "BitsPerComponent")[1] == "1":
+        return False
+    filters = doc.xref_get_key(xref, "Filter")[1]
+    return not any(name in filters for name in _BITONAL_FILTERS)
+
+
+def _compress_images(doc, tasks, quality):
+    """
+    Decodifica cada imagem (xref, escala) pelo MuPDF, reduz e codifica em
+    JPEG. Devolve [(xref, jpeg, largura, altura, cinza)].
+    """
+    from PIL import Image
+
+    from fileflow.imaging import encode_image
+
+    outputs = []
+    for xref, scale in tasks:
+        pix = fitz.Pixmap(doc, xref)
+        if pix.alpha:
+            pix = fitz.Pixmap(pix, 0)  # a transparência fica na /SMask original
+        gray = pix.colorspace is not None and pix.colorspace.n == 1
+        if not gray and (pix.colorspace is None or pix.colorspace.n != 3):
+            pix = fitz.Pixmap(fitz.csRGB, pix)
+        img = Image.frombytes("L" if gray else "RGB", (pix.width, pix.height), pix.samples)
+        pix = None
+        if scale < 1:
+            size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+            img = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+        outputs.append((xref, encode_image(img, "JPEG", quality=quality, progressive=False), img.width, img.height, gray))
+    return outputs
+
+
+def _compress_images_from_file(path, tasks, quality):
+    """Worker: abre o PDF (uma vez por tarefa) e recomprime suas imagens."""
+    with fitz.open(path) as doc:
+        return _compress_images(doc, tasks, quality)
+
+
+def _replace_image(doc, xref, data, width, height, gray):
+    doc.update_stream(xref, data, compress=0)
+    doc.xref_set_key(xref, "Filter", "/DCTDecode")
+    doc.xref_set_key(xref, "DecodeParms", "null")
+    doc.xref_set_key(xref, "Decode", "null")
+    doc.xref_set_key(xref, "Width", str(width))
+    doc.xref_set_key(xref, "Height", str(height))
+    doc.xref_set_key(xref, "BitsPerComponent", "8")
+    doc.xref_set_key(xref, "ColorSpace", "/DeviceGray" if gray else "/DeviceRGB")
+
+
+def compress_document(doc, dpi=COMPRESS_DEFAULT_DPI, quality=COMPRESS_DEFAULT_QUALITY, workers=1, path=None):
+    """
+    Recomprime as imagens do documento aberto (veja compress_pdf) e unifica
+    as imagens e fontes repetidas. O paralelismo precisa de path, o arquivo
+    do documento em disco, que os workers reabrem. Salvar com
+    COMPRESS_SAVE_OPTIONS descarta os objetos que ficaram órfãos.
+    """
+    if path is None:
+        workers = 1
+    tasks = []
+    sizes = {}
+    for xref, scale in _all_image_scales(doc, path, dpi, workers).items():
+        if scale * COMPRESS_DOWNSAMPLE_THRESHOLD >= 1:
+            scale = 1
+        if not _compressible(doc, xref):
+            continue
+        sizes[xref] = len(doc.xref_stream_raw(xref))
+        if scale == 1 and sizes[xref] < COMPRESS_MIN_IMAGE_BYTES:
+            continue
+        tasks.append((xref, scale))
+    metrics.count("images", len(tasks))
+
+    # Imagens maiores primeiro: as tarefas pesadas não ficam para o fim
+    tasks.sort(key=lambda task: sizes[task[0]], reverse=True)
+    parts = min(workers, len(tasks))
+    if parts <= 1:
+        outputs = _compress_images(doc, tasks, quality)
+    else:
+        chunks = [tasks[i:i + COMPRESS_IMAGES_PER_TASK] for i in range(0, len(tasks), COMPRESS_IMAGES_PER_TASK)]
+        outputs = []
+        for result in iter_batch(
+            _compress_images_from_file, [(path, chunk, quality) for chunk in chunks], max_workers=parts,
+        ):
+            if not result.ok:
+                raise RuntimeError(result.error)
+            outputs.extend(result.output)
+
+    for xref, data, width, height, gray in outputs:
+        if len(data) < sizes[xref]:
+            _replace_image(doc, xref, data, width, height, gray)
+    _dedupe_resources(doc)
+
+
+@cached_result("compress_pdf", ignore=("workers",), returns_file=True)
+def compress_pdf(file_bytes, dpi=COMPRESS_DEFAULT_DPI, quality=COMPRESS_DEFAULT_QUALITY, workers=1):
+    """
+    Comprime um PDF e retorna um arquivo temporário posicionado no início.
+
+    Imagens exibidas acima de dpi (vezes COMPRESS_DOWNSAMPLE_THRESHOLD) são
+    reduzidas para dpi e as demais recomprimidas em JPEG (quality), ficando
+    só as versões menores que a original; com workers > 1, em paralelo.
+    Imagens e fontes repetidas passam a ser uma só cópia e o arquivo é
+    regravado sem objetos órfãos, com streams e object streams comprimidos.
+    Se o resultado não ficar menor, devolve o original.
+    """
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        tmp.write(file_bytes)
+        tmp.flush()
+        with fitz.open(tmp.name) as doc:
+            if doc.needs_pass:
+                raise ValueError("PDF protegido por senha.")
+            metrics.count("pages", len(doc))
+            compress_document(doc, dpi, quality, workers, path=tmp.name)
+
+            fd, path = tempfile.mkstemp(suffix=".pdf")
+            os.close(fd)
+            try:
+                doc.save(path, **COMPRESS_SAVE_OPTIONS)
+                if os.path.getsize(path) >= memoryview(file_bytes).nbytes:
+                    # Já estava compacto: devolve o original
+                    with open(path, "wb") as output:
+                        output.write(file_bytes)
+                return open(path, "rb")
+            finally:
+                os.remove(path)
@@ -0,0 +1,319 @@
+"""
+Pipelines: operações encadeadas sobre objetos já decodificados.
+
+A entrada é decodificada uma vez (PIL.Image, fitz.Document ou DataFrame),
+cada etapa recebe e devolve o objeto em memória e a saída é codificada uma
+única vez, no fim. Ex.: remover o fundo -> otimizar -> PDF não passa por
+PNG entre as etapas.
+
+    steps = [("remove-background", {}), ("resize", {"max_size": 1600}), ("to-pdf", {})]
+    pdf_bytes = run_pipeline(file_bytes, "jpg", steps)
+"""
+from dataclasses import dataclass, field
+
+from fileflow.cache import cached_result
+
+# Tipos de objeto que circulam entre as etapas
+IMAGE, PDF, TABLE = "image", "pdf", "table"
+
+INPUT_FORMATS = {
+    IMAGE: ("png", "jpg", "jpeg", "webp"),
+    PDF: ("pdf",),
+    TABLE: ("csv", "json", "ndjson", "jsonl", "xlsx", "parquet"),
+}
+_KIND_OF = {fmt: kind for kind, formats in INPUT_FORMATS.items() for fmt in formats}
+_KIND_LABELS = {IMAGE: "imagens", PDF: "PDFs", TABLE: "tabelas"}
+
+
+@dataclass
+class Item:
+    """Objeto em processamento e as opções da codificação final."""
+    kind: str
+    value: object
+    encoding: dict = field(default_factory=dict)
+
+
+# --- Etapas ---
+
+# Cada etapa recebe o Item e as opções e devolve o Item (o mesmo ou um novo,
+# quando muda o tipo). Os imports ficam dentro das etapas, como em
+# fileflow.operations.
+
+def _remove_background(item, options):
+    from fileflow.image import REMBG_FORMATS, remove_background_image
+    from fileflow.imaging import normalize_format
+
+    item.value = remove_background_image(item.value, fast=options.get("fast", False))
+    # Um JPG de entrada perderia a transparência: a saída passa a ser PNG
+    if normalize_format(item.encoding.get("format") or "PNG") not in REMBG_FORMATS:
+        item.encoding["format"] = "PNG"
+    return item
+
+
+def _resize(item, options):
+    from PIL import Image
+
+    from fileflow.imaging import REDUCING_GAP
+
+    max_size = options.get("max_size")
+    if max_size and max(item.value.size) > max_size:
+        item.value.thumbnail((max_size, max_size), Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+    return item
+
+
+def _optimize(item, options):
+    """Define formato, qualidade e tamanho máximo da codificação final."""
+    from fileflow.imaging import normalize_format
+
+    if options.get("format"):
+        item.encoding["format"] = normalize_format(options["format"])
+    for name in ("quality", "max_bytes", "allow_resize"):
+        if options.get(name) is not None:
+            item.encoding[name] = options[name]
+    return _resize(item, options)
+
+
+def _image_to_pdf(item, options):
+    import fitz  # PyMuPDF
+    from PIL import Image
+
+    from fileflow.convert import IMAGE_PDF_DEFAULT_DPI
+
+    img = item.value
+    dpi = options.get("dpi") or IMAGE_PDF_DEFAULT_DPI
+    if "A" in img.mode or "transparency" in img.info:
+        # O fundo transparente fica branco, como apareceria na página
+        img = img.convert("RGBA")
+        img = Image.alpha_composite(Image.new("RGBA", img.size, "white"), img).convert("RGB")
+    # A única codificação da imagem, com a qualidade/tamanho da etapa optimize
+    data = _encode_image(img, dict(item.encoding, format="JPEG"))
+    doc = fitz.open()
+    page = doc.new_page(width=img.width * 72 / dpi, height=img.height * 72 / dpi)
+    page.insert_image(page.rect, stream=data)
+    return Item(PDF, doc)
+
+
+def _rotate_pages(item, options):
+    from fileflow.pdf import parse_page_ranges
+
+    doc = item.value
+    rotation = options.get("rotation", 90)
+    if rotation % 90:
+        raise ValueError("A rotação deve ser múltipla de 90 graus.")
+    pages = range(len(doc))
+    if options.get("pages"):
+        pages = [
+            i for first, last in parse_page_ranges(options["pages"], len(doc)) for i in range(first - 1, last)
+        ]
+    for i in sorted(set(pages)):
+        page = doc[i]
+        page.set_rotation((page.rotation + rotation) % 360)
+    return item
+
+
+def _delete_pages(item, options):
+    from fileflow.pdf import parse_page_ranges
+
+    doc = item.value
+    pages = {i for first, last in parse_page_ranges(options["pages"], len(doc)) for i in range(first - 1, last)}
+    if len(pages) >= len(doc):
+        raise ValueError("Não é possível excluir todas as páginas.")
+    doc.delete_pages(sorted(pages))
+    return item
+
+
+def _compress_pdf(item, options):
+    from fileflow.pdf import COMPRESS_DEFAULT_DPI, COMPRESS_DEFAULT_QUALITY, compress_document
+
+    compress_document(
+        item.value,
+        dpi=options.get("dpi") or COMPRESS_DEFAULT_DPI,
+        quality=options.get("quality") or COMPRESS_DEFAULT_QUALITY,
+    )
+    item.encoding["compact"] = True
+    return item
+
+
+def _select_columns(item, options):
+    df = item.value
+    columns = [c.strip() for c in options["columns"].split(",") if c.strip()]
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise ValueError(f"Colunas inexistentes: {', '.join(missing)}.")
+    item.value = df[columns]
+    return item
+
+
+def _drop_duplicates(item, options):
+    item.value = item.value.drop_duplicates(ignore_index=True)
+    return item
+
+
+def _sort_rows(item, options):
+    df = item.value
+    column = options["column"]
+    if column not in df.columns:
+        raise ValueError(f"Coluna inexistente: {column}.")
+    item.value = df.sort_values(column, ascending=not options.get("descending", False), ignore_index=True)
+    return item
+
+
+def _table_format(item, options):
+    from fileflow.data import TABLE_WRITE_FORMATS
+
+    file_format = options["format"].lower()
+    if file_format not in TABLE_WRITE_FORMATS:
+        raise ValueError(f"Formato de tabela não suportado: {file_format}")
+    item.encoding["format"] = file_format
+    return item
+
+
+def _table_to_pdf(item, options):
+    from fileflow.table_pdf import render_tables_document
+
+    doc = render_tables_document([(None, item.value)])
+    if len(doc) == 0:
+        raise ValueError("A tabela não tem colunas para gerar o PDF.")
+    return Item(PDF, doc)
+
+
+@dataclass
+class Step:
+    """Etapa de pipeline: tipo de objeto recebido e devolvido."""
+    func: object
+    input: str
+    output: str
+    help: str
+
+
+STEPS = {
+    "remove-background": Step(_remove_background, IMAGE, IMAGE, "Remover fundo (IA)"),
+    "resize": Step(_resize, IMAGE, IMAGE, "Redimensionar"),
+    "optimize": Step(_optimize, IMAGE, IMAGE, "Otimizar / converter formato"),
+    "to-pdf": Step(_image_to_pdf, IMAGE, PDF, "Imagem para PDF"),
+    "rotate-pages": Step(_rotate_pages, PDF, PDF, "Girar páginas"),
+    "delete-pages": Step(_delete_pages, PDF, PDF, "Excluir páginas"),
+    "compress-pdf": Step(_compress_pdf, PDF, PDF, "Comprimir PDF"),
+    "select-columns": Step(_select_columns, TABLE, TABLE, "Selecionar colunas"),
+    "drop-duplicates": Step(_drop_duplicates, TABLE, TABLE, "Remover linhas duplicadas"),
+    "sort-rows": Step(_sort_rows, TABLE, TABLE, "Ordenar linhas"),
+    "table-format": Step(_table_format, TABLE, TABLE, "Formato de saída (CSV, JSON, NDJSON, Parquet)"),
+    "table-to-pdf": Step(_table_to_pdf, TABLE, PDF, "Tabela para PDF"),
+}
+
+
+# --- Decodificação e codificação ---
+
+def input_kind(input_format):
+    """Tipo de objeto (IMAGE, PDF ou TABLE) de uma extensão de entrada."""
+    kind = _KIND_OF.get(input_format.lower().lstrip("."))
+    if kind is None:
+        raise ValueError(f"Formato de entrada não suportado: {input_format}")
+    return kind
+
+
+def _default_table_format(input_format):
+    return input_format if input_format in ("csv", "json", "ndjson", "parquet") else (
+        "ndjson" if input_format == "jsonl" else "csv"
+    )
+
+
+def plan_pipeline(input_format, steps):
+    """
+    Confere se cada etapa aceita o tipo de objeto da anterior e retorna a
+    extensão do arquivo de saída, sem executar nada. Depois da remoção de
+    fundo, a imagem só pode ser salva em formatos com transparência.
+    """
+    from fileflow.image import REMBG_FORMATS
+    from fileflow.imaging import FORMAT_EXTENSIONS, normalize_format
+
+    input_format = input_format.lower().lstrip(".")
+    kind = input_kind(input_format)
+    output_format = input_format
+    if kind == TABLE:
+        output_format = _default_table_format(input_format)
+    transparent = False
+    for name, options in steps:
+        step = STEPS.get(name)
+        if step is None:
+            raise ValueError(f"Etapa desconhecida: {name}")
+        if step.input != kind:
+            raise ValueError(f"A etapa '{step.help}' não se aplica a {_KIND_LABELS[kind]}.")
+        if step.output != kind:
+            kind, output_format = step.output, step.output
+            transparent = False
+        elif options.get("format"):
+            output_format = options["format"].lower()
+            if transparent and normalize_format(output_format) not in REMBG_FORMATS:
+                raise ValueError("A remoção de fundo gera transparência: use PNG, WebP ou AVIF depois dela.")
+        if name == "remove-background":
+            transparent = True
+            if normalize_format(output_format) not in REMBG_FORMATS:
+                output_format = "png"
+    if kind == IMAGE:
+        return FORMAT_EXTENSIONS[normalize_format(output_format)]
+    return output_format
+
+
+def _decode(file_bytes, input_format):
+    kind = input_kind(input_format)
+    if kind == IMAGE:
+        from fileflow.imaging import open_image
+
+        img = open_image(file_bytes)
+        img.load()
+        return Item(IMAGE, img, {"format": img.format})
+    if kind == PDF:
+        import fitz  # PyMuPDF
+
+        doc = fitz.open(stream=file_bytes, filetype="pdf")
+        if doc.needs_pass:
+            doc.close()
+            raise ValueError("PDF protegido por senha.")
+        return Item(PDF, doc)
+    from fileflow.data import read_table
+
+    return Item(TABLE, read_table(file_bytes, input_format), {"format": _default_table_format(input_format)})
+
+
+def _encode_image(img, encoding):
+    from fileflow.imaging import encode_image, encode_to_size
+
+    if encoding.get("max_bytes"):
+        return encode_to_size(
+            img, encoding["format"], encoding["max_bytes"],
+            max_quality=encoding.get("quality"), allow_resize=encoding.get("allow_resize", True),
+        )
+    return encode_image(img, encoding["format"], quality=encoding.get("quality"))
+
+
+def _encode(item):
+    if item.kind == IMAGE:
+        return _encode_image(item.value, item.encoding)
+    if item.kind == PDF:
+        if item.encoding.get("compact"):
+            from fileflow.pdf import COMPRESS_SAVE_OPTIONS
+
+            return item.value.tobytes(**COMPRESS_SAVE_OPTIONS)
+        return item.value.tobytes(garbage=1, deflate=True)
+    from fileflow.data import write_table
+
+    return write_table(item.value, item.encoding["format"])
+
+
+@cached_result("run_pipeline")
+def run_pipeline(file_bytes, input_format, steps):
+    """
+    Executa as etapas (lista de pares (nome, opções), veja STEPS) sobre o
+    arquivo (bytes ou buffer) de extensão input_format e retorna os bytes
+    da saída, codificada uma única vez; a extensão sai de plan_pipeline.
+    """
+    plan_pipeline(input_format, steps)
+    item = _decode(file_bytes, input_format.lower().lstrip("."))
+    try:
+        for name, options in steps:
+            item = STEPS[name].func(item, options)
+        return _encode(item)
+    finally:
+        if item.kind == PDF:
+            item.value.close()
@@ -0,0 +1,73 @@
+"""
+Previews leves para a interface: imagens reduzidas à largura em que são
+exibidas, com cache por hash do conteúdo. O arquivo em tamanho original só
+é enviado ao navegador sob demanda.
+"""
+import base64
+
+from PIL import Image, features
+
+from fileflow.cache import LRUCache, content_hash
+from fileflow.imaging import encode_image, open_image
+
+# Largura do conteúdo no layout "centered" do app (px CSS) e densidade de
+# pixels assumida (telas HiDPI): um preview na coluna inteira tem
+# 704 * 2 px de largura; numa de três colunas, um terço disso.
+PREVIEW_CONTENT_WIDTH = 704
+PREVIEW_PIXEL_RATIO = 2
+PREVIEW_QUALITY = 75
+PREVIEW_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+_preview_cache = LRUCache(PREVIEW_CACHE_MAX_BYTES)
+
+
+def preview_width(columns=1):
+    """Largura em pixels de um preview que ocupa uma de columns colunas."""
+    return PREVIEW_CONTENT_WIDTH * PREVIEW_PIXEL_RATIO // columns
+
+
+def encode_preview(img):
+    """
+    Codifica o preview: JPEG, que o st.image repassa sem recodificar, ou
+    WebP se houver transparência (um PNG com alfa seria bem maior).
+    """
+    if "A" in img.mode or "transparency" in img.info:
+        if features.check("webp"):
+            return encode_image(img.convert("RGBA"), "WEBP", quality=PREVIEW_QUALITY, effort=2)
+        # Sem WebP no Pillow: o fundo transparente fica branco
+        img = img.convert("RGBA")
+        img = Image.alpha_composite(Image.new("RGBA", img.size, "white"), img)
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    return encode_image(img, "JPEG", quality=PREVIEW_QUALITY, effort=0)
+
+
+def image_preview(file_bytes, width=None, content_key=None):
+    """
+    Preview da imagem (bytes ou buffer) com o maior lado em width pixels
+    (padrão: a coluna inteira), decodificada já reduzida. O cache é indexado
+    por hash do conteúdo + largura.
+    """
+    width = width or preview_width()
+    key = (content_key or content_hash(file_bytes), width)
+    data = _preview_cache.get(key)
+    if data is None:
+        data = encode_preview(open_image(file_bytes, max_size=width))
+        _preview_cache.put(key, data)
+    return data
+
+
+def preview_source(data):
+    """
+    Fonte para o st.image: JPEG e PNG vão como bytes; WebP e AVIF viram
+    data URL, já que o Streamlit recodificaria em PNG/JPEG qualquer formato
+    além de JPEG/PNG/GIF.
+    """
+    header = bytes(data[:12])
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        mime = "image/webp"
+    elif header[4:12] == b"ftypavif":
+        mime = "image/avif"
+    else:
+        return bytes(data)
+    return f"data:{mime};base64," + base64.b64encode(data).decode("ascii")
@@ -0,0 +1,186 @@
+import fitz  # PyMuPDF
+
+# --- Renderização de Tabelas em PDF ---
+
+# O conteúdo de cada página é montado diretamente como operadores PDF, uma
+# coluna por vez a partir de strings já formatadas: chamar a API de desenho
+# célula a célula custa segundos por milhar de linhas.
+
+FONT_SIZE = 8
+ROW_HEIGHT = FONT_SIZE * 1.5
+CELL_PADDING = 2
+PAGE_MARGIN = 28
+MAX_COL_WIDTH = 220
+MIN_COL_WIDTH = 24
+TITLE_HEIGHT = 18
+
+A4 = fitz.paper_rect("a4")
+A4_LANDSCAPE = fitz.paper_rect("a4-l")
+
+# Fontes Base14 (WinAnsi); caracteres fora do cp1252 viram "?"
+FONT_REGULAR = "helv"
+FONT_BOLD = "hebo"
+PDF_ENCODING = "cp1252"
+
+
+def _format_column(series):
+    """Formata uma coluna inteira como texto de uma só vez (vazios viram "")."""
+    text = series.astype(str).where(series.notna(), "")
+    return text.str.replace(r"[\r\n\t]+", " ", regex=True)
+
+
+def _format_column_name(col):
+    return str(col).replace("\n", " ")
+
+
+def _escape(text):
+    """Escapa uma coluna de texto para strings literais do PDF."""
+    return (
+        text.str.replace("\\", "\\\\", regex=False)
+        .str.replace("(", "\\(", regex=False)
+        .str.replace(")", "\\)", regex=False)
+    )
+
+
+def _escape_str(value):
+    return value.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _text_width(value, fontname=FONT_REGULAR):
+    return fitz.get_text_length(value, fontname=fontname, fontsize=FONT_SIZE)
+
+
+def _longest(text):
+    return text.iloc[int(text.str.len().values.argmax())] if not text.empty else ""
+
+
+def _truncate_column(text, width):
+    """Corta os valores que não cabem na largura da coluna, em bloco."""
+    longest = _longest(text)
+    text_width = _text_width(longest)
+    available = width - 2 * CELL_PADDING
+    if text_width <= available:
+        return text
+
+    # Largura média por caractere estimada pelo maior valor da coluna
+    max_chars = max(1, int(len(longest) * available / text_width) - 3)
+    too_long = text.str.len() > max_chars
+    return text.where(~too_long, text.str.slice(0, max_chars) + "...")
+
+
+def _column_widths(header, columns, page_width):
+    """Mede a largura de cada coluna uma única vez, pelo cabeçalho e maior valor."""
+    widths = []
+    for name, text in zip(header, columns):
+        width = max(_text_width(name, FONT_BOLD), _text_width(_longest(text)))
+        widths.append(min(max(width + 2 * CELL_PADDING, MIN_COL_WIDTH), MAX_COL_WIDTH))
+
+    available = page_width - 2 * PAGE_MARGIN
+    total = sum(widths)
+    if total > available:
+        widths = [w * available / total for w in widths]
+    return widths
+
+
+def _grid_ops(xs, top, num_rows, page_height):
+    bottom = top + num_rows * ROW_HEIGHT
+    ops = ["q 0.5 w 0 G"]
+    for i in range(num_rows + 1):
+        y = page_height - (top + i * ROW_HEIGHT)
+        ops.append(f"{xs[0]:.2f} {y:.2f} m {xs[-1]:.2f} {y:.2f} l")
+    for x in xs:
+        ops.append(f"{x:.2f} {page_height - top:.2f} m {x:.2f} {page_height - bottom:.2f} l")
+    ops.append("S Q")
+    return ops
+
+
+def _text_ops(fontname, size, x, y, lines):
+    """Bloco BT/ET que escreve as linhas uma abaixo da outra a partir de (x, y)."""
+    return (
+        f"BT /{fontname} {size} Tf {ROW_HEIGHT:.2f} TL 1 0 0 1 {x:.2f} {y:.2f} Tm ("
+        + ") Tj T* (".join(lines)
+        + ") Tj ET"
+    )
+
+
+def _new_page(doc, page_rect):
+    page = doc.new_page(width=page_rect.width, height=page_rect.height)
+    page.insert_font(fontname=FONT_REGULAR)
+    page.insert_font(fontname=FONT_BOLD)
+    return page
+
+
+def _set_page_content(doc, page, ops):
+    xref = doc.get_new_xref()
+    doc.update_object(xref, "<<>>")
+    doc.update_stream(xref, "\n".join(ops).encode(PDF_ENCODING, errors="replace"))
+    page.set_contents(xref)
+
+
+def _render_table(doc, title, df):
+    header = [_format_column_name(col) for col in df.columns]
+    page_rect = A4_LANDSCAPE if len(header) > 6 else A4
+    page_height = page_rect.height
+
+    columns = [_format_column(df[col]) for col in df.columns]
+    widths = _column_widths(header, columns, page_rect.width)
+    lines = [_escape(_truncate_column(text, w)).tolist() for text, w in zip(columns, widths)]
+    header = [_escape_str(name) for name in header]
+
+    xs = [PAGE_MARGIN]
+    for w in widths:
+        xs.append(xs[-1] + w)
+    baseline = ROW_HEIGHT - (ROW_HEIGHT - FONT_SIZE) / 2 - 1
+
+    num_rows = len(df)
+    start = 0
+    first_page = True
+    while first_page or start < num_rows:
+        page = _new_page(doc, page_rect)
+        ops = []
+        top = PAGE_MARGIN
+        if title and first_page:
+            title_y = page_height - (top + FONT_SIZE + 2)
+            ops.append(_text_ops(FONT_BOLD, FONT_SIZE + 3, PAGE_MARGIN, title_y, [_escape_str(str(title))]))
+            top += TITLE_HEIGHT
+
+        rows_per_page = max(1, int((page_height - PAGE_MARGIN - top) // ROW_HEIGHT) - 1)
+        end = min(start + rows_per_page, num_rows)
+
+        # Cabeçalho repetido em cada página; o corpo vai uma coluna por vez
+        header_y = page_height - (top + baseline)
+        for x, name in zip(xs, header):
+            ops.append(_text_ops(FONT_BOLD, FONT_SIZE, x + CELL_PADDING, header_y, [name]))
+        if end > start:
+            for x, col_lines in zip(xs, lines):
+                ops.append(_text_ops(FONT_REGULAR, FONT_SIZE, x + CELL_PADDING, header_y - ROW_HEIGHT, col_lines[start:end]))
+        ops += _grid_ops(xs, top, end - start + 1, page_height)
+        _set_page_content(doc, page, ops)
+
+        start = end
+        first_page = False
+
+
+def render_tables_document(tables):
+    """
+    Renderiza tabelas (lista de pares (título, DataFrame)) em um documento
+    PyMuPDF aberto, com paginação e cabeçalho repetido em cada página.
+    Tabelas sem colunas são ignoradas.
+    """
+    doc = fitz.open()
+    for title, df in tables:
+        if len(df.columns) == 0:
+            continue
+        _render_table(doc, title, df)
+    return doc
+
+
+def render_tables_pdf(tables):
+    """
+    Renderiza tabelas em um PDF (veja render_tables_document); retorna b""
+    se nenhuma puder ser renderizada.
+    """
+    doc = render_tables_document(tables)
+    if len(doc) == 0:
+        return b""
+    return doc.tobytes(deflate=True)
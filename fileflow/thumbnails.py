@@ -0,0 +1,95 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from fileflow.cache import LRUCache, content_hash
+from fileflow.previews import encode_preview
+
+# --- Miniaturas de Páginas (sob demanda) ---
+
+THUMB_ZOOM = 0.4
+THUMBS_PER_WINDOW = 12
+THUMB_CACHE_MAX_BYTES = 64 * 1024 * 1024
+OPEN_DOCS_MAX = 4
+
+# O PyMuPDF não é thread-safe: toda renderização passa por este lock,
+# inclusive a do prefetch em segundo plano.
+_fitz_lock = threading.RLock()
+_open_docs = OrderedDict()
+_prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fileflow-thumbs")
+_thumb_cache = LRUCache(THUMB_CACHE_MAX_BYTES)
+
+
+def _reset_after_fork():
+    # No filho de um fork, o lock e os documentos abertos podem ter ficado
+    # no meio de uma renderização de outra thread (o cache se vira sozinho)
+    global _fitz_lock, _open_docs, _prefetch_executor
+    _fitz_lock = threading.RLock()
+    _open_docs = OrderedDict()
+    _prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fileflow-thumbs")
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _open_doc(doc_key, file_bytes):
+    """Mantém os últimos documentos abertos para não reabri-los a cada miniatura."""
+    doc = _open_docs.get(doc_key)
+    if doc is None:
+        doc = fitz.open(stream=file_bytes, filetype="pdf")
+        _open_docs[doc_key] = doc
+        while len(_open_docs) > OPEN_DOCS_MAX:
+            _open_docs.popitem(last=False)[1].close()
+    else:
+        _open_docs.move_to_end(doc_key)
+    return doc
+
+
+def pdf_page_count(file_bytes, doc_key=None):
+    """Número de páginas do PDF, sem renderizar nada."""
+    doc_key = doc_key or content_hash(file_bytes)
+    with _fitz_lock:
+        return len(_open_doc(doc_key, file_bytes))
+
+
+def _render_thumbnail(doc_key, file_bytes, page_index, zoom, width, image_format):
+    key = (doc_key, page_index, zoom, width, image_format)
+    img_data = _thumb_cache.get(key)
+    if img_data is None:
+        with _fitz_lock:
+            page = _open_doc(doc_key, file_bytes).load_page(page_index)
+            if width:
+                zoom = width / page.rect.width
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            if image_format == "PNG":
+                img_data = pix.tobytes("png")
+            else:
+                img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        if image_format != "PNG":
+            img_data = encode_preview(img)
+        _thumb_cache.put(key, img_data)
+    return img_data
+
+
+def render_thumbnails(file_bytes, page_indexes, zoom=THUMB_ZOOM, doc_key=None, width=None, image_format="JPEG"):
+    """
+    Renderiza (ou busca no cache) as miniaturas das páginas pedidas, com o
+    zoom dado ou, com width, na largura de width pixels (ex.:
+    previews.preview_width). image_format: "JPEG" (preview) ou "PNG". O
+    cache é indexado por hash do conteúdo + página + tamanho + formato.
+    """
+    doc_key = doc_key or content_hash(file_bytes)
+    return [_render_thumbnail(doc_key, file_bytes, i, zoom, width, image_format) for i in page_indexes]
+
+
+def prefetch_thumbnails(file_bytes, page_indexes, zoom=THUMB_ZOOM, doc_key=None, width=None):
+    """Agenda a renderização das páginas em segundo plano (ex.: a próxima janela)."""
+    doc_key = doc_key or content_hash(file_bytes)
+    pending = [i for i in page_indexes if (doc_key, i, zoom, width, "JPEG") not in _thumb_cache]
+    if pending:
+        _prefetch_executor.submit(render_thumbnails, file_bytes, pending, zoom, doc_key, width)
@@ -0,0 +1,206 @@
+"""
+Uploads sem cópias, limites de tamanho por sessão e reserva de memória para
+as conversões.
+
+Os conversores recebem o conteúdo como bytes ou como um buffer (memoryview
+do UploadedFile, mmap de um arquivo em disco) e o leem por open_buffer, sem
+copiar o arquivo inteiro a cada etapa.
+"""
+import contextlib
+import io
+import mmap
+import os
+import threading
+import time
+
+# --- Limites ---
+
+# Tamanho máximo por arquivo e soma dos uploads de uma sessão (MB)
+UPLOAD_MAX_MB = int(os.environ.get("FILEFLOW_UPLOAD_MAX_MB", 500))
+SESSION_UPLOAD_MAX_MB = int(os.environ.get("FILEFLOW_SESSION_UPLOAD_MAX_MB", 1024))
+# Memória que deve continuar livre durante uma conversão, quanto de memória
+# de trabalho se estima por byte de entrada e quanto tempo esperar por ela
+MEMORY_RESERVE_MB = int(os.environ.get("FILEFLOW_MEMORY_RESERVE_MB", 256))
+MEMORY_PER_INPUT_BYTE = 2
+MEMORY_WAIT_SECONDS = float(os.environ.get("FILEFLOW_MEMORY_WAIT_SECONDS", 30))
+_MEMORY_POLL_SECONDS = 0.25
+
+_SESSION_KEY = "_fileflow_upload_sizes"
+
+# Memória de trabalho reservada pelas conversões em andamento no processo
+_reserved_bytes = 0
+_reserved_lock = threading.Lock()
+
+
+class UploadLimitError(ValueError):
+    """Upload acima do limite por arquivo ou por sessão."""
+
+
+class MemoryPressureError(RuntimeError):
+    """Memória livre insuficiente para a conversão, mesmo após esperar."""
+
+
+# --- Buffers ---
+
+class _BufferReader(io.RawIOBase):
+    """Arquivo somente leitura sobre um buffer (memoryview), sem copiá-lo."""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, target):
+        data = self._view[self._pos:self._pos + len(target)]
+        target[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError("Posição negativa.")
+        self._pos = offset
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+def upload_buffer(file_obj):
+    """
+    Conteúdo do arquivo sem cópia: bytes e buffers passam direto, o
+    UploadedFile (BytesIO) vira uma memoryview do seu buffer e arquivos em
+    disco são mapeados (mmap). Outros objetos são lidos.
+    """
+    if isinstance(file_obj, (bytes, bytearray, memoryview, mmap.mmap)):
+        return file_obj
+    if hasattr(file_obj, "getbuffer"):
+        return file_obj.getbuffer()
+    try:
+        fileno = file_obj.fileno()
+        if os.fstat(fileno).st_size > 0:
+            return memoryview(mmap.mmap(fileno, 0, access=mmap.ACCESS_READ))
+    except (AttributeError, OSError, io.UnsupportedOperation, ValueError):
+        pass
+    file_obj.seek(0)
+    return file_obj.read()
+
+
+def open_buffer(data):
+    """Abre bytes ou um buffer como arquivo binário, sem copiar o conteúdo."""
+    if isinstance(data, bytes):
+        # BytesIO compartilha o objeto bytes enquanto não é modificado
+        return io.BytesIO(data)
+    return io.BufferedReader(_BufferReader(data))
+
+
+def buffer_size(data):
+    return memoryview(data).nbytes
+
+
+# --- Limites por sessão e memória ---
+
+def _size(file_obj):
+    size = getattr(file_obj, "size", None)
+    return size if size is not None else buffer_size(upload_buffer(file_obj))
+
+
+def check_uploads(files, session_state, key):
+    """
+    Confere os uploads de um campo (key) contra o limite por arquivo e o
+    total da sessão (somando os demais campos guardados em session_state).
+    Retorna o total de bytes do campo; levanta UploadLimitError se passar.
+    """
+    if files is None:
+        files = []
+    elif not isinstance(files, (list, tuple)):
+        files = [files]
+
+    sizes = session_state.setdefault(_SESSION_KEY, {})
+    total = 0
+    for file_obj in files:
+        size = _size(file_obj)
+        if size > UPLOAD_MAX_MB * 1024 * 1024:
+            raise UploadLimitError(
+                f"{getattr(file_obj, 'name', 'Arquivo')} tem {size / 1024 / 1024:.0f} MB; "
+                f"o limite por arquivo é {UPLOAD_MAX_MB} MB."
+            )
+        total += size
+
+    others = sum(size for name, size in sizes.items() if name != key)
+    if others + total > SESSION_UPLOAD_MAX_MB * 1024 * 1024:
+        raise UploadLimitError(
+            f"Os arquivos enviados nesta sessão somam {(others + total) / 1024 / 1024:.0f} MB; "
+            f"o limite é {SESSION_UPLOAD_MAX_MB} MB. Remova alguns arquivos e tente de novo."
+        )
+    sizes[key] = total
+    return total
+
+
+def reset_uploads(session_state):
+    """Zera os totais de upload da sessão (ex.: no início de cada execução)."""
+    session_state.pop(_SESSION_KEY, None)
+
+
+def memory_available():
+    """Memória disponível no sistema em bytes (MemAvailable), ou None sem /proc."""
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+@contextlib.contextmanager
+def reserve_memory(input_bytes, timeout=None):
+    """
+    Reserva, enquanto o bloco executa, a memória de trabalho estimada para
+    converter input_bytes de entrada. A conversão só começa se a memória
+    livre, descontadas as reservas das outras conversões do processo, cobrir
+    a sua mantendo MEMORY_RESERVE_MB livres; senão espera (até timeout
+    segundos) e levanta MemoryPressureError. Sem /proc, não espera.
+    """
+    global _reserved_bytes
+    if timeout is None:
+        timeout = MEMORY_WAIT_SECONDS
+    needed = input_bytes * MEMORY_PER_INPUT_BYTE
+    deadline = time.monotonic() + timeout
+    while True:
+        with _reserved_lock:
+            available = memory_available()
+            if available is None or available - _reserved_bytes >= needed + MEMORY_RESERVE_MB * 1024 * 1024:
+                _reserved_bytes += needed
+                break
+        if time.monotonic() >= deadline:
+            raise MemoryPressureError(
+                "O servidor está sem memória livre para esta conversão no momento. "
+                "Tente novamente em instantes ou envie arquivos menores."
+            )
+        time.sleep(_MEMORY_POLL_SECONDS)
+    try:
+        yield
+    finally:
+        with _reserved_lock:
+            _reserved_bytes -= needed
+
+
+def _reset_after_fork():
+    # O filho de um fork não herda as conversões do pai nem quem segurava o lock
+    global _reserved_bytes, _reserved_lock
+    _reserved_bytes, _reserved_lock = 0, threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,6 @@
+import os
+
+# Os testes não usam o cache de resultados em disco do usuário; os de
+# fileflow.cache montam o seu em tmp_path
+os.environ.setdefault("FILEFLOW_CACHE", "0")
+os.environ.setdefault("FILEFLOW_CACHE_DIR", "")
@@ -0,0 +1,63 @@
+import io
+import zipfile
+
+from fileflow import archive
+from fileflow.archive import StreamingZip
+
+
+class _OldSpooledFile:
+    """Como o SpooledTemporaryFile antes do Python 3.11: sem readable()/seekable()."""
+
+    def __init__(self, *args, **kwargs):
+        self._file = io.BytesIO()
+        self.write, self.read = self._file.write, self._file.read
+        self.seek, self.tell, self.flush = self._file.seek, self._file.tell, self._file.flush
+
+
+class _Pipe:
+    """Stream só de escrita, sem seek nem tell."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def test_streaming_zip_names_and_compression():
+    with StreamingZip() as output:
+        output.add("a.txt", b"texto " * 100)
+        output.add("a.txt", b"outro")
+        output.add("foto.jpg", b"\xff\xd8jpeg")
+
+    with zipfile.ZipFile(output.file) as zf:
+        infos = {info.filename: info for info in zf.infolist()}
+        assert list(infos) == ["a.txt", "a (2).txt", "foto.jpg"]
+        assert infos["a.txt"].compress_type == zipfile.ZIP_DEFLATED
+        assert infos["foto.jpg"].compress_type == zipfile.ZIP_STORED
+        assert zf.read("a (2).txt") == b"outro"
+    assert output.count == 3
+
+
+def test_streaming_zip_rewinds_spooled_file_without_readable(monkeypatch):
+    monkeypatch.setattr(archive.tempfile, "SpooledTemporaryFile", _OldSpooledFile)
+    with StreamingZip() as output:
+        output.add("a.txt", b"abc")
+
+    assert output.file.tell() == 0
+    with zipfile.ZipFile(io.BytesIO(output.file.read())) as zf:
+        assert zf.read("a.txt") == b"abc"
+
+
+def test_streaming_zip_writes_to_unseekable_stream():
+    pipe = _Pipe()
+    with StreamingZip(file=pipe) as output:
+        output.add("a.txt", b"abc")
+
+    assert output.file is pipe
+    with zipfile.ZipFile(io.BytesIO(b"".join(pipe.chunks))) as zf:
+        assert zf.read("a.txt") == b"abc"
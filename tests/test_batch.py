@@ -0,0 +1,25 @@
+import multiprocessing
+
+import pytest
+
+from fileflow import batch
+from fileflow.batch import iter_batch
+from fileflow.pdf import parse_page_ranges
+
+
+def test_process_pool_defaults_to_forkserver(monkeypatch):
+    monkeypatch.setattr(batch, "START_METHOD", None)
+    expected = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    assert batch._mp_context().get_start_method() == expected
+
+    monkeypatch.setattr(batch, "START_METHOD", "spawn")
+    assert batch._mp_context().get_start_method() == "spawn"
+
+
+@pytest.mark.parametrize("use_threads", [False, True])
+def test_iter_batch_keeps_order_and_isolates_failures(use_threads):
+    args_list = [("1-2", 5), ("9", 5), ("3", 5)]
+    results = list(iter_batch(parse_page_ranges, args_list, max_workers=2, use_threads=use_threads))
+    assert [r.index for r in results] == [0, 1, 2]
+    assert results[0].output == [(1, 2)] and results[2].output == [(3, 3)]
+    assert not results[1].ok and "fora do documento" in results[1].error
@@ -0,0 +1,239 @@
+import io
+import mmap
+import os
+import stat
+import tempfile
+
+import pytest
+
+from fileflow import cache
+from fileflow.cache import DiskCache, LRUCache, ResultCache, cache_key, cached_result, private_dir
+
+
+@pytest.fixture
+def result_cache(tmp_path, monkeypatch):
+    """Cache ativo, com o nível em disco em tmp_path."""
+    result_cache = ResultCache(memory_max_bytes=1024, disk_dir=str(tmp_path / "cache"), disk_max_bytes=4096)
+    monkeypatch.setattr(cache, "CACHE_ENABLED", True)
+    monkeypatch.setattr(cache, "result_cache", result_cache)
+    return result_cache
+
+
+def test_cache_key_is_stable():
+    key = cache_key("op", {"file_bytes": b"abc", "quality": 80, "pages": [1, 2]})
+    assert key == cache_key("op", {"pages": [1, 2], "quality": 80, "file_bytes": b"abc"})
+    # Buffers com o mesmo conteúdo geram a mesma chave
+    assert key == cache_key("op", {"file_bytes": memoryview(b"abc"), "quality": 80, "pages": [1, 2]})
+    assert key == cache_key("op", {"file_bytes": bytearray(b"abc"), "quality": 80, "pages": [1, 2]})
+
+    assert key != cache_key("outra", {"file_bytes": b"abc", "quality": 80, "pages": [1, 2]})
+    assert key != cache_key("op", {"file_bytes": b"abd", "quality": 80, "pages": [1, 2]})
+    assert key != cache_key("op", {"file_bytes": b"abc", "quality": 81, "pages": [1, 2]})
+    assert key != cache_key("op", {"file_bytes": b"abc", "quality": 80, "pages": (1, 2)})
+    assert cache_key("op", {"a": "1"}) != cache_key("op", {"a": 1})
+
+
+def test_lru_cache_evicts_least_recently_used_by_bytes():
+    lru = LRUCache(max_bytes=10)
+    lru.put("a", b"1234")
+    lru.put("b", b"1234")
+    assert lru.get("a") == b"1234"  # "a" passa a ser o mais recente
+    lru.put("c", b"1234")
+    assert "b" not in lru
+    assert "a" in lru and "c" in lru
+    assert lru.size == 8
+
+    # Valores maiores que o limite não entram nem removem os outros
+    lru.put("grande", b"x" * 11)
+    assert "grande" not in lru
+    assert len(lru) == 2
+
+    lru.put("a", b"12")
+    assert lru.size == 6
+
+
+def test_disk_cache_evicts_by_bytes_and_rebuilds_index(tmp_path):
+    directory = str(tmp_path / "disk")
+    disk = DiskCache(directory, max_bytes=10)
+    disk.put("a", b"1234")
+    disk.put("b", b"1234")
+    assert disk.get("a") == b"1234"
+    disk.put("c", b"1234")
+
+    assert disk.get("b") is None
+    assert not os.path.exists(os.path.join(directory, "b"))
+    assert disk.size == 8
+    assert sorted(os.listdir(directory)) == ["a", "c"]
+
+    # Uma nova instância reconstrói o índice a partir dos arquivos
+    reopened = DiskCache(directory, max_bytes=10)
+    assert reopened.get("c") == b"1234"
+    assert reopened.size == 8
+
+
+def test_disk_cache_drops_entries_removed_from_disk(tmp_path):
+    disk = DiskCache(str(tmp_path), max_bytes=100)
+    disk.put("a", b"123")
+    os.remove(tmp_path / "a")
+    assert disk.get("a") is None
+    assert disk.size == 0
+
+
+def test_put_file_and_get_file_round_trip(tmp_path):
+    result_cache = ResultCache(memory_max_bytes=1024, disk_dir=str(tmp_path), disk_max_bytes=1 << 20)
+    payload = os.urandom(200_000)
+    with tempfile.TemporaryFile() as f:
+        f.write(payload)
+        f.seek(0)
+        result_cache.put_file("k", f)
+        # O arquivo de origem volta à posição em que estava
+        assert f.tell() == 0
+        assert f.read() == payload
+
+    with result_cache.get_file("k") as cached:
+        assert cached.read() == payload
+    assert result_cache.get_file("outra") is None
+    assert result_cache.stats()["hits_disk"] == 1
+    assert result_cache.stats()["misses"] == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_cached_result_hits_memory_then_disk(result_cache):
+    calls = []
+
+    @cached_result("dobrar", ignore=("workers",))
+    def dobrar(file_bytes, workers=1):
+        calls.append(workers)
+        return bytes(file_bytes) * 2
+
+    assert dobrar(b"ab") == b"abab"
+    assert dobrar(b"ab", workers=4) == b"abab"
+    assert calls == [1]
+    assert result_cache.stats()["hits_memory"] == 1
+
+    result_cache.memory.clear()
+    assert dobrar(memoryview(b"ab")) == b"abab"
+    assert calls == [1]
+    assert result_cache.stats()["hits_disk"] == 1
+
+
+def test_cached_result_returns_file(result_cache):
+    calls = []
+
+    @cached_result("copiar", returns_file=True)
+    def copiar(file_bytes):
+        calls.append(1)
+        f = tempfile.TemporaryFile()
+        f.write(file_bytes)
+        f.seek(0)
+        return f
+
+    with copiar(b"conteudo") as first:
+        assert first.read() == b"conteudo"
+    with copiar(b"conteudo") as second:
+        assert second.read() == b"conteudo"
+    assert len(calls) == 1
+
+
+def test_cached_result_bypasses_streams(result_cache):
+    calls = []
+
+    @cached_result("juntar")
+    def juntar(files_list):
+        calls.append(1)
+        return b"".join(item if isinstance(item, bytes) else item.read() for item in files_list)
+
+    # Iteradores e arquivos abertos (mesmo dentro de listas) não têm
+    # conteúdo estável para a chave: a função roda sempre, sem cache
+    assert juntar(iter([b"a", b"b"])) == b"ab"
+    assert juntar(iter([b"a", b"b"])) == b"ab"
+    assert juntar([b"a", io.BytesIO(b"b")]) == b"ab"
+    assert juntar([b"a", io.BytesIO(b"b")]) == b"ab"
+    assert len(calls) == 4
+    assert len(result_cache.memory) == 0
+    assert result_cache.stats()["misses"] == 0
+
+    assert juntar([b"a", b"b"]) == b"ab"
+    assert juntar([b"a", b"b"]) == b"ab"
+    assert len(calls) == 5
+    assert len(result_cache.memory) == 1
+
+
+def test_cache_key_hashes_mmap_by_content():
+    first = mmap.mmap(-1, 4)
+    second = mmap.mmap(-1, 4)
+    first.write(b"abcd")
+    second.write(b"wxyz")
+    try:
+        assert cache_key("op", {"file_bytes": first}) == cache_key("op", {"file_bytes": b"abcd"})
+        assert cache_key("op", {"file_bytes": first}) != cache_key("op", {"file_bytes": second})
+    finally:
+        first.close()
+        second.close()
+
+    assert cache_key("op", {"steps": [("resize", {"max_size": 10})]}) != cache_key(
+        "op", {"steps": [("resize", {"max_size": 20})]})
+
+
+def test_cached_result_bypasses_unknown_objects(result_cache):
+    calls = []
+
+    @cached_result("tamanho")
+    def tamanho(value):
+        calls.append(1)
+        return str(value.size).encode()
+
+    class Imagem:
+        def __init__(self, size):
+            self.size = size
+
+    # Sem conteúdo conhecido não há chave confiável: nada de repr()
+    assert tamanho(Imagem(1)) == b"1"
+    assert tamanho(Imagem(2)) == b"2"
+    assert len(calls) == 2
+    assert len(result_cache.memory) == 0
+
+
+unix_only = pytest.mark.skipif(not hasattr(os, "getuid"), reason="permissões Unix")
+
+
+@unix_only
+def test_disk_cache_directory_is_private(tmp_path):
+    directory = tmp_path / "novo"
+    disk = DiskCache(str(directory), max_bytes=100)
+    disk.put("a", b"123")
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+
+    # Um diretório do próprio usuário só legível por outros é fechado
+    readable = tmp_path / "legivel"
+    readable.mkdir(mode=0o755)
+    os.chmod(readable, 0o755)
+    private_dir(str(readable))
+    assert stat.S_IMODE(os.stat(readable).st_mode) == 0o700
+
+
+@unix_only
+@pytest.mark.parametrize("setup", ["world_writable", "symlink", "other_owner"])
+def test_unsafe_cache_directory_is_refused(tmp_path, setup):
+    directory = tmp_path / "cache"
+    if setup == "world_writable":
+        directory.mkdir()
+        os.chmod(directory, 0o777)
+    elif setup == "symlink":
+        (tmp_path / "alvo").mkdir(mode=0o700)
+        directory.symlink_to(tmp_path / "alvo")
+    else:
+        if os.getuid() != 0:
+            pytest.skip("chown para outro usuário requer root")
+        directory.mkdir(mode=0o700)
+        os.chown(directory, 12345, -1)
+    with pytest.raises(PermissionError):
+        private_dir(str(directory))
+
+    # O cache segue só na memória, sem ler nem gravar no diretório
+    result_cache = ResultCache(memory_max_bytes=1024, disk_dir=str(directory), disk_max_bytes=4096)
+    result_cache.put("k", b"valor")
+    result_cache.memory.clear()
+    assert result_cache.get("k") is None
+    assert result_cache.get_file("k") is None
+    assert not os.path.exists(directory / "k")
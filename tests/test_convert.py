@@ -0,0 +1,56 @@
+import io
+
+import fitz  # PyMuPDF
+import pytest
+from PIL import Image
+
+from fileflow.convert import convert_images_to_pdf
+
+
+def _image(size, image_format="JPEG", mode="RGB", dpi=72, orientation=None):
+    img = Image.new(mode, size, "red")
+    exif = img.getexif()
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    img.save(buffer, image_format, dpi=(dpi, dpi), exif=exif)
+    return buffer.getvalue()
+
+
+def _pages(pdf_file):
+    """(tamanho da página em pontos, tamanho e bytes da imagem) de cada página."""
+    with pdf_file, fitz.open(stream=pdf_file.read(), filetype="pdf") as doc:
+        pages = []
+        for page in doc:
+            xref = page.get_images()[0][0]
+            image = doc.extract_image(xref)
+            pages.append((tuple(round(v) for v in page.rect[2:]), (image["width"], image["height"]), image["image"]))
+        return pages
+
+
+def test_images_to_pdf_one_page_per_image_in_order():
+    jpg = _image((120, 80))
+    png = _image((40, 60), "PNG", mode="RGBA")
+    pages = _pages(convert_images_to_pdf(iter([jpg, io.BytesIO(png), _image((200, 100), dpi=144)])))
+
+    assert [page[:2] for page in pages] == [((120, 80), (120, 80)), ((40, 60), (40, 60)), ((100, 50), (200, 100))]
+    # JPEG sem ajuste é embutido como veio, sem recodificar
+    assert pages[0][2] == jpg
+
+
+def test_images_to_pdf_applies_exif_rotation():
+    pages = _pages(convert_images_to_pdf([_image((120, 80), orientation=6)]))
+    assert pages[0][:2] == ((80, 120), (80, 120))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_images_to_pdf_reduces_with_max_size(workers):
+    images = [_image((400, 200)), _image((100, 300), "PNG"), _image((50, 50))]
+    pages = _pages(convert_images_to_pdf(images, max_size=100, quality=80, workers=workers))
+    # A página mantém o tamanho físico; só a imagem embutida é reduzida
+    assert [page[:2] for page in pages] == [((400, 200), (100, 50)), ((100, 300), (33, 100)), ((50, 50), (50, 50))]
+
+
+def test_images_to_pdf_requires_images():
+    with pytest.raises(ValueError):
+        convert_images_to_pdf([])
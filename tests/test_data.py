@@ -0,0 +1,143 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from fileflow import data
+
+requires_arrow = pytest.mark.skipif(not data.arrow_available(), reason="requer o pyarrow")
+
+CSV = (
+    "id,nome,preco,ativo,data,obs\n"
+    "1,Café,10.5,True,2024-01-31,\n"
+    "2,Pão de queijo,3,False,2024-02-01,NA\n"
+    "3,\"Água, com gás\",,True,2024-02-02,ok\n"
+).encode("utf-8")
+
+
+def _records(output):
+    if not isinstance(output, (bytes, bytearray)):
+        with output:
+            output = output.read()
+    return json.loads(output)
+
+
+@requires_arrow
+def test_csv_arrow_and_pandas_give_the_same_json():
+    arrow = _records(data.convert_csv_to_json(CSV, engine="arrow"))
+    pandas = _records(data.convert_csv_to_json(CSV, engine="pandas"))
+    assert arrow == pandas
+    # O leitor do pyarrow leu o arquivo sozinho, sem cair no pandas
+    direct = data._arrow_read_csv(io.BytesIO(CSV), "utf-8")
+    assert json.loads(direct.to_json(orient="records")) == pandas
+    # Datas continuam como o texto do arquivo e nulos viram null
+    assert arrow[0]["data"] == "2024-01-31"
+    assert arrow[1]["obs"] is None
+    assert arrow[2]["preco"] is None
+
+
+@pytest.mark.parametrize("engine", [pytest.param("arrow", marks=requires_arrow), "pandas"])
+def test_csv_na_values_match_pandas_defaults(engine):
+    csv_bytes = ("id,valor\n" + "".join(f"{i},{value}\n" for i, value in enumerate(data.CSV_NA_VALUES[1:]))).encode()
+    # A lista continua valendo para o pandas instalado
+    parsed = pd.read_csv(io.BytesIO(csv_bytes), dtype=str, keep_default_na=True)
+    assert parsed["valor"].isna().all()
+    records = _records(data.convert_csv_to_json(csv_bytes + b"99,texto\n", engine=engine))
+    assert [r["valor"] for r in records] == [None] * (len(data.CSV_NA_VALUES) - 1) + ["texto"]
+
+
+@pytest.mark.parametrize("engine", [pytest.param("arrow", marks=requires_arrow), "pandas"])
+def test_csv_invalid_utf8_after_the_sample_falls_back_to_latin1(engine):
+    filler = b"".join(b"%d,texto\n" % i for i in range(data.ENCODING_SAMPLE_SIZE // 8))
+    assert len(filler) > data.ENCODING_SAMPLE_SIZE
+    csv_bytes = b"n,s\n" + filler + "999,ação\n".encode("latin-1")
+    assert data.detect_encoding(csv_bytes[:data.ENCODING_SAMPLE_SIZE]) == "utf-8"
+
+    if engine == "arrow":
+        with pytest.raises(UnicodeDecodeError):
+            data._arrow_read_csv(io.BytesIO(csv_bytes), "utf-8")
+    df = data.read_table(csv_bytes, "csv", engine=engine)
+    assert df["s"].iloc[-1] == "ação"
+    assert df["s"].iloc[0] == "texto"
+
+
+@pytest.mark.parametrize("engine", [pytest.param("arrow", marks=requires_arrow), "pandas"])
+def test_csv_streaming_invalid_utf8_after_the_sample(engine):
+    filler = b"".join(b"%d,texto\n" % i for i in range(data.ENCODING_SAMPLE_SIZE // 8))
+    csv_bytes = b"n,s\n" + filler + "999,ação\n".encode("latin-1")
+    records = _records(data.convert_csv_to_json_streaming(csv_bytes, chunksize=10_000, engine=engine))
+    assert records[-1] == {"n": 999, "s": "ação"}
+
+
+def test_detect_encoding():
+    assert data.detect_encoding(b"\xef\xbb\xbfa,b") == "utf-8-sig"
+    assert data.detect_encoding("ação".encode("utf-8")) == "utf-8"
+    # Amostra cortada no meio de um caractere continua UTF-8
+    assert data.detect_encoding("ação".encode("utf-8")[:2]) == "utf-8"
+    assert data.detect_encoding("ação".encode("latin-1")) == "latin-1"
+
+
+@pytest.mark.parametrize("engine", [pytest.param("arrow", marks=requires_arrow), "pandas"])
+@pytest.mark.parametrize("ndjson", [False, True])
+def test_csv_streaming_matches_in_memory(engine, ndjson):
+    rows = "".join(f"{i},item {i},{i * 1.5}\n" for i in range(250))
+    csv_bytes = ("id,nome,valor\n" + rows).encode("utf-8")
+    expected = _records(data.convert_csv_to_json(csv_bytes, engine=engine))
+
+    with data.convert_csv_to_json_streaming(csv_bytes, ndjson=ndjson, chunksize=64, engine=engine) as output:
+        text = output.read().decode("utf-8")
+    streamed = [json.loads(line) for line in text.splitlines()] if ndjson else json.loads(text)
+    assert streamed == expected
+
+
+def test_json_to_csv_streaming_matches_in_memory():
+    # Colunas que só aparecem em registros posteriores também entram no cabeçalho
+    records = [{"id": i, "dados": {"x": i}} for i in range(100)] + [{"id": 100, "extra": "fim"}]
+    json_bytes = json.dumps(records).encode("utf-8")
+    ndjson_bytes = "\n".join(json.dumps(r) for r in records).encode("utf-8")
+
+    expected = data.convert_json_to_csv(json_bytes)
+    for source in (json_bytes, ndjson_bytes):
+        with data.convert_json_to_csv_streaming(source, chunksize=7) as output:
+            streamed = output.read()
+        assert pd.read_csv(io.BytesIO(streamed)).equals(pd.read_csv(io.BytesIO(expected)))
+    assert b"dados.x" in expected.splitlines()[0] and b"extra" in expected.splitlines()[0]
+
+
+def test_json_records_reader_handles_small_reads():
+    records = [{"texto": "ação " * 5, "n": i} for i in range(20)]
+    source = io.BytesIO(json.dumps(records, ensure_ascii=False).encode("utf-8"))
+    assert list(data._iter_json_records(source, read_size=3)) == records
+
+
+@pytest.mark.parametrize("source, expected", [
+    (b"[1234, 5678]", [1234, 5678]),
+    (b"1234\n5678\n-1.5e10\ntrue\nnull", [1234, 5678, -1.5e10, True, None]),
+    (b"[123456789]", [123456789]),
+    (b"12", [12]),
+])
+@pytest.mark.parametrize("read_size", [1, 2, 3, 5])
+def test_json_records_reader_keeps_numbers_split_across_reads(source, expected, read_size):
+    assert list(data._iter_json_records(io.BytesIO(source), read_size=read_size)) == expected
+
+
+def test_excel_streaming_matches_in_memory():
+    pytest.importorskip("openpyxl")
+    df = pd.DataFrame({"id": range(30), "nome": [f"linha {i}" for i in range(30)]})
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    xlsx_bytes = buffer.getvalue()
+
+    expected = _records(data.convert_excel_to_json(xlsx_bytes))
+    streamed = _records(data.convert_excel_to_json_streaming(xlsx_bytes, chunksize=8))
+    assert streamed == expected
+
+
+@requires_arrow
+def test_parquet_round_trip():
+    csv_bytes = b"id,nome\n1,a\n2,b\n"
+    parquet_bytes = data.convert_csv_to_parquet(csv_bytes)
+    with data.convert_parquet_to_csv(parquet_bytes, chunksize=1) as output:
+        assert output.read() == csv_bytes
+    assert _records(data.convert_parquet_to_json(parquet_bytes)) == [{"id": 1, "nome": "a"}, {"id": 2, "nome": "b"}]
@@ -0,0 +1,105 @@
+import io
+
+import pytest
+from PIL import Image
+
+from fileflow.image import optimize_image
+from fileflow.imaging import (
+    TARGET_MIN_QUALITY, TARGET_QUALITY_TOLERANCE, encode_image, encode_to_size, open_image, open_image_with_size,
+)
+
+
+def _jpg(size=(400, 200), orientation=None, color="red"):
+    img = Image.new("RGB", size, color)
+    exif = img.getexif()
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", exif=exif, quality=95)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("max_size, expected", [(None, (200, 400)), (100, (50, 100)), (1000, (200, 400))])
+def test_open_image_applies_exif_orientation_and_max_size(max_size, expected):
+    # Orientação 6: a foto foi tirada com a câmera em pé (girar 90°)
+    img, source_size = open_image_with_size(_jpg(orientation=6), max_size=max_size)
+    assert img.size == expected
+    assert source_size == (400, 200)
+    assert img.format == "JPEG"
+    assert img.getexif().get(0x0112) is None
+
+
+def test_open_image_accepts_buffers():
+    img = open_image(memoryview(_jpg()), max_size=100)
+    assert img.size == (100, 50)
+    assert img.format == "JPEG"
+
+
+def test_optimize_image_keeps_original_only_when_not_resized():
+    buffer = io.BytesIO()
+    Image.effect_noise((64, 64), 64).convert("RGB").save(buffer, "JPEG", quality=50)
+    original = buffer.getvalue()
+    # Recomprimido com qualidade 100 fica maior: volta o original
+    assert optimize_image(original, quality=100) == original
+    # Reduzido, a saída é a nova mesmo que maior que o original
+    resized = optimize_image(original, max_size=48, quality=100)
+    assert Image.open(io.BytesIO(resized)).size == (48, 48)
+
+
+def _noise(size=(256, 256)):
+    return Image.effect_noise(size, 48).convert("RGB")
+
+
+def _size(data):
+    return Image.open(io.BytesIO(data)).size
+
+
+def _quality_of(img, output):
+    for quality in range(95, TARGET_MIN_QUALITY - 1, -1):
+        if encode_image(img, "JPEG", quality=quality) == output:
+            return quality
+    raise AssertionError("qualidade não encontrada")
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_encode_to_size_uses_highest_quality_that_fits(workers):
+    img = _noise()
+    best = len(encode_image(img, "JPEG", quality=95))
+    worst = len(encode_image(img, "JPEG", quality=TARGET_MIN_QUALITY))
+    max_bytes = (best + worst) // 2
+
+    output = encode_to_size(img, "JPEG", max_bytes, workers=workers)
+    assert len(output) <= max_bytes
+    assert _size(output) == img.size
+    # A busca para perto do limite: alguns pontos acima já não cabem
+    above = len(encode_image(img, "JPEG", quality=_quality_of(img, output) + TARGET_QUALITY_TOLERANCE + 1))
+    assert above > max_bytes
+
+
+def test_encode_to_size_reduces_scale_when_quality_is_not_enough():
+    img = _noise()
+    max_bytes = len(encode_image(img, "JPEG", quality=TARGET_MIN_QUALITY)) // 3
+
+    output = encode_to_size(img, "JPEG", max_bytes)
+    assert len(output) <= max_bytes
+    assert _size(output)[0] < img.width
+
+    # Sem reduzir, volta o menor arquivo gerado, mesmo acima do limite
+    smallest = encode_to_size(img, "JPEG", max_bytes, allow_resize=False)
+    assert _size(smallest) == img.size
+    assert len(smallest) == len(encode_image(img, "JPEG", quality=TARGET_MIN_QUALITY))
+
+
+def test_encode_to_size_png_is_only_resized():
+    img = _noise((128, 128))
+    max_bytes = len(encode_image(img, "PNG")) // 2
+    output = encode_to_size(img, "PNG", max_bytes)
+    assert len(output) <= max_bytes
+    assert output.startswith(b"\x89PNG") and _size(output)[0] < 128
+
+
+def test_optimize_image_respects_max_bytes():
+    buffer = io.BytesIO()
+    _noise().save(buffer, "JPEG", quality=95)
+    output = optimize_image(buffer.getvalue(), max_bytes=buffer.tell() // 2)
+    assert len(output) <= buffer.tell() // 2
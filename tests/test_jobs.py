@@ -0,0 +1,146 @@
+import io
+import os
+import sqlite3
+import subprocess
+import sys
+import zipfile
+
+import pytest
+from PIL import Image
+
+from fileflow.jobs import STATUS_DONE, STATUS_FAILED, STATUS_QUEUED, STATUS_RUNNING, JobQueue, run_job
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs"), ttl_seconds=60)
+
+
+def _png(color="red"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def _set(queue, job_id, **columns):
+    with sqlite3.connect(queue.db_path) as conn:
+        for name, value in columns.items():
+            conn.execute(f"UPDATE jobs SET {name} = ? WHERE id = ?", (value, job_id))
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="permissões Unix")
+def test_jobs_directory_is_private(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs"))
+    queue.submit("image-to-format", [("a.png", _png())], {"format": "jpg"})
+    assert os.stat(queue.directory).st_mode & 0o777 == 0o700
+
+    shared = tmp_path / "compartilhado"
+    shared.mkdir()
+    os.chmod(shared, 0o777)
+    with pytest.raises(PermissionError):
+        JobQueue(str(shared)).submit("image-to-format", [("a.png", _png())], {"format": "jpg"})
+    assert not os.path.exists(shared / "jobs.sqlite3")
+
+
+def test_submit_stores_inputs_and_queues(queue):
+    job_id = queue.submit("image-to-format", [("a.png", _png()), ("b.png", io.BytesIO(_png("blue")))], {"format": "jpg"})
+    job = queue.get(job_id)
+    assert job.status == STATUS_QUEUED and job.pending
+    assert job.total == 2 and job.done == 0
+    assert sorted(os.listdir(os.path.join(queue.job_dir(job_id), "entrada"))) == ["00000_a.png", "00001_b.png"]
+
+
+def test_submit_rejects_unknown_operation_and_empty_inputs(queue):
+    with pytest.raises(ValueError):
+        queue.submit("nao-existe", [("a.png", b"")])
+    with pytest.raises(ValueError):
+        queue.submit("image-to-format", [])
+
+
+def test_claim_takes_oldest_job_once(queue):
+    first = queue.submit("image-to-format", [("a.png", _png())], {"format": "jpg"})
+    second = queue.submit("image-to-format", [("b.png", _png())], {"format": "jpg"})
+
+    job_id, operation, options, inputs = queue.claim()
+    assert (job_id, operation, options) == (first, "image-to-format", {"format": "jpg"})
+    assert inputs[0]["name"] == "a.png"
+    job = queue.get(first)
+    assert job.status == STATUS_RUNNING and job.started is not None
+
+    assert queue.claim()[0] == second
+    assert queue.claim() is None
+
+
+def test_run_job_completes_single_input(queue):
+    job_id = queue.submit("image-to-format", [("foto.png", _png())], {"format": "jpg"})
+    run_job(queue, *queue.claim())
+
+    job = queue.get(job_id)
+    assert job.status == STATUS_DONE and job.ok
+    assert (job.done, job.output_name) == (1, "foto.jpg")
+    assert job.expires > job.finished
+    with queue.open_result(job_id) as result:
+        assert Image.open(result).format == "JPEG"
+    # As entradas são apagadas ao terminar
+    assert not os.path.exists(os.path.join(queue.job_dir(job_id), "entrada"))
+
+
+def test_run_job_batch_records_failures(queue):
+    inputs = [("a.png", _png()), ("quebrada.png", b"nao e imagem"), ("b.png", _png("blue"))]
+    job_id = queue.submit("image-to-format", inputs, {"format": "jpg"})
+    run_job(queue, *queue.claim())
+
+    job = queue.get(job_id)
+    assert job.status == STATUS_DONE
+    assert job.output_name == "fileflow_lote.zip"
+    assert [failure["name"] for failure in job.failures] == ["quebrada.png"]
+    with queue.open_result(job_id) as result:
+        assert sorted(zipfile.ZipFile(result).namelist()) == ["a.jpg", "b.jpg"]
+
+
+def test_run_job_failure(queue):
+    job_id = queue.submit("image-to-format", [("quebrada.png", b"nao e imagem")], {"format": "jpg"})
+    run_job(queue, *queue.claim())
+
+    job = queue.get(job_id)
+    assert job.status == STATUS_FAILED and not job.ok and not job.pending
+    assert job.error
+    assert queue.open_result(job_id) is None
+
+
+def test_requeue_orphans_returns_stale_claims(queue):
+    stale = queue.submit("image-to-format", [("a.png", _png())], {"format": "jpg"})
+    alive = queue.submit("image-to-format", [("b.png", _png())], {"format": "jpg"})
+    queue.claim()
+    queue.claim()
+    _set(queue, stale, worker_pid=_dead_pid(), done=1)
+
+    assert queue.requeue_orphans() == 1
+    job = queue.get(stale)
+    assert (job.status, job.started, job.done) == (STATUS_QUEUED, None, 0)
+    assert queue.get(alive).status == STATUS_RUNNING
+    assert queue.claim()[0] == stale
+
+
+def test_purge_expired(queue):
+    job_id = queue.submit("image-to-format", [("a.png", _png())], {"format": "jpg"})
+    run_job(queue, *queue.claim())
+    _set(queue, job_id, expires=1)
+
+    assert queue.get(job_id) is None
+    assert queue.purge_expired() == 1
+    assert not os.path.exists(queue.job_dir(job_id))
+
+
+def test_drain_metrics(queue):
+    assert queue.drain_metrics() == []
+    queue.add_metrics([{"operation": "a", "wall": 1.0}, {"operation": "b", "wall": 2.0}])
+    queue.add_metrics([])
+    assert queue.drain_metrics() == [{"operation": "a", "wall": 1.0}, {"operation": "b", "wall": 2.0}]
+    assert queue.drain_metrics() == []
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from fileflow import metrics
+from fileflow.metrics import Measurement, MetricsRegistry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = MetricsRegistry()
+    monkeypatch.setattr(metrics, "registry", registry)
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    return registry
+
+
+def test_merge_does_not_write_or_drain_sources(registry, monkeypatch, tmp_path):
+    path = tmp_path / "fileflow.prom"
+    drained = []
+    monkeypatch.setattr(metrics, "METRICS_FILE", str(path))
+    registry.add_source(lambda: drained.append(1) or [])
+
+    registry.merge([Measurement("op", wall=0.2)])
+    registry.record(Measurement("op", wall=0.3))
+    assert not path.exists()
+    assert drained == []
+
+    assert "fileflow_operation_wall_seconds_count{operation=\"op\"} 2" in metrics.render_prometheus()
+    assert drained == [1]
+
+
+def test_metrics_writer_rewrites_file_periodically(registry, monkeypatch, tmp_path):
+    path = tmp_path / "fileflow.prom"
+    monkeypatch.setattr(metrics, "_writer", None)
+    monkeypatch.setattr(metrics.atexit, "register", lambda *args: None)
+
+    writer = metrics.start_metrics_writer(str(path), interval=0.01)
+    assert metrics.start_metrics_writer(str(path), interval=0.01) is writer
+    registry.record(Measurement("op", wall=0.2))
+    deadline = time.monotonic() + 5
+    while 'operation="op"' not in (path.read_text() if path.exists() else ""):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize("opt_in, resets", [(False, 0), (True, 1)])
+def test_peak_rss_reset_is_opt_in(registry, monkeypatch, opt_in, resets):
+    calls = []
+    monkeypatch.setattr(metrics, "RESET_PEAK_RSS", opt_in)
+    monkeypatch.setattr(metrics, "_reset_peak_rss", lambda: calls.append(1))
+
+    with metrics.measure("op"):
+        with metrics.measure("interna"):
+            pass
+    assert len(calls) == resets
+    assert registry.snapshot()["op"].peak_rss > 0
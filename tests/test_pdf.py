@@ -0,0 +1,208 @@
+import io
+import zipfile
+
+import fitz  # PyMuPDF
+import pytest
+from PIL import Image
+
+from fileflow import pdf
+from fileflow.pdf import compress_pdf, edit_pdf_structure, merge_pdfs, parse_page_ranges, split_pdf
+
+
+def _logo():
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 32, 32), False)
+    pix.set_rect(pix.irect, (200, 30, 30))
+    return pix.tobytes("png")
+
+
+def _pdf(*texts, logo=None):
+    """Um PDF com uma página por texto (e o logotipo em todas, se houver)."""
+    doc = fitz.open()
+    for text in texts:
+        page = doc.new_page()
+        page.insert_text((72, 72), text)
+        if logo:
+            page.insert_image(fitz.Rect(72, 100, 104, 132), stream=logo)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _texts(file):
+    with fitz.open(stream=file.read(), filetype="pdf") as doc:
+        return [page.get_text().strip() for page in doc]
+
+
+def _image_count(file):
+    file.seek(0)
+    with fitz.open(stream=file.read(), filetype="pdf") as doc:
+        return sum(1 for xref in range(1, doc.xref_length()) if doc.xref_get_key(xref, "Subtype")[1] == "/Image")
+
+
+def test_merge_keeps_input_order():
+    inputs = iter([_pdf("a1", "a2"), io.BytesIO(_pdf("b1")), memoryview(_pdf("c1", "c2"))])
+    with merge_pdfs(inputs) as merged:
+        assert _texts(merged) == ["a1", "a2", "b1", "c1", "c2"]
+
+
+@pytest.mark.parametrize("dedupe, images", [(True, 1), (False, 3)])
+def test_merge_dedupes_repeated_images(dedupe, images):
+    logo = _logo()
+    inputs = [_pdf(f"fatura {i}", logo=logo) for i in range(3)]
+    with merge_pdfs(inputs, dedupe=dedupe) as merged:
+        assert _texts(merged) == ["fatura 0", "fatura 1", "fatura 2"]
+        assert _image_count(merged) == images
+
+
+def test_merge_flushes_batches_to_disk(monkeypatch):
+    flushes = []
+    flush = pdf._flush_merged
+
+    def counting_flush(doc, path):
+        flushes.append(len(doc))
+        return flush(doc, path)
+
+    monkeypatch.setattr(pdf, "MERGE_FLUSH_PAGES", 2)
+    monkeypatch.setattr(pdf, "_flush_merged", counting_flush)
+    logo = _logo()
+    inputs = [_pdf(f"p{i}a", f"p{i}b", logo=logo) for i in range(4)] + [_pdf("fim", logo=logo)]
+
+    with merge_pdfs(inputs) as merged:
+        texts = _texts(merged)
+        # Cada lote foi gravado e o seguinte continuou do arquivo reaberto
+        assert flushes == [2, 4, 6, 8]
+        assert texts == ["p0a", "p0b", "p1a", "p1b", "p2a", "p2b", "p3a", "p3b", "fim"]
+        # O dedupe alcança as cópias gravadas em lotes anteriores
+        assert _image_count(merged) == 1
+
+
+def test_merge_rejects_password_protected_pdf():
+    doc = fitz.open()
+    doc.new_page()
+    locked = doc.tobytes(encryption=fitz.PDF_ENCRYPT_AES_256, user_pw="x", owner_pw="y")
+
+    with pytest.raises(ValueError, match="senha"):
+        merge_pdfs([_pdf("a"), locked])
+
+
+def _zip_texts(archive):
+    with zipfile.ZipFile(archive) as zf:
+        return {name: _texts(io.BytesIO(zf.read(name))) for name in zf.namelist()}
+
+
+def test_parse_page_ranges():
+    assert parse_page_ranges("1-3, 5; 8-", 10) == [(1, 3), (5, 5), (8, 10)]
+    assert parse_page_ranges("-2", 10) == [(1, 2)]
+    for text in ("", "3-1", "0", "11", "a-b"):
+        with pytest.raises(ValueError):
+            parse_page_ranges(text, 10)
+
+
+@pytest.mark.parametrize("options, expected", [
+    ({}, {"pagina_1.pdf": ["p1"], "pagina_2.pdf": ["p2"], "pagina_3.pdf": ["p3"],
+          "pagina_4.pdf": ["p4"], "pagina_5.pdf": ["p5"]}),
+    ({"pages_per_file": 2}, {"paginas_1-2.pdf": ["p1", "p2"], "paginas_3-4.pdf": ["p3", "p4"], "pagina_5.pdf": ["p5"]}),
+    ({"page_ranges": [(4, 5), (1, 1)]}, {"paginas_4-5.pdf": ["p4", "p5"], "pagina_1.pdf": ["p1"]}),
+    ({"page_ranges": [(1, 5)], "pages_per_file": 3}, {"paginas_1-3.pdf": ["p1", "p2", "p3"], "paginas_4-5.pdf": ["p4", "p5"]}),
+])
+def test_split_groups_pages(options, expected):
+    with split_pdf(_pdf("p1", "p2", "p3", "p4", "p5"), **options) as archive:
+        texts = _zip_texts(archive)
+    assert texts == expected
+    assert list(texts) == list(expected)
+
+
+def test_split_in_parallel_keeps_zip_order(monkeypatch):
+    monkeypatch.setattr(pdf, "SPLIT_MIN_PAGES_PER_WORKER", 1)
+    monkeypatch.setattr(pdf, "SPLIT_GROUPS_PER_TASK", 2)
+    source = _pdf(*[f"p{i}" for i in range(1, 8)])
+
+    with split_pdf(source, workers=2) as archive:
+        texts = _zip_texts(archive)
+    assert texts == {f"pagina_{i}.pdf": [f"p{i}"] for i in range(1, 8)}
+    assert list(texts) == [f"pagina_{i}.pdf" for i in range(1, 8)]
+
+
+def _rotations(pdf_bytes):
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return [page.rotation for page in doc]
+
+
+@pytest.mark.parametrize("options, texts", [
+    ({"pages_to_delete": [2, 4]}, ["p1", "p3"]),
+    ({"page_order": [4, 1, 1, 3]}, ["p4", "p1", "p1", "p3"]),
+    ({"page_order": [4, 3, 2, 1], "pages_to_delete": [3]}, ["p4", "p2", "p1"]),
+])
+def test_edit_deletes_and_reorders_pages(options, texts):
+    output = edit_pdf_structure(_pdf("p1", "p2", "p3", "p4"), **options)
+    assert _texts(io.BytesIO(output)) == texts
+
+
+def test_edit_only_rotations_appends_to_original():
+    source = _pdf("p1", "p2", "p3")
+    output = edit_pdf_structure(source, pages_to_rotate={1: 90, 3: -90})
+    # Save incremental: o arquivo original fica intacto no início
+    assert output.startswith(source)
+    assert _rotations(output) == [90, 0, 270]
+    assert _rotations(edit_pdf_structure(output, pages_to_rotate=[1, 2], rotation=180)) == [270, 180, 270]
+
+
+def test_edit_rotates_pages_that_are_moved():
+    output = edit_pdf_structure(_pdf("p1", "p2"), pages_to_rotate=[2], page_order=[2, 1])
+    assert _texts(io.BytesIO(output)) == ["p2", "p1"]
+    assert _rotations(output) == [90, 0]
+
+
+@pytest.mark.parametrize("options, message", [
+    ({"pages_to_delete": [1, 2]}, "sem páginas"),
+    ({"page_order": [1, 3]}, "fora do documento"),
+    ({"pages_to_rotate": [5]}, "fora do documento"),
+    ({"pages_to_rotate": {1: 45}}, "múltiplos de 90"),
+])
+def test_edit_rejects_invalid_requests(options, message):
+    with pytest.raises(ValueError, match=message):
+        edit_pdf_structure(_pdf("p1", "p2"), **options)
+
+
+def _photo_pdf(size=600, inches=2):
+    """PDF com uma foto (ruído em PNG, sem perdas) exibida em inches x inches e um ícone."""
+    photo = io.BytesIO()
+    Image.effect_noise((size, size), 40).convert("RGB").save(photo, "PNG")
+    icon = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 16, 16), False)
+    icon.set_rect(icon.irect, (90, 140, 200))
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 60), "relatório")
+    page.insert_image(fitz.Rect(72, 72, 72 + 72 * inches, 72 + 72 * inches), stream=photo.getvalue())
+    page.insert_image(fitz.Rect(300, 72, 316, 88), stream=icon.tobytes("png"))
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _images(file):
+    file.seek(0)
+    with fitz.open(stream=file.read(), filetype="pdf") as doc:
+        return sorted(
+            (doc.xref_get_key(xref, "Width")[1], doc.xref_get_key(xref, "Filter")[1])
+            for xref in range(1, doc.xref_length()) if doc.xref_get_key(xref, "Subtype")[1] == "/Image"
+        )
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_compress_downsamples_images_above_target_dpi(workers):
+    source = _photo_pdf()
+    with compress_pdf(source, dpi=150, workers=workers) as output:
+        data = output.read()
+        # Foto de 300 DPI reduzida para 150 (2 polegadas = 300 px) em JPEG;
+        # o ícone (abaixo do tamanho mínimo) fica como estava
+        assert _images(output) == [("16", "/FlateDecode"), ("300", "/DCTDecode")]
+    assert len(data) < len(source) / 4
+    assert _texts(io.BytesIO(data)) == ["relatório"]
+
+
+def test_compress_returns_original_when_not_smaller():
+    with fitz.open(stream=_pdf("p1", "p2"), filetype="pdf") as doc:
+        compact = doc.tobytes(**pdf.COMPRESS_SAVE_OPTIONS)
+    with compress_pdf(compact) as output:
+        assert output.read() == compact
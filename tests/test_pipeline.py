@@ -0,0 +1,132 @@
+import io
+
+import fitz  # PyMuPDF
+import pandas as pd
+import pytest
+from PIL import Image, features
+
+from fileflow import image
+from fileflow.pipeline import plan_pipeline, run_pipeline
+
+requires_webp = pytest.mark.skipif(not features.check("webp"), reason="Pillow sem WebP")
+
+
+@pytest.fixture
+def fake_rembg(monkeypatch):
+    """Remoção de fundo sem o modelo: a metade esquerda vira transparente."""
+    def remove_background_image(img, session=None, fast=False):
+        img = img.convert("RGBA")
+        mask = Image.new("L", img.size, 0)
+        mask.paste(255, (img.width // 2, 0, img.width, img.height))
+        img.putalpha(mask)
+        return img
+
+    monkeypatch.setattr(image, "remove_background_image", remove_background_image)
+
+
+def _jpg(size=(40, 20)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "red").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def _pdf(pages=3):
+    doc = fitz.open()
+    for _ in range(pages):
+        doc.new_page()
+    return doc.tobytes()
+
+
+@pytest.mark.parametrize("input_format, steps, expected", [
+    ("jpg", [], "jpg"),
+    ("PNG", [("resize", {"max_size": 10})], "png"),
+    ("png", [("optimize", {"format": "jpg"})], "jpg"),
+    ("jpeg", [("optimize", {"format": "JPEG"})], "jpg"),
+    ("png", [("to-pdf", {})], "pdf"),
+    ("pdf", [("rotate-pages", {}), ("compress-pdf", {})], "pdf"),
+    ("jsonl", [], "ndjson"),
+    ("xlsx", [("drop-duplicates", {})], "csv"),
+    ("csv", [("table-format", {"format": "parquet"})], "parquet"),
+    ("csv", [("table-to-pdf", {})], "pdf"),
+])
+def test_plan_pipeline_output_format(input_format, steps, expected):
+    assert plan_pipeline(input_format, steps) == expected
+
+
+@pytest.mark.parametrize("input_format, steps", [
+    ("gif", []),
+    ("png", [("nao-existe", {})]),
+    ("png", [("rotate-pages", {})]),
+    ("pdf", [("resize", {"max_size": 10})]),
+    ("png", [("to-pdf", {}), ("to-pdf", {})]),
+    ("csv", [("optimize", {})]),
+])
+def test_plan_pipeline_rejects_invalid_chains(input_format, steps):
+    with pytest.raises(ValueError):
+        plan_pipeline(input_format, steps)
+
+
+def test_plan_pipeline_keeps_transparency_after_remove_background():
+    # JPG não tem transparência: a saída passa a ser PNG
+    assert plan_pipeline("jpg", [("remove-background", {})]) == "png"
+    assert plan_pipeline("jpg", [("optimize", {"format": "jpg"}), ("remove-background", {})]) == "png"
+    with pytest.raises(ValueError, match="transparência"):
+        plan_pipeline("jpg", [("remove-background", {}), ("optimize", {"format": "jpg"})])
+    with pytest.raises(ValueError, match="transparência"):
+        plan_pipeline("png", [("remove-background", {}), ("resize", {"max_size": 10}), ("optimize", {"format": "JPEG"})])
+    # No PDF o fundo transparente fica branco
+    assert plan_pipeline("jpg", [("remove-background", {}), ("to-pdf", {})]) == "pdf"
+
+
+@requires_webp
+def test_plan_pipeline_allows_alpha_formats_after_remove_background():
+    assert plan_pipeline("jpg", [("remove-background", {}), ("optimize", {"format": "webp"})]) == "webp"
+    assert plan_pipeline("webp", [("remove-background", {})]) == "webp"
+
+
+def test_remove_background_on_jpg_outputs_transparent_png(fake_rembg):
+    output = run_pipeline(_jpg(), "jpg", [("remove-background", {}), ("resize", {"max_size": 20})])
+    img = Image.open(io.BytesIO(output))
+    assert img.format == "PNG"
+    assert img.size == (20, 10)
+    assert img.mode == "RGBA"
+    assert img.getpixel((0, 0))[3] == 0
+    assert img.getpixel((19, 0))[3] == 255
+
+
+def test_remove_background_then_pdf_flattens_on_white(fake_rembg):
+    output = run_pipeline(_jpg(), "jpg", [("remove-background", {}), ("to-pdf", {"dpi": 72})])
+    with fitz.open(stream=output, filetype="pdf") as doc:
+        assert len(doc) == 1
+        assert (doc[0].rect.width, doc[0].rect.height) == (40, 20)
+        pix = doc[0].get_pixmap()
+        assert pix.pixel(2, 10) == (255, 255, 255)
+
+
+def test_optimize_sets_final_encoding():
+    output = run_pipeline(_jpg((400, 200)), "jpg", [("optimize", {"format": "png", "max_size": 100})])
+    img = Image.open(io.BytesIO(output))
+    assert (img.format, img.size) == ("PNG", (100, 50))
+
+
+def test_pdf_steps():
+    steps = [("delete-pages", {"pages": "2"}), ("rotate-pages", {"rotation": 90, "pages": "1"})]
+    with fitz.open(stream=run_pipeline(_pdf(3), "pdf", steps), filetype="pdf") as doc:
+        assert len(doc) == 2
+        assert [page.rotation for page in doc] == [90, 0]
+    with pytest.raises(ValueError):
+        run_pipeline(_pdf(2), "pdf", [("delete-pages", {"pages": "1-2"})])
+
+
+def test_table_steps():
+    csv_bytes = b"nome,idade,cidade\nAna,30,SP\nBia,25,RJ\nAna,30,SP\n"
+    steps = [
+        ("drop-duplicates", {}),
+        ("sort-rows", {"column": "idade"}),
+        ("select-columns", {"columns": "nome, idade"}),
+        ("table-format", {"format": "json"}),
+    ]
+    df = pd.read_json(io.BytesIO(run_pipeline(csv_bytes, "csv", steps)))
+    assert df.to_dict("records") == [{"nome": "Bia", "idade": 25}, {"nome": "Ana", "idade": 30}]
+    with pytest.raises(ValueError):
+        run_pipeline(csv_bytes, "csv", [("select-columns", {"columns": "nao_existe"})])
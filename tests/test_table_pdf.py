@@ -0,0 +1,35 @@
+import fitz  # PyMuPDF
+import pandas as pd
+
+from fileflow.table_pdf import render_tables_pdf
+
+
+def _page_lines(pdf_bytes):
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return [page.get_text().splitlines() for page in doc]
+
+
+def test_long_table_repeats_header_on_every_page():
+    df = pd.DataFrame({"Nome": [f"item {i}" for i in range(200)], "Valor": range(200)})
+    pages = _page_lines(render_tables_pdf([("Planilha1", df)]))
+
+    assert len(pages) > 1
+    assert pages[0][:3] == ["Planilha1", "Nome", "Valor"]
+    for lines in pages[1:]:
+        assert lines[:2] == ["Nome", "Valor"]
+        assert "Planilha1" not in lines
+    # Todas as linhas, na ordem, sem repetir nem pular entre as páginas
+    names = [line for lines in pages for line in lines if line.startswith("item ")]
+    assert names == [f"item {i}" for i in range(200)]
+
+
+def test_text_outside_cp1252_is_replaced():
+    df = pd.DataFrame({"Descrição": ["ação (R$ 10,00) \\ ok", "Ωmega 😀", None]})
+    lines = _page_lines(render_tables_pdf([("", df)]))[0]
+    assert lines[:3] == ["Descrição", "ação (R$ 10,00) \\ ok", "?mega ?"]
+
+
+def test_tables_without_columns_are_skipped():
+    assert render_tables_pdf([("Vazia", pd.DataFrame())]) == b""
+    pages = _page_lines(render_tables_pdf([("Vazia", pd.DataFrame()), ("Dados", pd.DataFrame({"a": [1]}))]))
+    assert pages == [["Dados", "a", "1"]]